@@ -2,13 +2,14 @@ import yaml
 
 from src.utils.logging_config import configure_logging
 from src.data import binance_historic as data
-from src.strategies.triple_supertrend import TripleSupertrendStrategy
+from src.data import indicator_cache
+from src.strategies.registry import STRATEGIES
 
 logger = configure_logging()
 
 def main(config):
     logger.info('Starting Trading Bot')
-    strategy = TripleSupertrendStrategy(config)
+    strategy = STRATEGIES[config['strategy_name']](config, cache=indicator_cache.from_config(config))
     strategy.run()
 
 
@@ -1,33 +1,40 @@
-import os
-from time import ctime
 import datetime
 import pandas as pd
 from binance.client import Client
 
+from .kline_store import KlineStore, parse_klines
+
 
 def get_historical_klines(symbol, interval, start_date):
+    ''' Returns the klines since start_date as open_time (int64 epoch ms) and OHLCV float64 arrays '''
     client = Client('API_KEY', 'API_SECRET')
     candlesticks = client.get_historical_klines(symbol, interval, start_date)
-    return [[ctime(candlestick[0]/1000)] + candlestick[1:6] for candlestick in candlesticks]
+    return parse_klines(candlesticks)
+
+
+def format_dates(open_time, fmt: str='%Y-%m-%d %H:%M:%S'):
+    ''' Formats epoch millisecond times as UTC strings, for reports only '''
+    return pd.to_datetime(pd.Series(open_time, dtype='int64'), unit='ms', utc=True).dt.strftime(fmt).to_numpy(dtype=object)
 
 
-def get_historic_data(symbol, interval, days=2):
+def get_historic_data(symbol, interval, days=2, store=None, compact=False):
+    ''' Candles of the last days, read from the local kline store after syncing its missing tail
+
+    Args:
+        store (KlineStore): Store to read from, defaults to the one in data/ohlc/store
+        compact (bool): OHLCV as float32, see src.data.compact
+
+    Returns:
+        df (pd.DataFrame): Date as int64 epoch milliseconds, OHLCV as float64 (float32 when compact)
+    '''
     print('GETTING HISTORIC DATA...')
+    store = store or KlineStore()
     end_date = datetime.datetime.now()
     start_date = end_date - datetime.timedelta(days=days)
-    start_date_str = start_date.strftime("%d %b, %Y")
-
-    candlesticks = get_historical_klines(
-        symbol=symbol, interval=interval, start_date=start_date_str)
-    
-    df = pd.DataFrame(candlesticks, columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
-    for col in df.columns:
-        if col != 'Date':
-            df[col] = df[col].astype(float)
-
-    file_path = os.path.join('data/ohlc/historic/binance', f"{symbol}_{end_date.strftime('%d%b%Y')}_{interval}.csv")
-    df.to_csv(file_path, index=False)
-    return df
+    start = int(start_date.timestamp() * 1000)
+
+    store.sync(symbol, interval, start)
+    return store.read(symbol, interval, start=start, compact=compact)
 
 
 if __name__ == '__main__':
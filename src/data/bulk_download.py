@@ -0,0 +1,271 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+from binance.helpers import interval_to_milliseconds
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+from .kline_store import FIELDS, KlineStore, parse_klines
+
+KLINE_LIMIT = 1000
+# Base url, klines path and request weight allowed per minute for each market
+MARKETS = {
+    'spot': ('https://api.binance.com', '/api/v3/klines', 1200),
+    'futures': ('https://fapi.binance.com', '/fapi/v1/klines', 2400),
+}
+
+
+def kline_weight(limit: int) -> int:
+    ''' Request weight of a klines call, it grows with the page size '''
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def split_range(start: int, end: int, interval: str, limit: int=KLINE_LIMIT) -> list:
+    ''' Splits an open time range into chunks of at most limit candles
+
+    The chunks follow a fixed grid of limit candles from the epoch, so the same range
+    split on another run (a download resumed later, with another start) gives the same
+    chunks apart from the first and the last one.
+
+    Returns:
+        chunks (list): (start, end) open times in epoch milliseconds, both included
+    '''
+    step = interval_to_milliseconds(interval) * limit
+    return [(max(cell, start), min(cell + step - 1, end)) for cell in range(start - start % step, end + 1, step)]
+
+
+class TokenBucket:
+    ''' Request weight budget refilled continuously up to its capacity every period
+
+    Attributes:
+        capacity (int): Weight allowed per period
+        period (float): Seconds for a full refill
+    '''
+    def __init__(self, capacity: int, period: float=60.0):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def __refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def acquire(self, weight: int):
+        ''' Blocks until weight tokens are available and takes them '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.__refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    wait = (weight - self.tokens) * self.period / self.capacity
+            time.sleep(wait)
+
+    def observe(self, used: int):
+        ''' Lowers the budget to what the server reports as left (X-MBX-USED-WEIGHT-1M) '''
+        with self.lock:
+            self.__refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds: float):
+        ''' Stops every request for some time, after a 429 or 418 response '''
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class BulkDownloader:
+    ''' Concurrent historical kline download of many (symbol, interval, range) jobs into a KlineStore
+
+    The missing part of every range is split into chunks of one kline page, fetched
+    by a thread pool through one pooled keep-alive session, within a token bucket of
+    request weight. The chunks are cells of a fixed grid (see split_range) and each
+    finished one is saved in a staging directory under its range, so a download that
+    died resumes with the chunks it did not finish, and a job is merged into the store
+    once all its chunks are there. Staged chunks the download does not need anymore are
+    removed when it starts.
+
+    Attributes:
+        store (KlineStore): Destination of the candles
+        base_url (str): Overrides the Binance url, e.g. a local stub (see fixture_client.serve_klines)
+        bucket (TokenBucket): Request weight budget shared by the workers
+    '''
+    def __init__(self, store: KlineStore=None, market: str='futures', base_url: str=None, workers: int=8,
+                 weight_limit: int=None, limit: int=KLINE_LIMIT, staging: str='data/ohlc/staging',
+                 retries: int=5, session: requests.Session=None):
+        default_url, self.path, default_weight = MARKETS[market]
+        self.store = store or KlineStore()
+        self.base_url = base_url or default_url
+        self.workers = workers
+        self.limit = limit
+        self.staging = staging
+        self.retries = retries
+        # leave a margin for the other processes using the same ip
+        self.bucket = TokenBucket(weight_limit or int(default_weight * 0.8))
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def missing_ranges(self, symbol: str, interval: str, start: int, end: int) -> list:
+        ''' Parts of [start, end] before, between and after the candles already stored
+
+        The part after the stored candles starts right after the last one even when start
+        is later, so the store never gets a hole.
+        '''
+        meta = self.store.meta(symbol, interval)
+        if meta['first_open_time'] is None:
+            return [(start, end)]
+        ranges = []
+        if start < meta['first_open_time']:
+            ranges.append((start, min(end, meta['first_open_time'] - 1)))
+        ranges.extend(self.store.gaps(symbol, interval, start, end))
+        if end > meta['last_open_time']:
+            ranges.append((meta['last_open_time'] + 1, end))
+        return ranges
+
+    def __staging_path(self, symbol, interval):
+        return os.path.join(self.staging, symbol, interval)
+
+    def __chunk_path(self, symbol, interval, start, end):
+        # keyed by the whole range, a chunk fetched with another end is not reused
+        return os.path.join(self.__staging_path(symbol, interval), f'{start}-{end}.npy')
+
+    def __clean_staging(self, symbol, interval, chunks):
+        # the chunks of an abandoned download, or of a range since stored, are not needed anymore
+        path = self.__staging_path(symbol, interval)
+        keep = {os.path.basename(self.__chunk_path(symbol, interval, start, end)) for start, end in chunks}
+        if os.path.isdir(path):
+            for file in os.listdir(path):
+                if file not in keep:
+                    os.remove(os.path.join(path, file))
+
+    def fetch(self, symbol: str, interval: str, start: int, end: int) -> dict:
+        ''' One page of klines opening in [start, end], retried on rate limits and server errors
+
+        Returns:
+            columns (dict): open_time and OHLCV arrays of the closed candles, see parse_klines
+        '''
+        params = {'symbol': symbol, 'interval': interval, 'startTime': start, 'endTime': end, 'limit': self.limit}
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire(kline_weight(self.limit))
+            try:
+                response = self.session.get(self.base_url + self.path, params=params, timeout=30)
+            except requests.RequestException:
+                if attempt == self.retries:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+
+            if 'X-MBX-USED-WEIGHT-1M' in response.headers:
+                self.bucket.observe(int(response.headers['X-MBX-USED-WEIGHT-1M']))
+            if response.status_code in (418, 429):
+                self.bucket.pause(float(response.headers.get('Retry-After', 60)))
+                continue
+            if response.status_code >= 500 and attempt < self.retries:
+                time.sleep(2 ** attempt)
+                continue
+            response.raise_for_status()
+
+            now = int(time.time() * 1000)
+            # the close time of a kline is its 7th field, open candles are not stored
+            return parse_klines([kline for kline in response.json() if kline[6] < now])
+        raise RuntimeError(f'{symbol} {interval} klines from {start} still rate limited after {self.retries} retries')
+
+    def __download_chunk(self, symbol, interval, start, end):
+        path = self.__chunk_path(symbol, interval, start, end)
+        if os.path.exists(path):
+            return
+        columns = self.fetch(symbol, interval, start, end)
+        chunk = np.empty(len(columns['open_time']), dtype=FIELDS)
+        for name, _ in FIELDS:
+            chunk[name] = columns[name]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written under another name first, a chunk file is complete when it exists
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, chunk)
+        os.replace(path + '.tmp', path)
+
+    def __merge(self, symbol, interval, chunks):
+        # chunks are merged in open time order, then their staging files are removed
+        paths = [self.__chunk_path(symbol, interval, start, end) for start, end in sorted(chunks)]
+        arrays = [np.load(path) for path in paths]
+        data = np.concatenate(arrays) if arrays else np.empty(0, dtype=FIELDS)
+        added = self.store.merge(symbol, interval, {name: data[name] for name, _ in FIELDS}, fetched=sorted(chunks))
+        for path in paths:
+            os.remove(path)
+        return added
+
+    def download(self, jobs: list, progress: bool=True) -> dict:
+        ''' Downloads the candles missing from the store for every job
+
+        Args:
+            jobs (list): (symbol, interval, start, end) tuples, open times in epoch milliseconds,
+                end can be None for now
+
+        Returns:
+            added (dict): (symbol, interval) -> number of candles added to the store
+        '''
+        now = int(time.time() * 1000)
+        chunks = {}
+        for symbol, interval, start, end in jobs:
+            end = now if end is None else end
+            job_chunks = chunks.setdefault((symbol, interval), [])
+            for missing_start, missing_end in self.missing_ranges(symbol, interval, start, end):
+                job_chunks.extend(chunk for chunk in split_range(missing_start, missing_end, interval, self.limit)
+                                  if chunk not in job_chunks)
+        for (symbol, interval), job_chunks in chunks.items():
+            self.__clean_staging(symbol, interval, job_chunks)
+        chunks = {job: job_chunks for job, job_chunks in chunks.items() if job_chunks}
+
+        added = {(symbol, interval): 0 for symbol, interval, _, _ in jobs}
+        remaining = {job: len(job_chunks) for job, job_chunks in chunks.items()}
+        total = sum(remaining.values())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.__download_chunk, *job, start, end): job
+                       for job, job_chunks in chunks.items() for start, end in job_chunks}
+            for future in tqdm(as_completed(futures), total=total, disable=not progress):
+                future.result()
+                job = futures[future]
+                remaining[job] -= 1
+                if remaining[job] == 0:
+                    added[job] += self.__merge(*job, chunks[job])
+        return added
+
+
+if __name__ == '__main__':
+    import datetime
+
+    parser = argparse.ArgumentParser(description='Downloads the klines of many symbols into the local kline store')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--interval', default='5m')
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--market', default='futures', choices=list(MARKETS))
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--store', default='data/ohlc/store')
+    parser.add_argument('--base-url', default=None)
+    args = parser.parse_args()
+
+    start = int((datetime.datetime.now() - datetime.timedelta(days=args.days)).timestamp() * 1000)
+    downloader = BulkDownloader(KlineStore(args.store), market=args.market, base_url=args.base_url, workers=args.workers)
+    added = downloader.download([(symbol, args.interval, start, None) for symbol in args.symbols])
+    for (symbol, interval), rows in added.items():
+        print(f'{symbol} {interval}: {rows} candles added')
@@ -1,11 +1,67 @@
+import time
+import tracemalloc
+
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
 from src.utils.indicators import *
-from ta.momentum import StochRSIIndicator
+from src.data.indicator_planner import IndicatorPlan, compute_node, node_dependencies
+from src.data.compact import COMPACT_FLOAT, compact_frame
+
+class _ColumnBuffer:
+    '''Preallocated storage for the indicator columns of a run
+
+    Float columns are written into one Fortran-ordered float64 block (float32 in compact
+    mode) so every column is a contiguous array, other dtypes (e.g. the STX labels) are
+    kept aside. The result DataFrame is assembled once, on top of the block, in to_frame.
+    '''
+    def __init__(self, index: pd.Index, capacity: int, dtype=np.float64):
+        self.index = index
+        self._block = np.empty((len(index), capacity), dtype=dtype, order='F')
+        self._slots = {}     # float column name -> block column
+        self._others = {}    # non float column name -> values
+        self._order = []     # every column name in insertion order
+
+    def put(self, name: str, values):
+        if not isinstance(values, pd.Categorical):
+            values = np.asarray(values)
+        if name not in self._order:
+            self._order.append(name)
+        if values.dtype.kind == 'f' and name not in self._others:
+            slot = self._slots.setdefault(name, len(self._slots))
+            self._block[:, slot] = values
+        else:
+            self._others[name] = values
+
+    def to_frame(self, src: pd.DataFrame) -> pd.DataFrame:
+        # slots are handed out in insertion order, so the block is already in column order
+        names = [name for name in self._order if name in self._slots]
+        frame = pd.DataFrame(self._block[:, :len(names)], index=self.index, columns=names, copy=False)
+        for loc, name in enumerate(self._order):
+            if name in self._others:
+                frame.insert(loc, name, self._others[name])
+
+        overlap = frame.columns.intersection(src.columns)
+        if len(overlap) == 0:
+            return pd.concat([src.copy(), frame], axis=1, copy=False)
+
+        # recomputed columns keep their position in src
+        df = src.copy()
+        for name in frame.columns:
+            df[name] = frame[name]
+        return df
+
 
 class Indicators:
-    def __init__(self):
+    '''Computes the indicators of a strategy config block
+
+    Args:
+        cache (IndicatorCache): Values of earlier runs reused by get_indicators, see
+            src.data.indicator_cache
+    '''
+    def __init__(self, cache=None):
+        self.cache = cache
         self.match_ind = {
             'supertrend': self.__get_SuperTrend,
             'sma': self.__get_SMA,
@@ -17,74 +73,172 @@ class Indicators:
             'bband': self.__get_BBand,
             'atr': self.__get_ATR
         }
+        # number of columns each indicator writes, used to preallocate the column buffers
+        self.n_columns = {
+            'supertrend': 2,
+            'sma': 1,
+            'ema': 1,
+            'macd': 3,
+            'stoch_rsi': 2,
+            'rsi': 1,
+            'vwap': 1,
+            'bband': 2,
+            'atr': 1
+        }
+        self._shared = {}
+        self._compact = False
+        self.plan = None
+        self.report = None
 
-    def get_indicators(self, df: pd.DataFrame, indicators: dict):
+    def get_indicators(self, df: pd.DataFrame, indicators: dict, profile: bool=False, workers: int=None,
+                       compact: bool=False):
         '''Parent function that calls all the functions to calculate all the indicators
         present in the indicators dictionary
+
+        The indicators are computed as numpy columns into a preallocated buffer and
+        the result DataFrame is assembled once at the end, instead of copying the
+        whole frame for every indicator. The time taken by each indicator is stored
+        in self.report, along with its peak memory when profile is set.
+
+        The intermediate series shared by the indicators (True Range, ATR, EMAs, ...)
+        are planned as a dependency graph and computed up front, once each, with the
+        independent branches running in parallel. When profiling, they are computed
+        lazily instead so that each one is accounted to the first indicator using it.
+        With a cache, the intermediates computed by earlier runs on the same candles (or
+        on the first of them) are reused, except when profiling.
+
+        In compact mode the indicators are still computed in float64 and only stored as
+        float32, along with the OHLCV columns, and the STX columns are categoricals of
+        'down'/'up'. See src.data.compact for the accuracy against the float64 frame.
         
         Args:
             df (pd.DataFrame): Dataframe with OHLCV data
             indicators (dict): Dictionary with the indicators to calculate
+            profile (bool): Trace the peak memory allocated by each indicator and print the report
+            workers (int): Threads evaluating the dependency graph, 1 disables the parallelism
+            compact (bool): Return float32 columns and categorical STX columns, about half the memory
         
         Returns:
             df (pd.DataFrame): Dataframe with OHLCV data and calculated indicators
         '''
         print('CALCULATING INDICATORS...')
-        for parameter in tqdm(indicators):
-            if '-' in parameter:
-                indicator, num = parameter.split('-')
-                df = self.match_ind[indicator](df, indicators[parameter], num)
-            else:
+        # intermediates are shared between the indicators of a single run only
+        self._shared = {}
+        self._compact = compact
+        requests = self.__requests(indicators)
+
+        capacity = sum(self.n_columns[parameter.split('-')[0]] for parameter, _, _ in requests)
+        buffer = _ColumnBuffer(df.index, capacity, COMPACT_FLOAT if compact else np.float64)
+
+        report = []
+        self.plan = IndicatorPlan(indicators)
+        if not profile:
+            start = time.perf_counter()
+            self._shared = self.plan.execute(df, workers=workers, cache=self.cache)
+            report.append(('plan', time.perf_counter() - start, np.nan, ''))
+
+        tracing = profile and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            for parameter, function, args in tqdm(requests):
+                if profile:
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                start = time.perf_counter()
                 try:
-                    indicator = parameter
-                    df = self.match_ind[indicator](df, indicators[parameter])
+                    columns = function(df, *args)
                 except KeyError:
-                    pass
+                    if '-' in parameter:
+                        raise
+                    continue
+                for name, values in columns.items():
+                    buffer.put(name, values)
+                peak = (tracemalloc.get_traced_memory()[1] - baseline) / 2**20 if profile else np.nan
+                report.append((parameter, time.perf_counter() - start, peak, ', '.join(columns)))
+
+            start = time.perf_counter()
+            df = buffer.to_frame(compact_frame(df) if compact else df)
+            report.append(('assemble', time.perf_counter() - start, np.nan, ''))
+        finally:
+            if tracing:
+                tracemalloc.stop()
 
+        self.report = pd.DataFrame(report, columns=['indicator', 'seconds', 'peak_mb', 'columns']).set_index('indicator')
+        if profile:
+            print(self.report.to_string())
         return df
-    
+
+    def get_columns(self, src, indicators: dict, shared: dict=None) -> dict:
+        '''Columns of the indicators as {name: values}, without assembling a DataFrame
+
+        Used for the (time x symbol) panels of src.data.panel: src then maps each OHLCV
+        column name to a 2-D frame and every column returned is a 2-D array.
+
+        Args:
+            src: Dataframe with OHLCV data, or a mapping of the OHLCV column names to frames
+            indicators (dict): Dictionary with the indicators to calculate
+            shared (dict): Intermediate nodes computed earlier, e.g. by IndicatorPlan.execute
+
+        Returns:
+            columns (dict): Column name -> values, in the order get_indicators adds them
+        '''
+        self._shared = dict(shared or {})
+        self._compact = False
+        result = {}
+        for parameter, function, args in self.__requests(indicators):
+            try:
+                result.update(function(src, *args))
+            except KeyError:
+                if '-' in parameter:
+                    raise
+        return result
+
+    def __requests(self, indicators: dict) -> list:
+        '''Config entries as (parameter, function, args), the dashed ones numbered'''
+        requests = []
+        for parameter in indicators:
+            if '-' in parameter:
+                indicator, num = parameter.split('-')
+                requests.append((parameter, self.match_ind[indicator], (indicators[parameter], num)))
+            elif parameter in self.match_ind:
+                requests.append((parameter, self.match_ind[parameter], (indicators[parameter],)))
+        return requests
+
+    def __node(self, key: tuple, src: pd.DataFrame):
+        '''Returns an intermediate series of the dependency graph, computed once per run
+        so indicators with the same building blocks (True Range, ATR, SuperTrend) reuse it'''
+        if key not in self._shared:
+            inputs = [self.__node(dependency, src) for dependency in node_dependencies(key)]
+            self._shared[key] = compute_node(key, src, inputs)
+        return self._shared[key]
+
     def __get_SuperTrend(self, src: pd.DataFrame, value: dict, num: int=0):
-        df = src.copy()
-        if num != 0:
-            df[f'ST_{num}'] = SuperTrend(src, value['atr'], value['multiplier'])[0]
-            df[f'STX_{num}'] = SuperTrend(src, value['atr'], value['multiplier'])[1]
-        else:
-            df[f'ST'] = SuperTrend(src, value['atr'], value['multiplier'])[0]
-            df[f'STX'] = SuperTrend(src, value['atr'], value['multiplier'])[1]
-        return df
+        band, direction = self.__node(('supertrend', value['atr'], value['multiplier']), src)
+        suffix = f'_{num}' if num != 0 else ''
+        return {f'ST{suffix}': band, f'STX{suffix}': trend_categories(direction) if self._compact else trend_labels(direction)}
     
     def __get_SMA(self, src: pd.DataFrame, value: int, num: int=0):
-        df = src.copy()
         column_name = f'SMA_{num}' if num != 0 else 'SMA'
-        df = SMA(df, 'Close', column_name, value)
-        return df
+        return {column_name: self.__node(('sma', value), src)}
     
     def __get_EMA(self, src: pd.DataFrame, value: int, num: int=0):
-        df = src.copy()
         column_name = f'EMA_{num}' if num != 0 else 'EMA'
-        df = EMA(df, 'Close', column_name, value)
-        return df
+        return {column_name: self.__node(('ema', value), src)}
     
     def __get_MACD(self, src: pd.DataFrame, value: dict):
-        df = src.copy()
         try:
-            df = MACD(df, value['ema_fast'], value['ema_slow'], value['signal'])
+            columns = self.__node(('macd', value['ema_fast'], value['ema_slow'], value['signal']), src)
         except:
-            df = MACD(df)
-        return df
+            columns = self.__node(('macd', 12, 26, 9), src)
+        return dict(zip(['MACD', 'Signal', 'Hist'], columns))
     
     def __get_StochasticRSI(self, src: pd.DataFrame, value: dict):
-        df = src.copy()
-        stochInd = StochRSIIndicator(df.Close, window=value)
-        df['sRSI_d'] = stochInd.stochrsi_d()*100
-        df['sRSI_k'] = stochInd.stochrsi_k()*100
-
-        return df
+        stochrsi_d, stochrsi_k = self.__node(('stoch_rsi', value), src)
+        return {'sRSI_d': stochrsi_d*100, 'sRSI_k': stochrsi_k*100}
     
     def __get_RSI(self, src: pd.DataFrame, value: dict):
-        df = src.copy()
-        df = RSI(df, period=value['rsi'])
-        return df
+        return {'RSI': self.__node(('rsi', value['rsi']), src)}
     
     def __get_VWAP(self, src: pd.DataFrame, value: dict):
         '''Volume Weighted Average Price (VWAP)
@@ -94,23 +248,16 @@ class Indicators:
             value (dict): Dictionary with the parameters to calculate the indicator
             
         Returns:
-            df (pd.DataFrame): Dataframe with OHLCV data and calculated indicator
+            columns (dict): Calculated indicator column
         '''
-        df = src.copy()
-        v = df['Volume'].values
-        tp = (df['Low'] + df['Close'] + df['High']).div(3).values
-        return df.assign(VWAP=(tp * v).cumsum() / v.cumsum())
+        return {'VWAP': self.__node(('vwap',), src)}
     
     def __get_BBand(self, src: pd.DataFrame, value: dict):
-        df = src.copy()
-        df = BBand(df, period=value['period'], multiplier=value['multiplier'])
-        return df
+        upper, lower = self.__node(('bband', value['period'], value['multiplier']), src)
+        return {'UpperBB': upper, 'LowerBB': lower}
     
     def __get_ATR(self, src: pd.DataFrame, value: dict):
-        df = src.copy()
-        df = ATR(df, period=value['atr'])
-        df.drop('TR', inplace=True, axis=1)
-        return df
+        return {'ATR': self.__node(('atr', value['atr']), src)}
 
 if __name__ == '__main__':
     import yaml
@@ -0,0 +1,131 @@
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .kline_store import FIELDS
+
+# File layout: MAGIC, the header size as a little endian uint64, the JSON header padded
+# with spaces, then every column as one contiguous little endian array. The header gives
+# the number of rows and each column's dtype and byte offset, offsets are ALIGN aligned
+MAGIC = b'DXOHLCV\x01'
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _columns(data) -> dict:
+    # open_time and OHLCV arrays from a frame (Date column) or from KlineStore.arrays
+    if isinstance(data, pd.DataFrame):
+        date = data['Date']
+        if not np.issubdtype(date.dtype, np.number):
+            # csv files written before the dates were kept as epoch milliseconds
+            date = pd.to_datetime(date).astype('int64') // 10**6
+        data = {'open_time': date, **{name: data[name] for name, _ in FIELDS[1:]}}
+    return {name: np.ascontiguousarray(data[name], dtype=np.dtype(dtype).newbyteorder('<')) for name, dtype in FIELDS}
+
+
+def write_dataset(path: str, data, **meta) -> int:
+    ''' Writes candles as a memory mappable OHLCV dataset
+
+    The file is written next to path and renamed over it, so readers never see a
+    partial file.
+
+    Args:
+        path (str): Dataset file to write
+        data: Dataframe with Date and OHLCV columns, or the columns of KlineStore.arrays
+        meta: Extra JSON values kept in the header, e.g. symbol and interval
+
+    Returns:
+        rows (int): Number of candles written
+    '''
+    columns = _columns(data)
+    rows = len(columns['open_time'])
+    offsets = []
+    offset = 0
+    for values in columns.values():
+        offsets.append(offset)
+        offset = _aligned(offset + values.nbytes)
+
+    # the offsets are written from the start of the file, so the header size depends on
+    # their digits, it is grown until the header fits
+    size = ALIGN
+    while True:
+        header = {'rows': rows, **meta, 'columns': [
+            {'name': name, 'dtype': values.dtype.str, 'offset': size + start}
+            for (name, values), start in zip(columns.items(), offsets)]}
+        encoded = json.dumps(header).encode()
+        if len(MAGIC) + 8 + len(encoded) <= size:
+            break
+        size = _aligned(len(MAGIC) + 8 + len(encoded))
+    encoded += b' ' * (size - len(MAGIC) - 8 - len(encoded))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(MAGIC + np.uint64(size).astype('<u8').tobytes() + encoded)
+        for column, values in zip(header['columns'], columns.values()):
+            f.seek(column['offset'])
+            values.tofile(f)
+        f.truncate(size + offset)
+    os.replace(temp, path)
+    return rows
+
+
+def read_header(path: str) -> dict:
+    ''' Returns the header of a dataset: rows, columns (name, dtype, offset) and the extra meta '''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not an OHLCV dataset')
+        size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        return json.loads(f.read(size - len(MAGIC) - 8))
+
+
+def open_dataset(path: str) -> dict:
+    ''' Maps a dataset into memory, nothing is read until the arrays are used
+
+    The pages are the file's page cache, shared by every process opening the same
+    file, so a pool of workers holds the candles once whatever its size.
+
+    Returns:
+        columns (dict): open_time and OHLCV read only arrays, views of the mapped file
+    '''
+    header = read_header(path)
+    rows = header['rows']
+    if rows == 0:
+        return {column['name']: np.empty(0, dtype=column['dtype']) for column in header['columns']}
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    return {column['name']: np.ndarray((rows,), dtype=column['dtype'], buffer=mapped, offset=column['offset'])
+            for column in header['columns']}
+
+
+def load_dataset(path: str, frame: bool=True):
+    ''' Opens a dataset as arrays or as a Dataframe built on the mapped arrays, without a copy
+
+    Returns:
+        df (pd.DataFrame): Date and OHLCV columns like KlineStore.read, when frame is set
+        columns (dict): otherwise, see open_dataset
+    '''
+    columns = open_dataset(path)
+    if not frame:
+        return columns
+    columns['Date'] = columns.pop('open_time')
+    return pd.DataFrame({name: columns[name] for name in ['Date'] + [name for name, _ in FIELDS[1:]]}, copy=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converts OHLCV csv files into memory mappable datasets')
+    parser.add_argument('csv', nargs='*', default=glob.glob('data/ohlc/historic/binance/*.csv'),
+                        help='csv files to convert, defaults to data/ohlc/historic/binance/*.csv')
+    parser.add_argument('--output', default='data/ohlc/datasets', help='directory of the datasets')
+    args = parser.parse_args()
+
+    for csv in args.csv:
+        path = os.path.join(args.output, os.path.splitext(os.path.basename(csv))[0] + '.ohlcv')
+        rows = write_dataset(path, pd.read_csv(csv), source=os.path.basename(csv))
+        print(f'{csv}: {rows} candles written to {path}')
@@ -0,0 +1,98 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+
+
+class FixtureClient:
+    ''' Offline stand-in for binance.client.Client serving klines from fixtures
+
+    Only the kline methods are implemented, with the same row layout as Binance:
+    [open time, open, high, low, close, volume, close time, quote volume, trades,
+    taker buy base volume, taker buy quote volume, ignore], prices as strings.
+
+    Attributes:
+        klines (dict): (symbol, interval) -> kline rows sorted by open time
+        calls (int): Number of get_historical_klines calls
+        served (int): Number of kline rows returned by them
+    '''
+    def __init__(self, klines: dict=None):
+        self.klines = klines or {}
+        self.calls = 0
+        self.served = 0
+
+    @staticmethod
+    def klines_from_frame(df: pd.DataFrame, interval: str) -> list:
+        ''' Kline rows of an OHLCV frame, Date holding the open times in epoch milliseconds '''
+        open_time = df['Date'].to_numpy(dtype=np.int64)
+        close_time = open_time + interval_to_milliseconds(interval) - 1
+        prices = df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float64)
+        return [[int(t), *map(str, row), int(c), '0', 0, '0', '0', '0']
+                for t, row, c in zip(open_time, prices.tolist(), close_time)]
+
+    def add_frame(self, symbol: str, interval: str, df: pd.DataFrame):
+        ''' Serves the candles of an OHLCV frame for (symbol, interval) '''
+        self.klines[(symbol, interval)] = self.klines_from_frame(df, interval)
+
+    def get_historical_klines(self, symbol, interval, start_str=None, end_str=None, limit=1000, **kwargs):
+        ''' Klines opening between start_str and end_str (epoch milliseconds), both included '''
+        self.calls += 1
+        rows = self.klines.get((symbol, interval), [])
+        open_time = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        start = np.searchsorted(open_time, start_str) if start_str is not None else 0
+        end = np.searchsorted(open_time, end_str, side='right') if end_str is not None else len(rows)
+        self.served += max(end - start, 0)
+        return [list(row) for row in rows[start:end]]
+
+    futures_historical_klines = get_historical_klines
+
+
+def serve_klines(client: FixtureClient, port: int=0, weight: int=1):
+    ''' Serves the klines of a FixtureClient over HTTP on localhost, on the spot and futures kline paths
+
+    Every response carries the X-MBX-USED-WEIGHT-1M header like Binance, counting
+    weight per request since the server started.
+
+    Args:
+        port (int): Port to listen on, 0 picks a free one (see server.server_address)
+        weight (int): Weight added per request
+
+    Returns:
+        server (ThreadingHTTPServer): Running in a daemon thread, stop it with server.shutdown()
+    '''
+    used = {'weight': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path not in ('/api/v3/klines', '/fapi/v1/klines'):
+                self.send_error(404)
+                return
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            start = int(query['startTime']) if 'startTime' in query else None
+            end = int(query['endTime']) if 'endTime' in query else None
+            limit = int(query.get('limit', 500))
+            rows = client.get_historical_klines(query['symbol'], query['interval'], start, end)[:limit]
+            with lock:
+                used['weight'] += weight
+                used_weight = used['weight']
+
+            body = json.dumps(rows).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-MBX-USED-WEIGHT-1M', str(used_weight))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
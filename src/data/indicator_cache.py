@@ -0,0 +1,244 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _digest(name: str) -> str:
+    return hashlib.blake2b(name.encode(), digest_size=8).hexdigest()
+
+
+def _arrays(value) -> tuple:
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _frozen(value):
+    # cached arrays are shared by every reader, none of them may write into them
+    for array in _arrays(value):
+        array.flags.writeable = False
+    return value
+
+
+def _nbytes(value) -> int:
+    return sum(np.asarray(array).nbytes for array in _arrays(value))
+
+
+class IndicatorCache:
+    ''' Content addressed cache of computed indicator values, in memory and on disk
+
+    A value is stored under the name of what was computed (e.g. 'atr(14)', with its
+    params) and the fingerprint of the input arrays it was computed from, so it is
+    found again whenever the same data and params come back, whatever the run. Both
+    levels evict the least recently used values once they hold more than their size.
+
+    Values are arrays or tuples of arrays of the same length, the number of candles.
+    The values of a name are also indexed by their length, so when the data has only
+    grown by new candles the longest cached prefix can be found with prefix and only
+    the tail computed (see indicator_planner.EXTENDERS).
+
+    The disk level is listed once, on its first use, and that index is kept up to date
+    by put and by the evictions, so a lookup opens at most the one file named by name,
+    rows and fingerprint. Files another process writes later are not seen.
+
+    Attributes:
+        root (str): Directory of the disk level, None keeps the values in memory only
+        memory_bytes, disk_bytes (int): Size limits of the two levels
+        hits, misses, extended (int): Lookups served, missed and served from a prefix
+    '''
+    def __init__(self, root: str=None, memory_mb: float=256, disk_mb: float=2048):
+        self.root = root
+        self.memory_bytes = int(memory_mb * 2**20)
+        self.disk_bytes = int(disk_mb * 2**20)
+        self._memory = OrderedDict()   # (name, fingerprint) -> (value, rows, nbytes)
+        self._memory_used = 0
+        self._files = None             # file name -> size, least recently used first, see __index
+        self._names = {}               # name digest -> {fingerprint: rows} of the files
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.extended = 0
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(*arrays) -> str:
+        ''' Hash of the length, dtype and bytes of the arrays, objects hashed by value '''
+        h = hashlib.blake2b(digest_size=16)
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            h.update(f'{array.dtype.str}{array.shape}'.encode())
+            if array.dtype == object:
+                array = pd.util.hash_array(array)
+            h.update(array.view(np.uint8))
+        return h.hexdigest()
+
+    def get(self, name: str, fingerprint: str):
+        ''' Returns the value stored for name and fingerprint, None when there is none '''
+        with self._lock:
+            entry = self._memory.get((name, fingerprint))
+            if entry is not None:
+                self._memory.move_to_end((name, fingerprint))
+                self.hits += 1
+                return entry[0]
+        value = self.__load(name, fingerprint)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, name: str, fingerprint: str, value):
+        ''' Stores a value, in memory and on disk, its arrays become read only '''
+        value = _frozen(value)
+        self.__remember(name, fingerprint, value)
+        if self.root is not None:
+            self.__save(name, fingerprint, value)
+
+    def __remember(self, name, fingerprint, value):
+        key = (name, fingerprint)
+        nbytes = _nbytes(value)
+        with self._lock:
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key)[2]
+            if nbytes <= self.memory_bytes:
+                self._memory[key] = (value, len(_arrays(value)[0]), nbytes)
+                self._memory_used += nbytes
+            while self._memory_used > self.memory_bytes:
+                self._memory_used -= self._memory.popitem(last=False)[1][2]
+
+    def prefix(self, name: str, arrays: list, rows: int):
+        ''' Longest value of name computed on the first candles of the arrays
+
+        Args:
+            arrays (list): Input arrays of the value, their first rows candles are the data now
+            rows (int): Length of the arrays
+
+        Returns:
+            (rows, value): Length and value of the longest cached prefix, None when there is none
+        '''
+        candidates = sorted({(length, fingerprint) for length, fingerprint in self.__entries(name) if 0 < length < rows},
+                            reverse=True)
+        for length, fingerprint in candidates:
+            if self.fingerprint(*[array[:length] for array in arrays]) == fingerprint:
+                value = self.get(name, fingerprint)
+                if value is not None:
+                    with self._lock:
+                        self.extended += 1
+                    return length, value
+        return None
+
+    def __entries(self, name):
+        # (rows, fingerprint) of every value of name, in memory and on disk
+        with self._lock:
+            entries = [(rows, fingerprint) for (key, fingerprint), (_, rows, _) in self._memory.items() if key == name]
+            if self.root is not None:
+                entries.extend((rows, fingerprint) for fingerprint, rows in self.__index().get(_digest(name), {}).items())
+        return entries
+
+    def __index(self):
+        # Files of the disk level, listed once, then kept up to date by __save and __load.
+        # Called with the lock held
+        if self._files is None:
+            self._files = OrderedDict()
+            files = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            # least recently used files first, a hit touches its file
+            for _, file, size in sorted(files):
+                self.__index_file(file, size)
+        return self._names
+
+    def __index_file(self, file, size):
+        digest, rows, fingerprint = file[:-4].split('-')
+        self._disk_used += size - self._files.pop(file, 0)
+        self._files[file] = size
+        self._names.setdefault(digest, {})[fingerprint] = int(rows)
+
+    def __unindex_file(self, file):
+        digest, _, fingerprint = file[:-4].split('-')
+        self._disk_used -= self._files.pop(file, 0)
+        fingerprints = self._names.get(digest, {})
+        fingerprints.pop(fingerprint, None)
+        if not fingerprints:
+            self._names.pop(digest, None)
+
+    def __load(self, name, fingerprint):
+        if self.root is None:
+            return None
+        digest = _digest(name)
+        with self._lock:
+            rows = self.__index().get(digest, {}).get(fingerprint)
+        if rows is None:
+            return None
+        file = f'{digest}-{rows}-{fingerprint}.npz'
+        path = os.path.join(self.root, file)
+        try:
+            with np.load(path) as stored:
+                arrays = tuple(stored[f'arr_{i}'] for i in range(len(stored.files) - 1))
+                value = _frozen(arrays if stored['tuple'] else arrays[0])
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process
+            with self._lock:
+                self.__unindex_file(file)
+            return None
+        except (OSError, ValueError, KeyError):
+            # a file another process is replacing or a broken one, computed again
+            return None
+        with self._lock:
+            if file in self._files:
+                self._files.move_to_end(file)
+        self.__remember(name, fingerprint, value)
+        return value
+
+    def __save(self, name, fingerprint, value):
+        file = f'{_digest(name)}-{len(_arrays(value)[0])}-{fingerprint}.npz'
+        path = os.path.join(self.root, file)
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as f:
+            np.savez(f, *_arrays(value), tuple=isinstance(value, tuple))
+            size = f.tell()
+        os.replace(temp, path)
+
+        with self._lock:
+            self.__index()
+            self.__index_file(file, size)
+            evicted = []
+            while self._disk_used > self.disk_bytes and self._files:
+                oldest = next(iter(self._files))
+                self.__unindex_file(oldest)
+                evicted.append(oldest)
+        for file in evicted:
+            try:
+                os.remove(os.path.join(self.root, file))
+            except FileNotFoundError:
+                continue
+
+    def clear(self):
+        ''' Drops every value, in memory and on disk '''
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            self._files = None
+            self._names = {}
+            self._disk_used = 0
+        if self.root is not None:
+            for entry in os.scandir(self.root):
+                if entry.name.endswith('.npz'):
+                    os.remove(entry.path)
+
+
+def from_config(config: dict):
+    ''' IndicatorCache of the indicator_cache block of config, None unless it is enabled '''
+    options = dict(config.get('indicator_cache') or {})
+    if not options.pop('enabled', False):
+        return None
+    return IndicatorCache(**options)
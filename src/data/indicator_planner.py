@@ -0,0 +1,322 @@
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from src.utils.indicators import bband, ema, macd, rsi, sma, supertrend, true_range, vwap
+from ta.momentum import StochRSIIndicator
+
+HIGH, LOW, CLOSE, VOLUME = ('column', 'High'), ('column', 'Low'), ('column', 'Close'), ('column', 'Volume')
+
+
+def _stoch_rsi(close, window):
+    if np.ndim(close) == 2:
+        return _panel_stoch_rsi(close, window)
+    stochInd = StochRSIIndicator(pd.Series(close), window=window)
+    return stochInd.stochrsi_d().to_numpy(), stochInd.stochrsi_k().to_numpy()
+
+
+def _panel_stoch_rsi(close, window, smooth1=3, smooth2=3):
+    # The steps of RSIIndicator and StochRSIIndicator (without fillna) on a (time x symbol)
+    # array, pandas runs them column by column so every symbol gets its single series values
+    close = pd.DataFrame(close)
+    diff = close.diff(1)
+    emaup = diff.where(diff > 0, 0.0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    emadn = (-diff.where(diff < 0, 0.0)).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    rsi = pd.DataFrame(np.where(emadn == 0, 100, 100 - (100 / (1 + emaup / emadn))))
+    lowest_low_rsi = rsi.rolling(window).min()
+    stochrsi = (rsi - lowest_low_rsi) / (rsi.rolling(window).max() - lowest_low_rsi)
+    stochrsi_k = stochrsi.rolling(smooth1).mean()
+    return stochrsi_k.rolling(smooth2).mean().to_numpy(), stochrsi_k.to_numpy()
+
+
+# Intermediate series are keyed by (kind, *params). For every kind: the keys it depends on
+# and the function computing it from their values followed by the params
+NODES = {
+    'column': (lambda name: (), None),
+    'tr': (lambda: (HIGH, LOW, CLOSE), true_range),
+    'atr': (lambda period: (('tr',),),
+            lambda tr, period: ema(tr, period, alpha=True)),
+    'supertrend': (lambda period, multiplier: (HIGH, LOW, CLOSE, ('atr', period)),
+                   lambda high, low, close, atr, period, multiplier: supertrend(high, low, close, period, multiplier, atr=atr)),
+    'sma': (lambda period: (CLOSE,), sma),
+    'ema': (lambda period: (CLOSE,), ema),
+    'macd': (lambda fast, slow, signal: (CLOSE, ('ema', fast), ('ema', slow)),
+             lambda close, fE, sE, fast, slow, signal: macd(close, fast, slow, signal, fE=fE, sE=sE)),
+    'stoch_rsi': (lambda window: (CLOSE,), _stoch_rsi),
+    'rsi': (lambda period: (CLOSE,), rsi),
+    'vwap': (lambda: (HIGH, LOW, CLOSE, VOLUME), vwap),
+    'bband': (lambda period, multiplier: (CLOSE,), bband),
+}
+
+
+def _extend_ema(previous, values, rows, period, alpha=False):
+    # ewm(adjust=False) carries nothing but its last value from one candle to the next,
+    # so once seeded it goes on from the cached value bit for bit
+    values = np.asarray(values, dtype=np.float64)
+    if rows <= period or np.isnan(previous[rows - 1]) or np.isnan(values[rows - 1]):
+        return None
+    tail = pd.Series(np.concatenate([previous[rows - 1:rows], values[rows:]]))
+    tail = tail.ewm(alpha=1 / period, adjust=False) if alpha else tail.ewm(span=period, adjust=False)
+    return np.concatenate([previous, tail.mean().to_numpy()[1:]])
+
+
+def _extend_macd(previous, rows, close, fE, sE, fast, slow, signal):
+    macd_prefix, sig_prefix, hist_prefix = previous
+    macd_tail = np.where(np.logical_and(np.logical_not(fE[rows:] == 0), np.logical_not(sE[rows:] == 0)),
+                         fE[rows:] - sE[rows:], 0)
+    macd = np.concatenate([macd_prefix, macd_tail])
+    sig = _extend_ema(sig_prefix, macd, rows, signal)
+    if sig is None:
+        return None
+    hist_tail = np.where(np.logical_and(np.logical_not(macd_tail == 0), np.logical_not(sig[rows:] == 0)),
+                         macd_tail - sig[rows:], 0)
+    return macd, sig, np.concatenate([hist_prefix, hist_tail])
+
+
+# Nodes whose value on more candles can be computed from their cached value on the first
+# rows candles and the tail only, function(previous, rows, *inputs, *params) returning
+# the value on all the candles, or None when it has to be computed from scratch. The
+# rolling sums (sma, bband, stoch_rsi) and the recursions keeping more state than their
+# output (supertrend, rsi, vwap) are not in it
+EXTENDERS = {
+    'tr': lambda previous, rows, high, low, close: np.concatenate(
+        [previous, true_range(high[rows - 1:], low[rows - 1:], close[rows - 1:])[1:]]),
+    'atr': lambda previous, rows, tr, period: _extend_ema(previous, tr, rows, period, alpha=True),
+    'ema': lambda previous, rows, close, period: _extend_ema(previous, close, rows, period),
+    'macd': _extend_macd,
+}
+
+
+def _macd_roots(value):
+    try:
+        return [('macd', value['ema_fast'], value['ema_slow'], value['signal'])]
+    except:
+        return [('macd', 12, 26, 9)]
+
+
+# Nodes read by each entry of an indicators config, mirroring Indicators.__get_*
+ROOTS = {
+    'supertrend': lambda value: [('supertrend', value['atr'], value['multiplier'])],
+    'sma': lambda value: [('sma', value)],
+    'ema': lambda value: [('ema', value)],
+    'macd': _macd_roots,
+    'stoch_rsi': lambda value: [('stoch_rsi', value)],
+    'rsi': lambda value: [('rsi', value['rsi'])],
+    'vwap': lambda value: [('vwap',)],
+    'bband': lambda value: [('bband', value['period'], value['multiplier'])],
+    'atr': lambda value: [('atr', value['atr'])],
+}
+
+
+def node_dependencies(key: tuple) -> tuple:
+    ''' Returns the keys of the nodes the given node is computed from '''
+    return NODES[key[0]][0](*key[1:])
+
+
+def compute_node(key: tuple, df: pd.DataFrame, inputs: list):
+    ''' Computes a node from the values of its dependencies
+
+    Args:
+        key (tuple): Node to compute
+        df (pd.DataFrame): Dataframe with OHLCV data, read by the column nodes
+        inputs (list): Values of node_dependencies(key), in the same order
+    '''
+    if key[0] == 'column':
+        return df[key[1]].to_numpy(dtype=np.float64)
+    return NODES[key[0]][1](*inputs, *key[1:])
+
+
+def node_name(key: tuple) -> str:
+    if key[0] == 'column':
+        return key[1]
+    return f"{key[0]}({', '.join(map(str, key[1:]))})"
+
+
+class IndicatorPlan:
+    ''' Dependency graph of the intermediate series needed by an indicators config
+
+    Every intermediate (True Range, ATR, EMAs, SuperTrend, ...) is a node computed once,
+    however many config entries read it. Independent branches of the graph are evaluated
+    in parallel on a thread pool, numpy and pandas release the GIL for the heavy parts.
+
+    Attributes:
+        roots (dict): Config entry -> nodes it reads
+        nodes (dict): Node -> dependencies, in topological order
+        columns (dict): Node -> OHLCV columns it is computed from, directly or not
+        users (dict): Node -> config entries depending on it, directly or not
+        timings (dict): Node -> seconds taken by its last computation
+    '''
+    def __init__(self, indicators: dict):
+        self.roots = {}
+        self.nodes = {}
+        for parameter, value in indicators.items():
+            indicator = parameter.split('-')[0]
+            if indicator not in ROOTS:
+                continue
+            try:
+                keys = ROOTS[indicator](value)
+                for key in keys:
+                    self.__add(key)
+            except (KeyError, TypeError):
+                # malformed entries are left to Indicators, which raises or skips them
+                continue
+            self.roots[parameter] = keys
+
+        self.columns = {}
+        for key, dependencies in self.nodes.items():
+            # dependencies come first in self.nodes
+            names = {key[1]} if key[0] == 'column' else set()
+            for dependency in dependencies:
+                names.update(self.columns[dependency])
+            self.columns[key] = tuple(sorted(names))
+
+        self.users = {key: set() for key in self.nodes}
+        for parameter, keys in self.roots.items():
+            stack = list(keys)
+            while stack:
+                key = stack.pop()
+                if parameter not in self.users[key]:
+                    self.users[key].add(parameter)
+                    stack.extend(self.nodes[key])
+
+        self.timings = {}
+        self.wall_time = None
+
+    def __add(self, key: tuple):
+        if key in self.nodes:
+            return
+        dependencies = node_dependencies(key)
+        for dependency in dependencies:
+            self.__add(dependency)
+        self.nodes[key] = dependencies
+
+    def __compute(self, key, df, inputs, cache=None, columns=None, fingerprint=None):
+        start = time.perf_counter()
+        if cache is None:
+            value = compute_node(key, df, inputs)
+        else:
+            name = node_name(key)
+            value = cache.get(name, fingerprint)
+            if value is None:
+                if key[0] in EXTENDERS:
+                    found = cache.prefix(name, columns, len(columns[0]))
+                    if found is not None:
+                        value = EXTENDERS[key[0]](found[1], found[0], *inputs, *key[1:])
+                if value is None:
+                    value = compute_node(key, df, inputs)
+                cache.put(name, fingerprint, value)
+        return value, time.perf_counter() - start
+
+    def execute(self, df: pd.DataFrame, workers: int=None, shared: dict=None, cache=None) -> dict:
+        ''' Computes every node of the plan
+
+        Args:
+            df (pd.DataFrame): Dataframe with OHLCV data
+            workers (int): Size of the thread pool, 1 evaluates the nodes one after the other
+            shared (dict): Nodes computed earlier, they are not computed again
+            cache (IndicatorCache): Values of earlier runs, looked up by node and fingerprint
+                of its OHLCV columns, and extended from a cached prefix when the candles
+                were only appended to (see EXTENDERS)
+
+        Returns:
+            results (dict): Node -> value, including the given shared nodes
+        '''
+        start = time.perf_counter()
+        results = dict(shared or {})
+        fingerprints = {}
+
+        def arguments(key):
+            # inputs of a node, and what the cache needs to look it up
+            inputs = [results[dep] for dep in self.nodes[key]]
+            if cache is None or key[0] == 'column':
+                return key, df, inputs
+            names = self.columns[key]
+            columns = [results[('column', name)] for name in names]
+            if names not in fingerprints:
+                fingerprints[names] = cache.fingerprint(*columns)
+            return key, df, inputs, cache, columns, fingerprints[names]
+        pending = {key: set(deps) - results.keys() for key, deps in self.nodes.items() if key not in results}
+
+        def ready():
+            keys = [key for key, deps in pending.items() if not deps]
+            for key in keys:
+                del pending[key]
+            return keys
+
+        def done(key, value, seconds):
+            results[key] = value
+            self.timings[key] = seconds
+            for deps in pending.values():
+                deps.discard(key)
+
+        if workers == 1:
+            while pending:
+                for key in ready():
+                    done(key, *self.__compute(*arguments(key)))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                running = {}
+                while pending or running:
+                    for key in ready():
+                        if key[0] == 'column':
+                            done(key, *self.__compute(key, df, []))
+                            continue
+                        running[pool.submit(self.__compute, *arguments(key))] = key
+                    if not running:
+                        continue
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done(running.pop(future), *future.result())
+
+        self.wall_time = time.perf_counter() - start
+        return results
+
+    def explain(self) -> str:
+        ''' Describes which nodes are shared between config entries and the time it saved '''
+        rows = []
+        for key in self.nodes:
+            if key[0] == 'column':
+                continue
+            seconds = self.timings.get(key, np.nan)
+            uses = len(self.users[key])
+            rows.append((node_name(key), uses, ', '.join(sorted(self.users[key])), seconds, seconds * (uses - 1)))
+        table = pd.DataFrame(rows, columns=['node', 'uses', 'used by', 'seconds', 'saved'])
+
+        node_time = table['seconds'].sum()
+        lines = [table.to_string(index=False), '']
+        lines.append(f"shared nodes: {(table['uses'] > 1).sum()} of {len(table)}, "
+                     f"computations skipped: {int((table['uses'] - 1).sum())}")
+        lines.append(f"time saved by sharing: {table['saved'].sum():.4f}s")
+        if self.wall_time is not None:
+            lines.append(f"node time: {node_time:.4f}s, wall time: {self.wall_time:.4f}s, "
+                         f"saved by parallel branches: {max(node_time - self.wall_time, 0):.4f}s")
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import yaml
+
+    from src.data.synthetic import synthetic_ohlcv
+
+    parser = argparse.ArgumentParser(description='Plans and computes the indicators of a strategy config block')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--strategy', help='config block to plan, defaults to strategy_name')
+    parser.add_argument('--csv', help='OHLCV csv to compute on, synthetic candles are used otherwise')
+    parser.add_argument('--rows', type=int, default=100000, help='number of synthetic candles')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--explain', action='store_true', help='print the shared nodes and the time saved')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    df = pd.read_csv(args.csv) if args.csv else synthetic_ohlcv(args.rows)
+
+    plan = IndicatorPlan(config[args.strategy or config['strategy_name']])
+    plan.execute(df, workers=args.workers)
+    if args.explain:
+        print(plan.explain())
+    else:
+        print(f'{len(plan.nodes)} nodes computed in {plan.wall_time:.4f}s')
@@ -0,0 +1,282 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+
+from .compact import COMPACT_FLOAT
+
+# Stored columns and their dtypes, one raw file per column
+FIELDS = [('open_time', np.int64), ('Open', np.float64), ('High', np.float64),
+          ('Low', np.float64), ('Close', np.float64), ('Volume', np.float64)]
+
+
+def parse_klines(klines: list) -> dict:
+    ''' Converts Binance kline rows into column arrays in one bulk conversion
+
+    Returns:
+        columns (dict): open_time int64 epoch milliseconds and OHLCV float64 arrays
+    '''
+    if not klines:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in FIELDS}
+    open_time = np.array([kline[0] for kline in klines], dtype=np.int64)
+    prices = np.array([kline[1:6] for kline in klines], dtype=np.float64)
+    columns = {'open_time': open_time}
+    for i, (name, _) in enumerate(FIELDS[1:]):
+        columns[name] = prices[:, i]
+    return columns
+
+
+def _holes(open_time, interval: str) -> list:
+    # (first, last) open times of every run of candles missing between two stored ones
+    step = interval_to_milliseconds(interval)
+    if step is None or len(open_time) < 2:
+        # monthly candles have no fixed duration
+        return []
+    open_time = np.asarray(open_time, dtype=np.int64)
+    rows = np.flatnonzero(np.diff(open_time) > step)
+    return [(int(open_time[i]) + step, int(open_time[i + 1]) - step) for i in rows]
+
+
+def _union(spans: list) -> list:
+    # sorted (first, last) spans with the overlapping and touching ones joined
+    joined = []
+    for first, last in sorted(spans):
+        if joined and first <= joined[-1][1] + 1:
+            joined[-1][1] = max(joined[-1][1], last)
+        else:
+            joined.append([first, last])
+    return joined
+
+
+class KlineStore:
+    ''' Local candle store, one directory per (symbol, interval)
+
+    Every column is a raw little endian file read back with np.memmap, and meta.json
+    records how many rows are valid and the first and last open times. New candles are
+    appended to the files, so a sync only downloads the candles after the last stored one,
+    before the first one and in the holes between them. Candles inserted before the last
+    one rewrite the columns as a new generation of files, and the meta switching to it is
+    replaced in one step, so an interrupted merge leaves the store as it was.
+
+    meta.json also keeps the ranges the exchange had no candle in (an outage, a listing
+    pause), so they are not taken for holes by gaps and read.
+
+    Attributes:
+        root (str): Directory holding the store
+        client: Binance client (or FixtureClient) used to sync, created on first use
+    '''
+    def __init__(self, root: str='data/ohlc/store', client=None):
+        self.root = root
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from binance.client import Client
+            self._client = Client('API_KEY', 'API_SECRET')
+        return self._client
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol, interval)
+
+    def __column_path(self, symbol, interval, name, generation):
+        # the files written before merges had generations have none in their name
+        return os.path.join(self.path(symbol, interval), f'{name}.{generation}.bin' if generation else f'{name}.bin')
+
+    def meta(self, symbol: str, interval: str) -> dict:
+        ''' Returns rows, first_open_time and last_open_time of a stored (symbol, interval) '''
+        try:
+            with open(os.path.join(self.path(symbol, interval), 'meta.json'), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'first_open_time': None, 'last_open_time': None}
+
+    def __write_meta(self, symbol, interval, meta):
+        path = os.path.join(self.path(symbol, interval), 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def append(self, symbol: str, interval: str, columns: dict) -> int:
+        ''' Appends candles newer than the last stored one
+
+        Args:
+            columns (dict): open_time and OHLCV arrays sorted by open time, see parse_klines
+
+        Returns:
+            rows (int): Number of candles appended
+        '''
+        meta = self.meta(symbol, interval)
+        open_time = np.asarray(columns['open_time'], dtype=np.int64)
+        start = 0 if meta['last_open_time'] is None else np.searchsorted(open_time, meta['last_open_time'], side='right')
+        if start == len(open_time):
+            return 0
+
+        os.makedirs(self.path(symbol, interval), exist_ok=True)
+        for name, dtype in FIELDS:
+            with open(self.__column_path(symbol, interval, name, meta.get('generation', 0)), 'ab') as f:
+                # bytes past the recorded rows are left by an interrupted append
+                f.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(columns[name][start:], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+
+        meta = {
+            **meta,
+            'rows': meta['rows'] + len(open_time) - int(start),
+            'first_open_time': meta['first_open_time'] if meta['first_open_time'] is not None else int(open_time[start]),
+            'last_open_time': int(open_time[-1]),
+        }
+        self.__write_meta(symbol, interval, meta)
+        return len(open_time) - int(start)
+
+    def merge(self, symbol: str, interval: str, columns: dict, fetched: list=()) -> int:
+        ''' Adds the candles whose open time is not stored yet
+
+        Candles newer than the last stored one are appended. Older ones (before the first
+        stored candle or in a hole) rewrite the columns once, into files of a new
+        generation that the meta switches to last.
+
+        Args:
+            columns (dict): open_time and OHLCV arrays sorted by open time, see parse_klines
+            fetched (list): (start, end) open time ranges the candles were requested for, the
+                holes left inside them are recorded as ranges the exchange has no candle in
+
+        Returns:
+            rows (int): Number of candles added
+        '''
+        meta = self.meta(symbol, interval)
+        open_time = np.asarray(columns['open_time'], dtype=np.int64)
+        if meta['last_open_time'] is None or not len(open_time) or open_time[0] > meta['last_open_time']:
+            added = self.append(symbol, interval, columns)
+        else:
+            stored = self.arrays(symbol, interval)
+            new = ~np.isin(open_time, stored['open_time'])
+            if new[open_time <= meta['last_open_time']].any():
+                merged = {name: np.concatenate([stored[name], np.asarray(columns[name], dtype=dtype)[new]])
+                          for name, dtype in FIELDS}
+                del stored
+                order = np.argsort(merged['open_time'], kind='stable')
+                generation = meta.get('generation', 0) + 1
+                for name, dtype in FIELDS:
+                    merged[name][order].astype(np.dtype(dtype).newbyteorder('<')).tofile(
+                        self.__column_path(symbol, interval, name, generation))
+                self.__write_meta(symbol, interval, {
+                    **meta, 'rows': len(order), 'generation': generation,
+                    'first_open_time': int(merged['open_time'][order[0]]),
+                    'last_open_time': int(merged['open_time'][order[-1]]),
+                })
+                # the files of the older generations, and of a merge interrupted before its meta
+                current = {os.path.basename(self.__column_path(symbol, interval, name, generation)) for name, _ in FIELDS}
+                for file in os.listdir(self.path(symbol, interval)):
+                    if file.endswith('.bin') and file not in current:
+                        os.remove(os.path.join(self.path(symbol, interval), file))
+                added = int(new.sum())
+            else:
+                del stored
+                added = self.append(symbol, interval, columns)
+
+        empty = [(first, last) for start, end in fetched for first, last in self.__holes(symbol, interval, start, end)
+                 if start <= first and last <= end]
+        if empty:
+            meta = self.meta(symbol, interval)
+            self.__write_meta(symbol, interval, {**meta, 'empty': _union(meta.get('empty', []) + empty)})
+        return added
+
+    def gaps(self, symbol: str, interval: str, start: int=None, end: int=None) -> list:
+        ''' Runs of candles missing between two stored candles, overlapping [start, end]
+
+        The ranges the exchange had no candle in (see merge) are not gaps.
+
+        Returns:
+            gaps (list): (first, last) open times of every run of missing candles
+        '''
+        empty = self.meta(symbol, interval).get('empty', [])
+        return [(first, last) for first, last in self.__holes(symbol, interval, start, end)
+                if not any(low <= first and last <= high for low, high in empty)]
+
+    def __holes(self, symbol, interval, start, end):
+        # holes overlapping [start, end], with the stored candles on both sides of the range
+        open_time = self.arrays(symbol, interval)['open_time']
+        lo = 0 if start is None else max(np.searchsorted(open_time, start) - 1, 0)
+        hi = len(open_time) if end is None else np.searchsorted(open_time, end, side='right') + 1
+        return [(first, last) for first, last in _holes(open_time[lo:hi], interval)
+                if (start is None or last >= start) and (end is None or first <= end)]
+
+    def sync(self, symbol: str, interval: str, start: int, end: int=None) -> int:
+        ''' Downloads the candles of [start, end] missing from the store
+
+        Only the candles before the first stored one, in the gaps between the stored ones
+        and after the last stored one are requested, so the store stays contiguous from
+        its first candle to its last. Candles still open at the time of the sync are not
+        stored.
+
+        Args:
+            start, end (int): Open time range in epoch milliseconds, end defaults to now
+
+        Returns:
+            rows (int): Number of candles added
+        '''
+        now = int(time.time() * 1000)
+        end = now if end is None else end
+        meta = self.meta(symbol, interval)
+        added = 0
+
+        if meta['first_open_time'] is not None and start < meta['first_open_time']:
+            head = (start, meta['first_open_time'] - 1)
+            added += self.merge(symbol, interval, parse_klines(self.client.get_historical_klines(symbol, interval, *head)),
+                                fetched=[head])
+
+        for gap in self.gaps(symbol, interval, start, end):
+            added += self.merge(symbol, interval, parse_klines(self.client.get_historical_klines(symbol, interval, *gap)),
+                                fetched=[gap])
+
+        if meta['last_open_time'] is None or meta['last_open_time'] < end:
+            # from the last stored candle whatever start is, a later start would leave a hole
+            since = start if meta['last_open_time'] is None else meta['last_open_time'] + 1
+            klines = self.client.get_historical_klines(symbol, interval, since, end)
+            # the close time of a kline is its 7th field
+            klines = [kline for kline in klines if kline[6] < now]
+            added += self.merge(symbol, interval, parse_klines(klines), fetched=[(since, end)])
+        return added
+
+    def arrays(self, symbol: str, interval: str, start: int=None, end: int=None) -> dict:
+        ''' Stored columns with an open time in [start, end], as read only memmap views
+
+        Returns:
+            columns (dict): open_time and OHLCV arrays, empty arrays when nothing is stored
+        '''
+        meta = self.meta(symbol, interval)
+        rows = meta['rows']
+        if rows == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in FIELDS}
+
+        columns = {name: np.memmap(self.__column_path(symbol, interval, name, meta.get('generation', 0)),
+                                   dtype=np.dtype(dtype).newbyteorder('<'), mode='r', shape=(rows,))
+                   for name, dtype in FIELDS}
+        lo = 0 if start is None else np.searchsorted(columns['open_time'], start)
+        hi = rows if end is None else np.searchsorted(columns['open_time'], end, side='right')
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def read(self, symbol: str, interval: str, start: int=None, end: int=None, compact: bool=False,
+             allow_gaps: bool=False) -> pd.DataFrame:
+        ''' Stored candles with an open time in [start, end], no network access
+
+        Args:
+            compact (bool): OHLCV as float32 instead of float64, see src.data.compact
+            allow_gaps (bool): Return the candles even when some are missing between them,
+                otherwise a ValueError lists the gaps (see gaps, sync fills them)
+
+        Returns:
+            df (pd.DataFrame): Dataframe with Date, Open, High, Low, Close and Volume columns
+        '''
+        if not allow_gaps:
+            gaps = self.gaps(symbol, interval, start, end)
+            if gaps:
+                raise ValueError(f'{symbol} {interval} is missing the candles of {len(gaps)} ranges, '
+                                 f'the first opening from {gaps[0][0]} to {gaps[0][1]}, sync them or read with allow_gaps')
+        columns = self.arrays(symbol, interval, start, end)
+        df = pd.DataFrame({name: np.array(values, dtype=COMPACT_FLOAT if compact and dtype == np.float64 else dtype)
+                           for (name, dtype), values in zip(FIELDS, columns.values())})
+        return df.rename(columns={'open_time': 'Date'})
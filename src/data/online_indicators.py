@@ -0,0 +1,259 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.data.indicator_planner import ROOTS, IndicatorPlan
+from ta.utils import RollingMean, RollingMinMax, RollingVar, RunningEWM, _divide
+
+# Online counterparts of the array helpers of src.utils.indicators. Each state takes the
+# values of one more candle and returns the value of the helper on that candle, bit for
+# bit, in O(1) (or O(window) for the first values)
+
+
+class EMAState:
+    ''' ema(values, period, alpha), seeded with the SMA of the first period values '''
+    def __init__(self, period: int, alpha: bool=False):
+        self.period = period
+        self.count = 0
+        self.seed = RollingMean(period)
+        self.ewm = RunningEWM(alpha=1 / period) if alpha else RunningEWM(span=period)
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.seed.update(value)
+            value = math.nan
+        elif self.count == self.period:
+            value = self.seed.update(value)
+        return self.ewm.update(value)
+
+
+class TrueRangeState:
+    ''' true_range(high, low, close) '''
+    def __init__(self):
+        self.prev_close = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return tr
+
+
+class SuperTrendState:
+    ''' supertrend(high, low, close, period, multiplier, atr=atr), returns (band, direction) '''
+    def __init__(self, period: int, multiplier: float):
+        self.period = period
+        self.multiplier = multiplier
+        self.count = 0
+        self.final_ub = self.final_lb = self.st = self.close = 0.00
+
+    def update(self, high: float, low: float, close: float, atr: float):
+        basic_ub = (high + low) / 2 + self.multiplier * atr
+        basic_lb = (high + low) / 2 - self.multiplier * atr
+
+        if self.count >= self.period:
+            final_ub = basic_ub if basic_ub < self.final_ub or self.close > self.final_ub else self.final_ub
+            final_lb = basic_lb if basic_lb > self.final_lb or self.close < self.final_lb else self.final_lb
+
+            if self.st == self.final_ub and close <= final_ub:
+                st = final_ub
+            elif self.st == self.final_ub and close > final_ub:
+                st = final_lb
+            elif self.st == self.final_lb and close >= final_lb:
+                st = final_lb
+            elif self.st == self.final_lb and close < final_lb:
+                st = final_ub
+            else:
+                st = 0.00
+        else:
+            final_ub = final_lb = st = 0.00
+
+        direction = (-1 if close < st else 1) if st > 0.00 else 0
+        band = st if self.count >= self.period else math.nan
+        self.final_ub, self.final_lb, self.st, self.close = final_ub, final_lb, st, close
+        self.count += 1
+        return band, direction
+
+
+class SMAState:
+    ''' sma(values, period), 0 until the window is full '''
+    def __init__(self, period: int):
+        self.mean = RollingMean(period)
+
+    def update(self, value: float) -> float:
+        value = self.mean.update(value)
+        return 0.0 if value != value else value
+
+
+class MACDState:
+    ''' macd(values, fastEMA, slowEMA, signal) from the fast and slow EMAs, returns (macd, signal, hist) '''
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.signal = EMAState(signal)
+
+    def update(self, close: float, fast: float, slow: float):
+        macd = fast - slow if not fast == 0 and not slow == 0 else 0.0
+        signal = self.signal.update(macd)
+        hist = macd - signal if not macd == 0 and not signal == 0 else 0.0
+        return macd, signal, hist
+
+
+class StochRSIState:
+    ''' ta.momentum.StochRSIIndicator(close, window, smooth1, smooth2), returns (stochrsi_d, stochrsi_k) '''
+    def __init__(self, window: int, smooth1: int=3, smooth2: int=3):
+        self.prev_close = None
+        self.up = RunningEWM(alpha=1 / window, min_periods=window)
+        self.down = RunningEWM(alpha=1 / window, min_periods=window)
+        self.lowest = RollingMinMax(window, 'min')
+        self.highest = RollingMinMax(window, 'max')
+        self.k = RollingMean(smooth1)
+        self.d = RollingMean(smooth2)
+
+    def update(self, close: float):
+        diff = close - self.prev_close if self.prev_close is not None else math.nan
+        self.prev_close = close
+        emaup = self.up.update(diff if diff > 0 else 0.0)
+        emadn = self.down.update(-(diff if diff < 0 else 0.0))
+        rsi = 100.0 if emadn == 0 else 100 - (100 / (1 + _divide(emaup, emadn)))
+
+        lowest = self.lowest.update(rsi)
+        stochrsi = _divide(rsi - lowest, self.highest.update(rsi) - lowest)
+        k = self.k.update(stochrsi)
+        return self.d.update(k), k
+
+
+class RSIState:
+    ''' rsi(values, period), 0 where it is undefined '''
+    def __init__(self, period: int):
+        self.prev_close = None
+        self.up = RunningEWM(com=period - 1)
+        self.down = RunningEWM(com=period - 1)
+
+    def update(self, close: float) -> float:
+        delta = close - self.prev_close if self.prev_close is not None else math.nan
+        self.prev_close = close
+        up = self.up.update(0.0 if delta < 0 else delta)
+        down = abs(self.down.update(0.0 if delta > 0 else delta))
+        value = 100 - _divide(100, 1 + _divide(up, down))
+        return 0.0 if value != value else value
+
+
+class VWAPState:
+    ''' vwap(high, low, close, volume), cumulated from the first candle '''
+    def __init__(self):
+        self.pv = 0.0
+        self.volume = 0.0
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        self.pv += (low + close + high) / 3 * volume
+        self.volume += volume
+        return _divide(self.pv, self.volume)
+
+
+class BBandState:
+    ''' bband(values, period, multiplier), returns (upper, lower) '''
+    def __init__(self, period: int, multiplier: float):
+        self.multiplier = multiplier
+        self.mean = RollingMean(period, period - 1)
+        self.var = RollingVar(period)
+
+    def update(self, value: float):
+        mean = self.mean.update(value)
+        self.var.update(value)
+        sd = self.var.std
+        return mean + (self.multiplier * sd), mean - (self.multiplier * sd)
+
+
+# State of each node kind of the indicator planner, updated with the values of the node's dependencies
+STATES = {
+    'tr': TrueRangeState,
+    'atr': lambda period: EMAState(period, alpha=True),
+    'supertrend': SuperTrendState,
+    'sma': SMAState,
+    'ema': EMAState,
+    'macd': MACDState,
+    'stoch_rsi': StochRSIState,
+    'rsi': RSIState,
+    'vwap': VWAPState,
+    'bband': BBandState,
+}
+
+
+class OnlineIndicators:
+    ''' Incremental counterpart of Indicators.get_indicators for one strategy config block
+
+    The intermediates of the indicator planner (True Range, ATR, EMAs, SuperTrend, ...)
+    are kept as states updated once per closed candle, in dependency order, so a new
+    candle costs the same whatever the length of the history. The columns returned for
+    a candle equal the row get_indicators gives on the whole history.
+
+    Attributes:
+        columns (list): Indicator column names, in the order of get_indicators
+    '''
+    def __init__(self, indicators: dict):
+        self.entries = []
+        for parameter, value in indicators.items():
+            indicator, _, num = parameter.partition('-')
+            if indicator not in ROOTS:
+                if num:
+                    raise KeyError(indicator)
+                continue
+            self.entries.append((indicator, num or 0, ROOTS[indicator](value)))
+
+        plan = IndicatorPlan(indicators)
+        self.nodes = {key: deps for key, deps in plan.nodes.items() if key[0] != 'column'}
+        self.states = {key: STATES[key[0]](*key[1:]) for key in self.nodes}
+        self.values = {}
+        self.columns = None
+
+    def update(self, candle: dict) -> dict:
+        ''' Absorbs one closed candle
+
+        Args:
+            candle (dict): Open, High, Low, Close and Volume of the candle
+
+        Returns:
+            columns (dict): Indicator values on the candle, named like the get_indicators columns
+        '''
+        values = self.values
+        for column in ('High', 'Low', 'Close', 'Volume'):
+            values[('column', column)] = float(candle[column])
+        for key, dependencies in self.nodes.items():
+            values[key] = self.states[key].update(*[values[dependency] for dependency in dependencies])
+
+        columns = {}
+        for indicator, num, keys in self.entries:
+            value = values[keys[0]]
+            suffix = f'_{num}' if num != 0 else ''
+            if indicator == 'supertrend':
+                band, direction = value
+                columns[f'ST{suffix}'] = band
+                columns[f'STX{suffix}'] = None if direction == 0 else ('down' if direction < 0 else 'up')
+            elif indicator in ('sma', 'ema'):
+                columns[f'{indicator.upper()}{suffix}'] = value
+            elif indicator == 'macd':
+                columns.update(zip(['MACD', 'Signal', 'Hist'], value))
+            elif indicator == 'stoch_rsi':
+                columns['sRSI_d'], columns['sRSI_k'] = value[0] * 100, value[1] * 100
+            elif indicator == 'bband':
+                columns['UpperBB'], columns['LowerBB'] = value
+            else:
+                columns[indicator.upper()] = value
+        self.columns = list(columns)
+        return columns
+
+    def row(self, candle: dict) -> pd.Series:
+        ''' Absorbs one closed candle and returns its row as df.iloc[i] of get_indicators would
+
+        Numbers are numpy scalars, like in the batch rows, since strategies round them.
+        '''
+        columns = self.update(candle)
+        values = {'Date': np.int64(candle['Date'])}
+        for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+            values[column] = np.float64(candle[column])
+        for name, value in columns.items():
+            values[name] = np.float64(value) if isinstance(value, float) else value
+        return pd.Series(values, dtype=object)
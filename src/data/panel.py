@@ -0,0 +1,130 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data.calculate_indicators import Indicators
+from src.data.indicator_planner import IndicatorPlan
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def build_panel(frames: dict, on: str='Date') -> dict:
+    ''' Aligns the OHLCV frames of several symbols on the union of their times
+
+    Args:
+        frames (dict): Symbol -> Dataframe with OHLCV data
+        on (str): Time column the frames are aligned on
+
+    Returns:
+        panel (dict): OHLCV column name -> (time x symbol) Dataframe, NaN where a symbol
+            has no candle (before its listing, after its delisting or in its gaps)
+    '''
+    indexed = {symbol: df.set_index(on) for symbol, df in frames.items()}
+    times = pd.Index(np.unique(np.concatenate([df.index.to_numpy() for df in indexed.values()])), name=on)
+    return {field: pd.DataFrame({symbol: df[field].reindex(times) for symbol, df in indexed.items()},
+                                index=times, dtype=np.float64)
+            for field in FIELDS}
+
+
+def store_panel(store, symbols: list, interval: str, start: int=None, end: int=None) -> dict:
+    ''' build_panel of the candles a KlineStore holds for the symbols, no network access '''
+    return build_panel({symbol: store.read(symbol, interval, start, end, allow_gaps=True) for symbol in symbols})
+
+
+def _first_rows(close: np.ndarray) -> np.ndarray:
+    # first row with a close of every symbol, the number of rows for the empty ones
+    valid = ~np.isnan(close)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(close))
+
+
+def _align(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    # moves every column up so that it starts on its first candle, padded with NaN at the end
+    rows = np.arange(len(values))[:, None] + starts[None, :]
+    aligned = np.take_along_axis(values, np.minimum(rows, len(values) - 1), axis=0)
+    aligned[rows >= len(values)] = np.nan
+    return aligned
+
+
+def _restore(values: np.ndarray, starts: np.ndarray, fill) -> np.ndarray:
+    # inverse of _align, the rows before the first candle of a symbol get fill
+    rows = np.arange(len(values))[:, None] - starts[None, :]
+    restored = np.take_along_axis(values, np.maximum(rows, 0), axis=0)
+    if restored.dtype.kind != 'f' and fill is not None and fill != fill:
+        restored = restored.astype(np.float64)
+    restored[rows < 0] = fill
+    return restored
+
+
+def panel_indicators(panel: dict, indicators: dict, workers: int=None) -> dict:
+    ''' Computes the indicators of a config block for every symbol of a panel at once
+
+    Each intermediate of the IndicatorPlan (True Range, ATR, EMAs, SuperTrend, RSI,
+    StochRSI, Bollinger, MACD, ...) is computed once, column wise over the whole
+    (time x symbol) array, instead of once per symbol. The columns are moved to start
+    on the first candle of their symbol beforehand, so a symbol listed later gets the
+    same values as get_indicators on its own candles, warm up included.
+
+    Args:
+        panel (dict): OHLCV column name -> (time x symbol) Dataframe, see build_panel
+        indicators (dict): Dictionary with the indicators to calculate
+        workers (int): Threads evaluating the dependency graph, 1 disables the parallelism
+
+    Returns:
+        result (dict): Indicator column name (the ones of get_indicators) -> (time x symbol)
+            Dataframe, NaN (None for the STX labels) where the symbol has no candle, so
+            result[name].rank(axis=1) ranks the symbols at each time
+    '''
+    close = panel['Close']
+    starts = _first_rows(close.to_numpy(dtype=np.float64))
+    aligned = {field: pd.DataFrame(_align(frame.to_numpy(dtype=np.float64), starts))
+               for field, frame in panel.items()}
+
+    plan = IndicatorPlan(indicators)
+    columns = Indicators().get_columns(aligned, indicators, shared=plan.execute(aligned, workers=workers))
+
+    missing = close.isna().to_numpy()
+    result = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        fill = np.nan if values.dtype.kind in 'fiub' else None
+        values = _restore(values, starts, fill)
+        values[missing] = fill
+        result[name] = pd.DataFrame(values, index=close.index, columns=close.columns)
+    return result
+
+
+def cross_section(result: dict, time) -> pd.DataFrame:
+    ''' Indicator values of every symbol at one time of a panel_indicators result
+
+    Returns:
+        df (pd.DataFrame): Symbol -> one column per indicator
+    '''
+    return pd.DataFrame({name: frame.loc[time] for name, frame in result.items()})
+
+
+if __name__ == '__main__':
+    import yaml
+
+    from src.data.synthetic import synthetic_ohlcv
+
+    parser = argparse.ArgumentParser(description='Computes the indicators of a config block on a panel of symbols')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--strategy', help='config block to compute, defaults to strategy_name')
+    parser.add_argument('--symbols', type=int, default=50, help='number of synthetic symbols')
+    parser.add_argument('--rows', type=int, default=10000, help='number of synthetic candles per symbol')
+    parser.add_argument('--rank', default='sRSI_k', help='indicator column ranking the symbols on the last candle')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    panel = build_panel({f'SYM{i}': synthetic_ohlcv(args.rows, seed=i) for i in range(args.symbols)})
+
+    start = time.perf_counter()
+    result = panel_indicators(panel, config[args.strategy or config['strategy_name']], workers=args.workers)
+    print(f'{len(result)} columns for {args.symbols} symbols computed in {time.perf_counter() - start:.4f}s')
+    if args.rank in result:
+        last = cross_section(result, panel['Close'].index[-1])
+        print(last.sort_values(args.rank, ascending=False).head(10).to_string())
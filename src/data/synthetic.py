@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_ohlcv(rows: int, seed: int=0, start: int=1672531200000, interval_ms: int=60000):
+    ''' Generates a random walk OHLCV frame shaped like get_historic_data's output
+
+    Args:
+        rows (int): Number of candles
+        seed (int): Seed of the random generator
+        start (int): Open time of the first candle in epoch milliseconds
+        interval_ms (int): Milliseconds between two candles
+
+    Returns:
+        df (pd.DataFrame): Dataframe with Date (int64 epoch milliseconds), Open, High, Low, Close and Volume columns
+    '''
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, rows)))
+    open_ = np.empty(rows)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, 0.001, (2, rows))) * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    volume = rng.gamma(2.0, 500.0, rows)
+
+    open_time = start + np.arange(rows, dtype=np.int64) * interval_ms
+    return pd.DataFrame({
+        'Date': open_time,
+        'Open': open_.round(4),
+        'High': high.round(4),
+        'Low': low.round(4),
+        'Close': close.round(4),
+        'Volume': volume.round(2),
+    })
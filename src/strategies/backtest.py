@@ -0,0 +1,219 @@
+import numpy as np
+
+LONG, SHORT = 1, -1
+EXIT_MODES = ('close', 'high_low')
+TIE_BREAKS = ('stop_loss', 'take_profit', 'open')
+
+# One row per closed trade, written in place by simulate and settle
+TRADE_DTYPE = np.dtype([
+    ('entry_index', np.int64),
+    ('exit_index', np.int64),
+    ('side', np.int8),
+    ('entry', np.float64),
+    ('stop_loss', np.float64),
+    ('take_profit', np.float64),
+    ('exit', np.float64),
+    ('profit', np.bool_),
+    ('pnl_percent', np.float64),
+    ('pnl', np.float64),
+    ('balance', np.float64),
+])
+
+
+def empty_signals(n: int) -> dict:
+    ''' Entry signal arrays with no signal on any of the n candles
+
+    side is LONG, SHORT or 0, the prices are NaN where there is no signal
+    '''
+    return {
+        'side': np.zeros(n, dtype=np.int8),
+        'entry': np.full(n, np.nan),
+        'stop_loss': np.full(n, np.nan),
+        'take_profit': np.full(n, np.nan),
+    }
+
+
+def _resolve_tie(bars: dict, i: int, side: int, stop_loss: float, take_profit: float, tie_break: str, drilldown):
+    # Both levels are inside candle i: a gap through a level at the open decides it,
+    # then the lower timeframe candles if there are any, then the tie break policy
+    open_ = bars['Open'][i]
+    if (side == LONG and open_ >= take_profit) or (side == SHORT and open_ <= take_profit):
+        return True
+    if (side == LONG and open_ <= stop_loss) or (side == SHORT and open_ >= stop_loss):
+        return False
+
+    lower = drilldown(i) if drilldown is not None else None
+    if lower is not None and len(lower['Close']):
+        index, profit, _ = first_exit(_as_bars(lower), 0, side, stop_loss, take_profit, 'high_low', tie_break)
+        if index >= 0:
+            return profit
+
+    if tie_break == 'take_profit':
+        return True
+    if tie_break == 'open':
+        return abs(open_ - take_profit) <= abs(open_ - stop_loss)
+    return False
+
+
+def _fill_price(open_: float, side: int, profit: bool, stop_loss: float, take_profit: float) -> float:
+    # Exits fill at their level, or at the open when the candle gapped through it
+    if side == LONG:
+        return max(open_, take_profit) if profit else min(open_, stop_loss)
+    return min(open_, take_profit) if profit else max(open_, stop_loss)
+
+
+def _as_bars(ohlc) -> dict:
+    return {column: np.ascontiguousarray(ohlc[column], dtype=np.float64) for column in ['Open', 'High', 'Low', 'Close']}
+
+
+def first_exit(bars: dict, start: int, side: int, stop_loss: float, take_profit: float,
+               exit_mode: str='close', tie_break: str='stop_loss', drilldown=None, chunk: int=256):
+    ''' Finds the first candle from start on where the price reaches the take profit or the stop loss
+
+    The prices are scanned in chunks that double in size, so a trade costs time in
+    proportion to its length instead of to the remaining history.
+
+    Args:
+        bars (dict): Open, High, Low and Close float64 arrays
+        exit_mode (str): 'close' only checks the Close of each candle, 'high_low' checks
+            its High and Low and fills at the level (or at the Open on a gap)
+        tie_break (str): Exit assumed first when a 'high_low' candle contains both levels,
+            'stop_loss', 'take_profit' or 'open' for the level nearest to the Open
+        drilldown (callable): drilldown(i) returns lower timeframe candles of candle i
+            (or None), used to resolve the candles containing both levels
+
+    Returns:
+        (index, profit, price): index is -1 when the trade is still open at the end of the data,
+        profit is True when the take profit was hit, price is the exit fill
+    '''
+    close = bars['Close']
+    n = len(close)
+    while start < n:
+        end = start + chunk
+        if exit_mode == 'close':
+            window = close[start:end]
+            if side == LONG:
+                profit = window >= take_profit
+                hit = profit | (window <= stop_loss)
+            else:
+                profit = window <= take_profit
+                hit = profit | (window >= stop_loss)
+        else:
+            high, low = bars['High'][start:end], bars['Low'][start:end]
+            if side == LONG:
+                profit, loss = high >= take_profit, low <= stop_loss
+            else:
+                profit, loss = low <= take_profit, high >= stop_loss
+            hit = profit | loss
+
+        if hit.any():
+            i = hit.argmax()
+            index = start + i
+            if exit_mode == 'close':
+                return index, bool(profit[i]), close[index]
+
+            is_profit = bool(profit[i])
+            if is_profit and loss[i]:
+                is_profit = _resolve_tie(bars, index, side, stop_loss, take_profit, tie_break, drilldown)
+            return index, is_profit, _fill_price(bars['Open'][index], side, is_profit, stop_loss, take_profit)
+        start = end
+        chunk *= 2
+    return -1, False, np.nan
+
+
+def simulate(ohlc, signals: dict, allow_short: bool=True, exit_mode: str='close',
+             tie_break: str='stop_loss', drilldown=None) -> np.ndarray:
+    ''' Runs the trades of precomputed entry signals, one position at a time
+
+    A position opens on a signal candle, is checked for an exit from the next candle
+    on, and the next signal is looked for from the candle after the exit.
+
+    Args:
+        ohlc (pd.DataFrame or dict): Open, High, Low and Close prices
+        signals (dict): Entry signal arrays, see empty_signals
+        allow_short (bool): SHORT signals are ignored when False (spot)
+        exit_mode, tie_break, drilldown: Exit resolution, see first_exit
+
+    Returns:
+        trades (np.ndarray): Closed trades as a TRADE_DTYPE array, pnl fields are left to settle
+    '''
+    if exit_mode not in EXIT_MODES:
+        raise ValueError(f'exit_mode should be one of {EXIT_MODES}')
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f'tie_break should be one of {TIE_BREAKS}')
+
+    bars = _as_bars(ohlc)
+    side = signals['side']
+    candidates = np.flatnonzero(side != 0 if allow_short else side == LONG)
+
+    trades = np.zeros(len(candidates), dtype=TRADE_DTYPE)
+    count = 0
+    position = 0
+    while position < len(candidates):
+        i = candidates[position]
+        exit_index, profit, price = first_exit(bars, i + 1, side[i], signals['stop_loss'][i], signals['take_profit'][i],
+                                               exit_mode, tie_break, drilldown)
+        if exit_index < 0:
+            break
+
+        trade = trades[count]
+        trade['entry_index'] = i
+        trade['exit_index'] = exit_index
+        trade['side'] = side[i]
+        trade['entry'] = signals['entry'][i]
+        trade['stop_loss'] = signals['stop_loss'][i]
+        trade['take_profit'] = signals['take_profit'][i]
+        trade['exit'] = price
+        trade['profit'] = profit
+        count += 1
+
+        position = np.searchsorted(candidates, exit_index + 1)
+
+    return trades[:count]
+
+
+def candle_drilldown(open_time, interval_ms: int, lower_open_time, lower_ohlc):
+    ''' Builds a drilldown over lower timeframe candles for first_exit
+
+    Args:
+        open_time (array): Open times of the backtested candles, in epoch milliseconds
+        interval_ms (int): Duration of a backtested candle in milliseconds
+        lower_open_time (array): Sorted open times of the lower timeframe candles
+        lower_ohlc (pd.DataFrame or dict): Open, High, Low and Close of the lower timeframe candles
+
+    Returns:
+        drilldown (callable): drilldown(i) returns the lower candles inside candle i
+    '''
+    open_time = np.asarray(open_time, dtype=np.int64)
+    lower_open_time = np.asarray(lower_open_time, dtype=np.int64)
+    lower = _as_bars(lower_ohlc)
+
+    def drilldown(i):
+        start, end = np.searchsorted(lower_open_time, [open_time[i], open_time[i] + interval_ms])
+        return {column: values[start:end] for column, values in lower.items()}
+    return drilldown
+
+
+def settle(trades: np.ndarray, balance: float, leverage: int=None) -> float:
+    ''' Fills pnl_percent, pnl and balance of the trades, compounding the balance
+
+    Returns:
+        balance (float): Balance after the last trade
+    '''
+    for trade in trades:
+        entry = float(trade['entry'])
+        if trade['side'] == LONG:
+            pnl = (float(trade['exit']) - entry) * balance / entry
+        else:
+            pnl = (entry - float(trade['exit'])) * balance / entry
+
+        pnl_percent = (pnl / balance) * 100
+        if leverage is not None:
+            pnl *= leverage
+            pnl_percent *= leverage
+
+        balance = balance + pnl
+        trade['pnl_percent'] = pnl_percent
+        trade['pnl'] = pnl
+        trade['balance'] = balance
+    return balance
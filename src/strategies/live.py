@@ -0,0 +1,245 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+
+from src.data.kline_store import KlineStore
+from src.data.online_indicators import OnlineIndicators
+from .backtest import empty_signals
+
+
+class LiveEngine:
+    ''' Runs a strategy on every closed candle of a kline stream
+
+    Indicators are updated incrementally (see OnlineIndicators), so each closed candle
+    costs the same whatever the length of the history, and make_trade is evaluated on
+    the row of the new candle. Replaying recorded candles gives the signals of the
+    batch path (get_indicators + generate_signals) on the same candles.
+
+    When trading, the strategy is not asked about a candle while trade_symbol has a
+    position or open orders (see Strategy._has_open_trade): like the backtest, one trade
+    at a time, and a signal lasting several candles does not cancel the exits of the
+    trade it opened to open another.
+
+    The stream must continue the candles fed before: a candle opening at or before the
+    last one (the warm-up overlapping the stream, a reconnection repeating a candle) is
+    dropped, and the candles missing between the last one and a later stream candle are
+    backfilled from the store before it is evaluated.
+
+    Args:
+        strategy (Strategy): Strategy whose make_trade is evaluated
+        trade (bool): Place the orders (make_trade type "trade"), otherwise only the
+            signals are computed (type "backtest")
+        record (str): JSON lines file every closed kline event is appended to, for replays
+        store (KlineStore): Store of the warm-up and backfilled candles, defaults to the
+            one in data/ohlc/store
+
+    Attributes:
+        latency (list): Seconds from the closed candle to the decision, for each candle
+        last_open (int): Open time in epoch ms of the last candle fed, None before the first
+        backfilled (int): Number of candles backfilled
+    '''
+    def __init__(self, strategy, trade: bool=False, record: str=None, store: KlineStore=None):
+        self.strategy = strategy
+        self.indicators = OnlineIndicators(strategy.parameters)
+        self.trade = trade
+        self.record = record
+        self.store = store
+        self.latency = []
+        self.last_row = None
+        self.last_open = None
+        self.backfilled = 0
+
+    def warm_up(self, df: pd.DataFrame):
+        ''' Feeds history candles (Date and OHLCV) to the indicators without evaluating the strategy
+
+        The strategy observes their rows, so the rules reading earlier candles (prev) have
+        them from the first live candle on.
+        '''
+        for candle in df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].to_dict('records'):
+            self.last_row = self.indicators.row(candle)
+            self.last_open = int(candle['Date'])
+            self.strategy.observe(self.last_row)
+
+    def backfill(self, start: int, end: int) -> int:
+        ''' Syncs the candles opening in [start, end] into the store and feeds them like warm_up
+
+        They are recorded like the stream candles, so a replay of the record has them too.
+
+        Returns:
+            rows (int): Number of candles fed
+        '''
+        config = self.strategy.config
+        self.store = self.store or KlineStore()
+        self.store.sync(config['trade_symbol'], config['time_interval'], start, end)
+        df = self.store.read(config['trade_symbol'], config['time_interval'], start=start, end=end, allow_gaps=True)
+        if self.record is not None:
+            with open(self.record, 'a') as f:
+                for candle in df.to_dict('records'):
+                    f.write(json.dumps(self.message_from_candle(candle)) + '\n')
+        self.warm_up(df)
+        self.backfilled += len(df)
+        return len(df)
+
+    def on_candle(self, candle: dict):
+        ''' Evaluates the strategy on a closed candle
+
+        Args:
+            candle (dict): Date (open time in epoch ms), Open, High, Low, Close and Volume
+
+        Returns:
+            The make_trade result, False when there is no trade, the indicators are not ready
+            or a trade is still open
+        '''
+        start = time.perf_counter()
+        row = self.indicators.row(candle)
+        self.last_row = row
+        self.last_open = int(candle['Date'])
+        if row.isnull().any() or (self.trade and self.strategy._has_open_trade(self.strategy.config['trade_symbol'])):
+            self.strategy.observe(row)
+            return False
+        result = self.strategy.make_trade(type="trade" if self.trade else "backtest", row=row)
+        self.latency.append(time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    def candle_from_message(message: dict):
+        ''' Candle of a Binance kline stream event, None when the candle is still open '''
+        kline = message.get('k') if message.get('e') == 'kline' else None
+        if kline is None or not kline['x']:
+            return None
+        return {'Date': kline['t'], 'Open': float(kline['o']), 'High': float(kline['h']),
+                'Low': float(kline['l']), 'Close': float(kline['c']), 'Volume': float(kline['v'])}
+
+    @staticmethod
+    def message_from_candle(candle: dict) -> dict:
+        ''' Closed kline event of a candle, the inverse of candle_from_message '''
+        return {'e': 'kline', 'k': {'t': int(candle['Date']), 'o': str(candle['Open']), 'h': str(candle['High']),
+                                    'l': str(candle['Low']), 'c': str(candle['Close']), 'v': str(candle['Volume']),
+                                    'x': True}}
+
+    def on_message(self, message: dict):
+        ''' Kline stream callback '''
+        if message.get('e') == 'error':
+            self.strategy.logger.error(f"Kline stream error: {message}")
+            return None
+        candle = self.candle_from_message(message)
+        if candle is None:
+            return None
+        if self.last_open is not None:
+            if candle['Date'] <= self.last_open:
+                self.strategy.logger.warning(f"Dropped candle {candle['Date']}, the last one fed opened at {self.last_open}")
+                return None
+            step = interval_to_milliseconds(self.strategy.config['time_interval'])
+            if candle['Date'] > self.last_open + step:
+                start, end = self.last_open + step, candle['Date'] - step
+                try:
+                    rows = self.backfill(start, end)
+                except Exception as e:
+                    # the indicators skip the missing candles, the stream goes on
+                    self.strategy.logger.error(f"Backfill of the candles {start} to {end} failed: {e}")
+                else:
+                    self.strategy.logger.warning(f"Backfilled {rows} of {(end - start) // step + 1} candles "
+                                                 f"missing before candle {candle['Date']}")
+        if self.record is not None:
+            with open(self.record, 'a') as f:
+                f.write(json.dumps(message) + '\n')
+        result = self.on_candle(candle)
+        if result:
+            self.strategy.logger.info(f"Signal on candle {candle['Date']}: {result}")
+        return result
+
+    def replay(self, source) -> dict:
+        ''' Runs the recorded candles of a kline file or frame through the engine
+
+        The rows of the online indicators are collected and handed to the strategy's
+        generate_signals at once, the candles whose indicators are not ready yet have
+        missing values and get no signal, like in on_candle.
+
+        Args:
+            source (str or pd.DataFrame): JSON lines of kline events (see record), a CSV
+                or a frame with Date and OHLCV columns
+
+        Returns:
+            signals (dict): Entry signal arrays, one value per closed candle (see backtest.empty_signals)
+        '''
+        if isinstance(source, str) and source.endswith('.jsonl'):
+            with open(source, 'r') as f:
+                candles = [self.candle_from_message(json.loads(line)) for line in f if line.strip()]
+            candles = [candle for candle in candles if candle is not None]
+        else:
+            df = pd.read_csv(source) if isinstance(source, str) else source
+            candles = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].to_dict('records')
+
+        rows = [self.indicators.row(candle) for candle in candles]
+        if not rows:
+            return empty_signals(0)
+        self.last_row = rows[-1]
+        self.last_open = int(candles[-1]['Date'])
+        return self.strategy.generate_signals(pd.DataFrame(rows).infer_objects())
+
+    def run(self, history_days: float=2):
+        ''' Warms up on the stored history, then trades the closed candles of the live stream
+
+        When trading, the balances and positions are kept in an AccountState fed by the
+        user data stream and resynced over REST every account.resync_seconds of the config.
+        '''
+        from binance import ThreadedWebsocketManager
+        from src.data import binance_historic as binanceData
+        from src.utils.account_state import AccountState
+        from ..keys import BINANCE_API_KEY, BINANCE_API_SECRET
+
+        config = self.strategy.config
+        self.store = self.store or KlineStore()
+        self.warm_up(binanceData.get_historic_data(symbol=config['trade_symbol'], interval=config['time_interval'],
+                                                   days=history_days, store=self.store))
+
+        manager = ThreadedWebsocketManager(api_key=BINANCE_API_KEY, api_secret=BINANCE_API_SECRET)
+        manager.start()
+        if self.trade and self.strategy.account is None:
+            options = config.get('account', {})
+            account = AccountState(record=options.get('record'))
+            futures = config['type'] == 'futures'
+            account.start(self.strategy.client, options.get('resync_seconds', 60), futures=futures, spot=not futures)
+            if futures:
+                manager.start_futures_user_socket(callback=account.on_message)
+            else:
+                manager.start_user_socket(callback=account.on_message)
+            self.strategy.account = account
+        if config['type'] == 'futures':
+            manager.start_kline_futures_socket(callback=self.on_message, symbol=config['trade_symbol'],
+                                               interval=config['time_interval'])
+        else:
+            manager.start_kline_socket(callback=self.on_message, symbol=config['trade_symbol'],
+                                       interval=config['time_interval'])
+        self.strategy.logger.info(f"Live engine started on {config['trade_symbol']} {config['time_interval']}")
+        manager.join()
+
+
+if __name__ == '__main__':
+    import yaml
+
+    from src.strategies.registry import STRATEGIES
+
+    parser = argparse.ArgumentParser(description='Runs a strategy live, or replays recorded klines through the live engine')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--replay', help='kline file (.jsonl events or OHLCV csv) to replay instead of trading')
+    parser.add_argument('--trade', action='store_true', help='place the orders, otherwise only log the signals')
+    parser.add_argument('--record', help='JSON lines file to record the closed kline events to')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    engine = LiveEngine(STRATEGIES[config['strategy_name']](config), trade=args.trade, record=args.record)
+
+    if args.replay:
+        start = time.perf_counter()
+        signals = engine.replay(args.replay)
+        elapsed = time.perf_counter() - start
+        print(f"{np.count_nonzero(signals['side'])} signals on {len(signals['side'])} candles, "
+              f"{elapsed / max(len(signals['side']), 1) * 1000:.3f}ms per candle")
+    else:
+        engine.run()
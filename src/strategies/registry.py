@@ -0,0 +1,11 @@
+from src.strategies.rules import RuleStrategy
+from src.strategies.triple_supertrend import TripleSupertrendStrategy
+
+# Strategy classes by config block name, the rule ones run the rules of their block
+STRATEGIES = {
+    'triplesupertrend': TripleSupertrendStrategy,
+    'tripleema': RuleStrategy,
+    'stochrsimacd': RuleStrategy,
+    'bbstochrsi': RuleStrategy,
+    'test': RuleStrategy,
+}
@@ -0,0 +1,238 @@
+import ast
+from collections import ChainMap, deque
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+from binance.enums import *
+
+from .backtest import LONG, SHORT, empty_signals
+from .strategy import Strategy
+
+# Nodes a rule may contain, anything else (attributes of objects, subscripts, lambdas,
+# comprehensions, ...) is refused when the rule is compiled
+_NODES = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+          ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.Compare, ast.Eq, ast.NotEq,
+          ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Call, ast.Name, ast.Attribute, ast.Constant, ast.Load)
+
+
+def _all(*values):
+    return reduce(np.logical_and, values)
+
+
+def _any(*values):
+    return reduce(np.logical_or, values)
+
+
+def _prev(values, periods: int=1):
+    # values of the candle periods before, missing (False for masks) on the first ones
+    values = np.asarray(values)
+    if values.ndim == 0:
+        return values
+    periods = int(periods)
+    shifted = np.empty_like(values) if values.dtype.kind in 'bfO' else np.empty(values.shape, dtype=np.float64)
+    shifted[:periods] = False if values.dtype == bool else np.nan
+    shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+FUNCTIONS = {
+    'min': lambda *values: reduce(np.minimum, values),
+    'max': lambda *values: reduce(np.maximum, values),
+    'abs': np.abs,
+    'prev': _prev,
+}
+
+
+class _Rewrite(ast.NodeTransformer):
+    # and/or/not and chained comparisons work on whole arrays, names are looked up in _names
+    def visit_BoolOp(self, node):
+        function = '_all' if isinstance(node.op, ast.And) else '_any'
+        return ast.Call(ast.Name(function, ast.Load()), [self.visit(value) for value in node.values], [])
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return ast.Call(ast.Name('_not', ast.Load()), [self.visit(node.operand)], [])
+        return self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        operands = [self.visit(operand) for operand in [node.left, *node.comparators]]
+        pairs = [ast.Compare(left, [op], [right]) for left, op, right in zip(operands, node.ops, operands[1:])]
+        return pairs[0] if len(pairs) == 1 else ast.Call(ast.Name('_all', ast.Load()), pairs, [])
+
+    def visit_Call(self, node):
+        return ast.Call(ast.Name(f'_{node.func.id}', ast.Load()), [self.visit(arg) for arg in node.args], [])
+
+    def visit_Name(self, node):
+        return ast.Subscript(ast.Name('_names', ast.Load()), ast.Constant(node.id), ast.Load())
+
+    def visit_Attribute(self, node):
+        # bband.upper_band reads a value nested in the config block
+        return ast.Subscript(ast.Name('_names', ast.Load()), ast.Constant(_dotted(node)), ast.Load())
+
+
+def _dotted(node) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f'{_dotted(node.value)}.{node.attr}'
+    raise ValueError('only names can have attributes in a rule')
+
+
+class Rule:
+    ''' A rule expression compiled into NumPy operations over the columns of an indicator frame
+
+    The expression is Python syntax: the names are indicator columns (Close, EMA,
+    sRSI_d, ...) or parameters of the config block, e.g. rsi_oversold from its strategy
+    section or bband.upper_band, and may be combined with arithmetic, comparisons
+    (chained ones too), and, or, not and the functions min, max, abs and prev(x, n=1)
+    (the value n candles before). and/or/not apply to whole columns, so
+        Close > EMA and min(sRSI_d, sRSI_k) < rsi_oversold
+    is a mask over every candle. A comparison with a missing value is False.
+
+    Args:
+        expression (str): Rule text
+
+    Attributes:
+        depth (int): Candles before the current one the rule reads through prev
+    '''
+    def __init__(self, expression: str):
+        self.expression = str(expression)
+        tree = ast.parse(self.expression, mode='eval')
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODES):
+                raise ValueError(f"'{type(node).__name__}' is not allowed in rule '{self.expression}'")
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                               or node.keywords):
+                raise ValueError(f"only {', '.join(FUNCTIONS)} can be called in rule '{self.expression}'")
+            if isinstance(node, ast.Attribute):
+                _dotted(node)
+            if isinstance(node, ast.Call) and node.func.id == 'prev' and len(node.args) > 1 and not (
+                    isinstance(node.args[1], ast.Constant) and isinstance(node.args[1].value, int)):
+                raise ValueError(f"the periods of prev must be a whole number in rule '{self.expression}'")
+        # prev calls nested in each other add up, so their sum bounds the depth
+        self.depth = sum(node.args[1].value if len(node.args) > 1 else 1 for node in ast.walk(tree)
+                         if isinstance(node, ast.Call) and node.func.id == 'prev')
+        self.code = compile(ast.fix_missing_locations(_Rewrite().visit(tree)), f'<rule {self.expression}>', 'eval')
+
+    def evaluate(self, names, rows: int) -> np.ndarray:
+        ''' Values of the rule on every candle, names maps the columns and parameters to their values '''
+        scope = {'_names': names, '_all': _all, '_any': _any, '_not': np.logical_not,
+                 **{f'_{name}': function for name, function in FUNCTIONS.items()}}
+        try:
+            values = eval(self.code, {'__builtins__': {}}, scope)
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} is neither a column nor a parameter in rule '{self.expression}'") from None
+        return np.broadcast_to(np.asarray(values), (rows,))
+
+
+class _Columns(dict):
+    # columns of the frame as arrays, converted the first time a rule reads them
+    def __init__(self, df: pd.DataFrame):
+        super().__init__()
+        self.df = df
+
+    def __missing__(self, name):
+        if name not in self.df.columns:
+            raise KeyError(name)
+        column = self.df[name]
+        values = column.to_numpy(dtype=np.float64) if column.dtype.kind in 'fiub' else column.to_numpy(dtype=object)
+        self[name] = values
+        return values
+
+
+def _parameters(block: dict, prefix: str='') -> dict:
+    # every scalar of the config block by name, the nested ones by their dotted path
+    parameters = {}
+    for key, value in block.items():
+        if isinstance(value, dict):
+            if key != 'rules':
+                parameters.update(_parameters(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            parameters[f'{prefix}{key}'] = value
+    return parameters
+
+
+class RuleStrategy(Strategy):
+    ''' Strategy whose entries, stop losses and take profits are rules of its config block
+
+    The strategy section of the block holds the parameters and the rules, e.g.
+        strategy:
+          rsi_oversold: 25
+          rules:
+            long:
+              entry: Close > EMA and min(sRSI_d, sRSI_k) < rsi_oversold
+              stop_loss: Close - ATR * atr_sl
+              take_profit: Close + ATR * atr_tp
+            short:
+              ...
+    See Rule for the expressions. The parameters are looked up in the strategy section,
+    then in the rest of the block. A candle with both entries gets the LONG one, and
+    like make_trade only candles without missing values get one. The stop loss and take
+    profit of the entries are rounded with _round_price.
+    '''
+    def __init__(self, parameters, client=None, account=None, cache=None):
+        super().__init__(parameters, client, account, cache)
+        self.strategy_parameters = self.parameters.get('strategy', {})
+        if 'rules' not in self.strategy_parameters:
+            raise KeyError(f"'{self.config['strategy_name']}' has no strategy.rules")
+        self.rules = {side: {name: Rule(expression) for name, expression in rules.items()}
+                      for side, rules in self.strategy_parameters['rules'].items()}
+        for side, rules in self.rules.items():
+            if side not in ('long', 'short') or set(rules) != {'entry', 'stop_loss', 'take_profit'}:
+                raise ValueError(f"rules.{side} needs an entry, a stop_loss and a take_profit, for long or short")
+        self.names = {**_parameters(self.parameters), **_parameters(self.strategy_parameters)}
+        # the rows make_trade evaluates the rules on, as many as the rules read back
+        depth = max(rule.depth for rules in self.rules.values() for rule in rules.values())
+        self._recent = deque(maxlen=depth + 1)
+
+    def generate_signals(self, df: pd.DataFrame) -> dict:
+        '''Entry signals of the rules for every candle of df, see Strategy.generate_signals'''
+        signals = empty_signals(len(df))
+        names = ChainMap(_Columns(df), self.names)
+        complete = df.notnull().all(axis=1).to_numpy()
+        taken = np.zeros(len(df), dtype=bool)
+
+        for side, code in (('long', LONG), ('short', SHORT)):
+            if side not in self.rules:
+                continue
+            rules = self.rules[side]
+            entries = complete & ~taken & rules['entry'].evaluate(names, len(df)).astype(bool)
+            taken |= entries
+            rows = np.flatnonzero(entries)
+            if len(rows) == 0:
+                continue
+            stop_loss = rules['stop_loss'].evaluate(names, len(df))[rows]
+            take_profit = rules['take_profit'].evaluate(names, len(df))[rows]
+            signals['side'][rows] = code
+            signals['entry'][rows] = names['Close'][rows]
+            signals['stop_loss'][rows] = [self._round_price(price) for price in stop_loss.astype(np.float64)]
+            signals['take_profit'][rows] = [self._round_price(price) for price in take_profit.astype(np.float64)]
+        return signals
+
+    def observe(self, row):
+        '''Keeps the row for the prev of the next make_trade calls, see Strategy.observe'''
+        self._recent.append(row)
+
+    def make_trade(self, type="trade", row=None):
+        '''Evaluates the rules on the row of the newest candle, after the rows of the earlier calls and observe'''
+        self._recent.append(row)
+        signals = self.generate_signals(pd.DataFrame(list(self._recent)).infer_objects())
+        side = signals['side'][-1]
+        if side == 0:
+            return False
+
+        position = 'LONG' if side == LONG else 'SHORT'
+        stopLoss, takeProfit = signals['stop_loss'][-1], signals['take_profit'][-1]
+        self.logger.info(f'{position} entry')
+        if type == "trade":
+            availableBalance = self._get_trade_balance()
+            quantity = self._calculate_quantity(self.config, row, availableBalance)
+            self.logger.info(f'Placing order: {position} at price: {row.Close} and quantity: {quantity}')
+            self.logger.info(f'Stop Loss: {stopLoss} \nTake Profit: {takeProfit}')
+            orderIds = self._execute_trade_binance(SIDE_BUY if side == LONG else SIDE_SELL, quantity=quantity,
+                                                   symbol=self.config['trade_symbol'], positionSide=position,
+                                                   stopLoss=stopLoss, takeProfit=takeProfit)
+            self._save_trade(self.config, row, position, quantity, availableBalance)
+            return orderIds
+        return {'side': position, 'entry': row.Close, 'quantity': None, 'stop_loss': stopLoss, 'take_profit': takeProfit}
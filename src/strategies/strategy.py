@@ -10,6 +10,9 @@ from binance.enums import *
 from ..utils.logging_config import configure_logging
 from src.data.calculate_indicators import *
 from src.data import binance_historic as binanceData
+from src.utils.account_state import position_from_rest
+from src.utils.execution import AsyncExecutor
+from .backtest import LONG, SHORT, empty_signals, settle, simulate
 from ..keys import BINANCE_API_KEY, BINANCE_API_SECRET
 
 sns.set_style("darkgrid")
@@ -20,10 +23,19 @@ class Strategy:
     Attributes:
         df (pandas.DataFrame): Dataframe with OHLCV data
         config (dict): Config file
+        client (binance.client.Client): Exchange client, created on first use unless given
+        executor (AsyncExecutor): Asyncio order client, used for the trades when the
+            'execution' block of the config sets async, created on first use
+        account (AccountState): Cached balances and positions, read instead of requesting
+            them when given (see LiveEngine.run)
+        cache (IndicatorCache): Indicator values of earlier runs, reused by get_indicators
+            when given (see src.data.indicator_cache.from_config)
     '''
-    def __init__(self, config):
-        self.indicators = Indicators()
-        self.client = Client(BINANCE_API_KEY, BINANCE_API_SECRET)
+    def __init__(self, config, client=None, account=None, cache=None):
+        self.indicators = Indicators(cache)
+        self._client = client
+        self._executor = None
+        self.account = account
         self.logger = configure_logging()
 
         self.config = config
@@ -31,6 +43,20 @@ class Strategy:
         self.balance = None
         self.parameters = self.config[self.config['strategy_name']]
 
+    @property
+    def client(self):
+        # backtests never reach the exchange, so the client is only created when needed
+        if self._client is None:
+            self._client = Client(BINANCE_API_KEY, BINANCE_API_SECRET)
+        return self._client
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            options = {key: value for key, value in self.config['execution'].items() if key != 'async'}
+            self._executor = AsyncExecutor(BINANCE_API_KEY, BINANCE_API_SECRET, **options)
+        return self._executor
+
     def _round_price(self, num: float):
         ''' Returns a number with 4 significant digits'''
         sig_req = 4
@@ -64,14 +90,19 @@ class Strategy:
             Order ID, StopLoss Order ID, TakeProfit Order ID
         '''
         try:
-            side_tpsl = 'BUY' if side == 'SELL' else 'SELL'
-            self.client.futures_cancel_all_open_orders(symbol=symbol)
-            order = self.client.futures_create_order(
-                symbol=symbol, side=side, type=ORDER_TYPE_LIMIT_MAKER, quantity=quantity, isolated=True, positionSide=positionSide)
-            order_stop_loss = self.client.futures_create_order(
-                symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_STOP_MARKET, quantity=quantity, positionSide=positionSide, stopPrice=stopLoss, timeInForce=TIME_IN_FORCE_GTC)
-            order_take_profit = self.client.futures_create_order(
-                symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET, quantity=quantity, positionSide=positionSide, stopPrice=takeProfit, timeInForce=TIME_IN_FORCE_GTC)
+            if self.config.get('execution', {}).get('async'):
+                # stop loss and take profit sent together once the entry is acknowledged
+                order, order_stop_loss, order_take_profit = self.executor.run(self.executor.futures_trade(
+                    side, quantity, symbol, positionSide, stopLoss, takeProfit))
+            else:
+                side_tpsl = 'BUY' if side == 'SELL' else 'SELL'
+                self.client.futures_cancel_all_open_orders(symbol=symbol)
+                order = self.client.futures_create_order(
+                    symbol=symbol, side=side, type=ORDER_TYPE_LIMIT_MAKER, quantity=quantity, isolated=True, positionSide=positionSide)
+                order_stop_loss = self.client.futures_create_order(
+                    symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_STOP_MARKET, quantity=quantity, positionSide=positionSide, stopPrice=stopLoss, timeInForce=TIME_IN_FORCE_GTC)
+                order_take_profit = self.client.futures_create_order(
+                    symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET, quantity=quantity, positionSide=positionSide, stopPrice=takeProfit, timeInForce=TIME_IN_FORCE_GTC)
             self.logger.info(f"Order created: {order}, stop loss order ID: {order_stop_loss['orderId']}, take profit order ID: {order_take_profit['orderId']}")
 
         except Exception as e:
@@ -84,111 +115,123 @@ class Strategy:
         '''updated by the child class'''
         pass
 
-    def __execute_trade_backtest(self, date, trade_parameters, close_price, balance, result):
-        if trade_parameters['side'] == "LONG":
-            pnl = (close_price - trade_parameters['entry']) * balance / trade_parameters['entry']
-        else:
-            pnl = (trade_parameters['entry'] - close_price) * balance / trade_parameters['entry']
+    def observe(self, row):
+        '''Row of a candle make_trade is not asked about (warm-up history, indicators not ready yet)
 
-        pnl_percent = (pnl / balance) * 100
-        leverage = None
+        Strategies reading the rows before the current one keep it, the default ignores it.
+        '''
+        pass
 
-        if self.config['type'] == "futures":
-            leverage = self.config['leverage']
-            pnl *= leverage
-            pnl_percent *= leverage
+    def generate_signals(self, df: pd.DataFrame) -> dict:
+        '''Entry signals for every candle of df, as arrays
 
-        self.balance = balance + pnl
+        This default asks make_trade about every row without missing values, child
+        classes can override it with a vectorized version returning the same signals.
 
-        new_trade = {
-            'date': date,
-            'symbol':  self.config['trade_symbol'],
-            'side': trade_parameters['side'],
-            'quantity': trade_parameters['quantity'],
-            'leverage': leverage,
-            'entry': trade_parameters['entry'],
-            'stop_loss': trade_parameters['stop_loss'],
-            'take_profit': trade_parameters['take_profit'],
-            'result': result,
-            'pnl_percent': pnl_percent,
-            'pnl': pnl,
-            'balance': self.balance,
-            'order_id': None,
-            'stop_loss_order_id': None,
-            'take_profit_order_id': None
-        }
-
-        if self.trades.empty:
-            self.trades = pd.DataFrame([new_trade], columns=new_trade.keys())
-        else:
-            new_trade_df = pd.DataFrame([new_trade], columns=self.trades.columns)
-            self.trades = pd.concat([self.trades, new_trade_df], ignore_index=True)
+        Returns:
+            signals (dict): side (LONG 1, SHORT -1 or 0), entry, stop_loss and take_profit arrays
+        '''
+        signals = empty_signals(len(df))
+        complete = np.flatnonzero(df.notnull().all(axis=1).to_numpy())
+        for i in tqdm(complete):
+            trade = self.make_trade(type="backtest", row=df.iloc[i])
+            if trade:
+                signals['side'][i] = LONG if trade['side'] == "LONG" else SHORT
+                signals['entry'][i] = trade['entry']
+                signals['stop_loss'][i] = trade['stop_loss']
+                signals['take_profit'][i] = trade['take_profit']
+        return signals
+
+    def backtest(self, balance=1000, drilldown=None) -> pd.DataFrame:
+        '''Backtests the strategy on self.df_indicators
+
+        Entry signals are computed for all candles at once and each position is
+        closed on the first candle reaching its take profit or stop loss. The
+        'backtest' block of the config picks how exits are resolved:
+            exit_mode: 'close' compares the Close only, 'high_low' uses the wicks
+            tie_break: exit assumed when a candle's wicks reach both levels,
+                'stop_loss', 'take_profit' or 'open' (the level nearest to the Open)
 
-    def backtest(self, balance=1000) -> pd.DataFrame:
-        print('BACKTESTING...')
-        is_position_open = False
-        trade_parameters = None
-        self.balance = balance
+        Args:
+            balance (float): Starting balance
+            drilldown (callable): Lower timeframe candles of an ambiguous candle,
+                see backtest.candle_drilldown
 
+        Returns:
+            trades (pd.DataFrame): One row per closed trade
+        '''
+        print('BACKTESTING...')
         self.logger.info('Backtesting...')
-        for i in tqdm(range(len(self.df_indicators))):
-            if not is_position_open:
-                if self.df_indicators.iloc[i].isnull().sum() != 0:
-                    continue
-
-                trade = self.make_trade(type="backtest", row=self.df_indicators.iloc[i])
-
-                # only eliminates trades that are not meant to be executed
-                # considered: spot, futures
-                if trade:
-                    if self.config['type'] == "spot":
-                        if trade['side'] == "SHORT":
-                            continue
-
-                    is_position_open = True
-                    trade_parameters = trade
-
-            elif is_position_open:
-                close_price = self.df_indicators.iloc[i].Close
-                if trade_parameters['side'] in ["LONG", "SHORT"]:
-                    if (trade_parameters['side'] == "LONG" and close_price >= trade_parameters['take_profit']) or \
-                        (trade_parameters['side'] == "SHORT" and close_price <= trade_parameters['take_profit']):
-                        self.logger.info(f'{trade_parameters["side"]} TakeProfit hit')
-                        self.__execute_trade_backtest(self.df_indicators.iloc[i]['Date'], trade_parameters, close_price, self.balance, 'profit')
-                        is_position_open = False
-                        trade_parameters = {}
-                    
-                    elif (trade_parameters['side'] == "LONG" and close_price <= trade_parameters['stop_loss']) or \
-                    (trade_parameters['side'] == "SHORT" and close_price >= trade_parameters['stop_loss']):
-                        self.logger.info(f'{trade_parameters["side"]} StopLoss hit')
-                        self.__execute_trade_backtest(self.df_indicators.iloc[i]['Date'], trade_parameters, close_price, self.balance, 'loss')
-                        is_position_open = False
-                        trade_parameters = {}
+        df = self.df_indicators
 
+        # only eliminates trades that are not meant to be executed
+        # considered: spot, futures
+        signals = self.generate_signals(df)
+        exits = self.config.get('backtest', {})
+        trades = simulate(df, signals, allow_short=self.config['type'] != "spot",
+                          exit_mode=exits.get('exit_mode', 'close'), tie_break=exits.get('tie_break', 'stop_loss'),
+                          drilldown=drilldown)
+
+        leverage = self.config['leverage'] if self.config['type'] == "futures" else None
+        self.balance = settle(trades, balance, leverage)
+
+        for trade in trades:
+            self.logger.info(f'{"LONG" if trade["side"] == LONG else "SHORT"} {"TakeProfit" if trade["profit"] else "StopLoss"} hit')
+
+        self.trades = self.__trades_frame(df, trades, leverage)
         return self.trades
 
+    def __trades_frame(self, df, trades, leverage):
+        '''Converts the closed trades of the backtest into the trade log'''
+        if len(trades) == 0:
+            return pd.DataFrame()
+
+        n = len(trades)
+        return pd.DataFrame({
+            'date': df['Date'].to_numpy()[trades['exit_index']],
+            'symbol':  self.config['trade_symbol'],
+            'side': np.where(trades['side'] == LONG, "LONG", "SHORT").astype(object),
+            'quantity': [None] * n,
+            'leverage': [leverage] * n,
+            'entry': trades['entry'],
+            'stop_loss': trades['stop_loss'],
+            'take_profit': trades['take_profit'],
+            'result': np.where(trades['profit'], 'profit', 'loss').astype(object),
+            'pnl_percent': trades['pnl_percent'],
+            'pnl': trades['pnl'],
+            'balance': trades['balance'],
+            'order_id': [None] * n,
+            'stop_loss_order_id': [None] * n,
+            'take_profit_order_id': [None] * n
+        })
+
     def run(self):
         start = datetime.now()
         current_date = datetime.now().strftime("%d%b%y")
         file_name = f"trades/backtest/{self.config['strategy_name']}/backtest_{current_date}_{self.config['type']}_{self.config['trade_symbol']}_{self.config['timeframe']}"
 
+        compact = self.config.get('compact', False)
         self.df_ohlc = binanceData.get_historic_data(symbol=self.config['trade_symbol'], 
                                                     interval=self.config['time_interval'], 
-                                                    days=self.config['timeframe'])
-        self.df_indicators = self.indicators.get_indicators(self.df_ohlc, self.parameters)
+                                                    days=self.config['timeframe'], compact=compact)
+        self.df_indicators = self.indicators.get_indicators(self.df_ohlc, self.parameters, compact=compact)
         trades = self.backtest()
+        # dates stay epoch milliseconds until the report
+        report = trades.assign(date=binanceData.format_dates(trades['date'])) if not trades.empty else trades
         try:
-            trades.to_csv(file_name + ".csv", index=False)
+            report.to_csv(file_name + ".csv", index=False)
         except OSError:
             os.makedirs(os.path.dirname(file_name))
-            trades.to_csv(file_name, index=False)
+            report.to_csv(file_name, index=False)
 
         print(f'Time taken: {datetime.now() - start}')
         self.__draw_trade_result(trades, file_name)
 
 
     def _get_available_futures_balance(self, asset: str='USDT'):
-        ''' Gets available balance from Binance account '''
+        ''' Gets available balance from Binance account, from the account state when there is one '''
+        if self.account is not None and self.account.available(asset) is not None:
+            return self.account.available(asset)
         try:
             balance = self.client.futures_account_balance()
             availableBalance = -1
@@ -202,6 +245,12 @@ class Strategy:
             self.logger.error(f"Error getting available balance: {e}")
             return False
         
+    def _get_trade_balance(self):
+        ''' Balance a new trade is sized on, the available futures balance or the free spot USDT '''
+        if self.config['type'] == 'futures':
+            return self._get_available_futures_balance()
+        return float(self._get_available_balance('USDT'))
+
     def _get_available_balance(self, asset: str, type:str='free'):
         ''' Gets available balance from Binance account
         
@@ -209,6 +258,8 @@ class Strategy:
             asset (str): Asset to get balance from
             type (str): Type of balance (free or locked)
         '''
+        if self.account is not None and self.account.free(asset, type) is not None:
+            return self.account.free(asset, type)
         try:
             return self.client.get_asset_balance(asset=asset)[type]
 
@@ -217,15 +268,32 @@ class Strategy:
             return False
         
     def _get_current_position(self, symbol: str):
-        ''' Gets current position from Binance account '''
+        ''' Gets current position from Binance account, from the account state when there is one
+
+        Returns:
+            positions (list): One dict per position side, see AccountState.symbol_positions
+        '''
+        if self.account is not None and self.account.synced:
+            return self.account.symbol_positions(symbol)
         try:
-            position = self.client.futures_position_information(symbol=symbol)
-            return position
+            return [position_from_rest(position) for position in self.client.futures_position_information(symbol=symbol)]
 
         except Exception as e:
             self.logger.error(f"Error getting current position: {e}")
             return False
     
+    def _has_open_trade(self, symbol: str) -> bool:
+        ''' Whether symbol has a position or open orders, a failed lookup counts as one '''
+        positions = self._get_current_position(symbol)
+        if positions is False or any(position['amount'] != 0 for position in positions):
+            return True
+        try:
+            return len(self.client.futures_get_open_orders(symbol=symbol)) > 0
+
+        except Exception as e:
+            self.logger.error(f"Error getting open orders: {e}")
+            return True
+
     def _calculate_quantity(self, config: dict, row: pd.Series, availableBalance: float):
         ''' Calculates the quantity to trade based on the available balance '''
         try:
@@ -241,7 +309,7 @@ class Strategy:
         ''' Saves trade to a csv file '''
         try:
             with open('trades.csv', 'a') as f:
-                f.write(f"{row['date']}, {config['trade_symbol']}, {row['Close']}, {trade_type}, {quantity}, {balance}\n")
+                f.write(f"{row['Date']}, {config['trade_symbol']}, {row['Close']}, {trade_type}, {quantity}, {balance}\n")
 
         except Exception as e:
             self.logger.error(f"Error saving trade: {e}")
@@ -0,0 +1,262 @@
+import argparse
+import copy
+import itertools
+import json
+import logging
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import yaml
+from tqdm import tqdm
+
+from src.data.calculate_indicators import Indicators
+from src.data.dataset import load_dataset
+from src.strategies.registry import STRATEGIES
+
+COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+# Indicator entries each worker keeps computed between batches
+CACHE_SIZE = 64
+
+
+def expand_grid(parameters: dict, grid: dict) -> list:
+    ''' Every combination of a parameter grid applied to a strategy config block
+
+    Args:
+        parameters (dict): Strategy config block, e.g. config['triplesupertrend']
+        grid (dict): Dotted path inside the block -> list of values, e.g.
+            {'supertrend-1.atr': [7, 10], 'strategy.stop_loss_long': [0.99, 0.985]}
+
+    Returns:
+        combinations (list): (overrides, parameters) pairs, overrides maps each path to its value
+    '''
+    paths = list(grid)
+    combinations = []
+    for values in itertools.product(*(grid[path] for path in paths)):
+        overrides = dict(zip(paths, values))
+        combination = copy.deepcopy(parameters)
+        for path, value in overrides.items():
+            *parents, leaf = path.split('.')
+            block = combination
+            for parent in parents:
+                if parent not in block:
+                    raise KeyError(f"'{path}' is not in the strategy config")
+                block = block[parent]
+            if leaf not in block:
+                raise KeyError(f"'{path}' is not in the strategy config")
+            block[leaf] = value
+        combinations.append((overrides, combination))
+    return combinations
+
+
+def indicator_signature(parameters: dict) -> str:
+    ''' Key of everything in a strategy block except its 'strategy' thresholds,
+    combinations sharing it have the same indicator columns '''
+    return json.dumps({key: value for key, value in parameters.items() if key != 'strategy'}, sort_keys=True)
+
+
+def summarize(trades: pd.DataFrame, balance: float) -> dict:
+    ''' Summary metrics of a backtest trade log '''
+    if trades.empty:
+        return {'trades': 0, 'profits': 0, 'losses': 0, 'win_rate': np.nan,
+                'final_balance': balance, 'return_percent': 0.0, 'max_drawdown_percent': 0.0}
+
+    balances = np.concatenate([[balance], trades['balance'].to_numpy(dtype=np.float64)])
+    peaks = np.maximum.accumulate(balances)
+    profits = int((trades['result'] == 'profit').sum())
+    return {
+        'trades': len(trades),
+        'profits': profits,
+        'losses': len(trades) - profits,
+        'win_rate': profits / len(trades),
+        'final_balance': balances[-1],
+        'return_percent': (balances[-1] / balance - 1) * 100,
+        'max_drawdown_percent': ((1 - balances / peaks).max()) * 100,
+    }
+
+
+class SharedOHLCV:
+    ''' OHLCV candles in one shared memory block, read by the sweep workers without a copy
+
+    The columns are stored as a Fortran ordered float64 block, Date as epoch milliseconds
+    (exact in a float64).
+    '''
+    def __init__(self, df: pd.DataFrame):
+        date = df['Date']
+        if not np.issubdtype(date.dtype, np.number):
+            # csv files written before the dates were kept as epoch milliseconds
+            date = pd.to_datetime(date).astype('int64') // 10**6
+
+        self.shape = (len(df), len(COLUMNS))
+        self.memory = shared_memory.SharedMemory(create=True, size=max(8 * self.shape[0] * self.shape[1], 1))
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self.memory.buf, order='F')
+        block[:, 0] = date
+        for i, column in enumerate(COLUMNS[1:], 1):
+            block[:, i] = df[column].to_numpy(dtype=np.float64)
+
+    def spec(self) -> tuple:
+        ''' What a worker needs to attach, see SharedOHLCV.attach '''
+        return self.memory.name, self.shape
+
+    @staticmethod
+    def attach(spec: tuple):
+        ''' Opens the block of another process
+
+        Returns:
+            memory (SharedMemory): Keep it referenced as long as the frame is used
+            df (pd.DataFrame): Date and OHLCV columns, the prices are views of the block
+        '''
+        name, shape = spec
+        memory = shared_memory.SharedMemory(name=name)
+        block = np.ndarray(shape, dtype=np.float64, buffer=memory.buf, order='F')
+        df = pd.DataFrame({column: block[:, i] for i, column in enumerate(COLUMNS)}, copy=False)
+        df['Date'] = df['Date'].astype(np.int64)
+        return memory, df
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+# State of a sweep worker process, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec, config, balance):
+    if isinstance(spec, str):
+        # a dataset file, mapped by every worker without reading or copying it
+        memory, df = None, load_dataset(spec)
+    else:
+        memory, df = SharedOHLCV.attach(spec)
+    # thousands of backtests would otherwise write every trade to the log files
+    logging.getLogger('TradingBot').setLevel(logging.WARNING)
+    _worker.update(memory=memory, df=df, config=config, balance=balance, cache=OrderedDict())
+
+
+def _indicator_frame(parameters: dict) -> pd.DataFrame:
+    # Indicator columns are cached per config entry and its own params, so a combination
+    # changing only supertrend-3 recomputes supertrend-3 and nothing else
+    df, cache = _worker['df'], _worker['cache']
+    indicators = Indicators()
+    columns = {}
+    for parameter, value in parameters.items():
+        if parameter == 'strategy':
+            continue
+        key = (parameter, json.dumps(value, sort_keys=True))
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            frame = indicators.get_indicators(df, {parameter: value}, compact=_worker['config'].get('compact', False))
+            cache[key] = {column: frame[column].values for column in frame.columns if column not in df.columns}
+            if len(cache) > CACHE_SIZE:
+                cache.popitem(last=False)
+        columns.update(cache[key])
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+
+def _run_batch(batch: list) -> list:
+    # Backtests a batch of combinations sorted by indicator signature, each indicator
+    # frame is built once for all the combinations only differing in 'strategy'
+    config, balance = _worker['config'], _worker['balance']
+    rows = []
+    frame, signature = None, None
+    for overrides, parameters in batch:
+        if indicator_signature(parameters) != signature:
+            signature = indicator_signature(parameters)
+            frame = _indicator_frame(parameters)
+
+        combination = dict(config)
+        combination[config['strategy_name']] = parameters
+        strategy = STRATEGIES[config['strategy_name']](combination)
+        strategy.df_indicators = frame
+        trades = strategy.backtest(balance)
+        rows.append({**overrides, **summarize(trades, balance)})
+    return rows
+
+
+def sweep(config: dict, df: pd.DataFrame, grid: dict, workers: int=None, batch_size: int=None,
+          output: str=None, balance: float=1000, dataset: str=None) -> pd.DataFrame:
+    ''' Backtests every combination of a parameter grid on a process pool
+
+    The candles are put once in shared memory for all the workers, or mapped by each
+    worker from a dataset file (see src.data.dataset) when one is given. Combinations are
+    sorted by their indicator params and sent in batches, so those only changing the
+    'strategy' thresholds (stop loss, rsi levels, ...) reuse the indicator frame.
+
+    Args:
+        config (dict): Full config, the grid applies to the config[strategy_name] block
+        df (pd.DataFrame): Dataframe with Date and OHLCV data, unused when dataset is given
+        grid (dict): Dotted path -> values, see expand_grid
+        workers (int): Number of processes, defaults to the number of CPUs
+        batch_size (int): Combinations per task, defaults to about 4 tasks per worker
+        output (str): CSV the result rows are appended to as the batches finish
+        balance (float): Starting balance of every backtest
+        dataset (str): OHLCV dataset file the workers map instead of a shared memory copy of df
+
+    Returns:
+        results (pd.DataFrame): One row per combination, the grid values followed by the summary metrics
+    '''
+    combinations = expand_grid(config[config['strategy_name']], grid)
+    combinations.sort(key=lambda combination: indicator_signature(combination[1]))
+    workers = workers or os.cpu_count()
+    batch_size = batch_size or max(math.ceil(len(combinations) / (workers * 4)), 1)
+    batches = [combinations[i:i + batch_size] for i in range(0, len(combinations), batch_size)]
+
+    # Result rows are appended column by column as the batches finish
+    results = {}
+    shared = SharedOHLCV(df) if dataset is None else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(dataset or shared.spec(), config, balance)) as pool:
+            futures = [pool.submit(_run_batch, batch) for batch in batches]
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                rows = future.result()
+                for row in rows:
+                    for column, value in row.items():
+                        results.setdefault(column, []).append(value)
+                if output is not None:
+                    pd.DataFrame(rows).to_csv(output, mode='a', header=not os.path.exists(output), index=False)
+    finally:
+        if shared is not None:
+            shared.close()
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    from src.data import binance_historic as binanceData
+
+    parser = argparse.ArgumentParser(description='Backtests every combination of the sweep grid of a strategy')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--csv', help='OHLCV csv to backtest on, downloaded from Binance otherwise')
+    parser.add_argument('--dataset', help='OHLCV dataset the workers map, see src.data.dataset')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--balance', type=float, default=1000)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    grid = config['sweep'][config['strategy_name']]
+
+    if args.dataset:
+        df = None
+    elif args.csv:
+        df = pd.read_csv(args.csv)
+    else:
+        df = binanceData.get_historic_data(symbol=config['trade_symbol'], interval=config['time_interval'],
+                                           days=config['timeframe'])
+
+    start = datetime.now()
+    file_name = f"trades/sweep/{config['strategy_name']}/sweep_{start.strftime('%d%b%y_%H%M%S')}_{config['type']}_{config['trade_symbol']}_{config['timeframe']}.csv"
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+
+    results = sweep(config, df, grid, workers=args.workers, batch_size=args.batch_size,
+                    output=file_name, balance=args.balance, dataset=args.dataset)
+    print(results.sort_values('final_balance', ascending=False).head(10).to_string(index=False))
+    print(f'{len(results)} combinations in {datetime.now() - start}, saved to {file_name}')
@@ -1,12 +1,60 @@
+import numpy as np
 from binance.enums import *
 
+from .backtest import LONG, SHORT, empty_signals
 from .strategy import Strategy
 
 class TripleSupertrendStrategy(Strategy):
-    def __init__(self, parameters):
-        super().__init__(parameters)
+    def __init__(self, parameters, client=None, account=None, cache=None):
+        super().__init__(parameters, client, account, cache)
         self.strategy_parameters = self.parameters['strategy']
-        
+
+    def generate_signals(self, df) -> dict:
+        '''Entry signals of make_trade for every candle of df, computed on whole columns
+
+        The conditions of make_trade are evaluated as masks over the frame. The SuperTrend
+        levels on the right side of the Close are sorted per row (ST_3, ST_2, ST_1, the
+        others pushed to the end as -inf/inf), so their second nearest is one column of
+        the sorted array. Only the stop loss and take profit of the entry candles go
+        through _round_price, with the values and scalar types of df.iloc, so the prices
+        are the ones make_trade gives on every candle.
+
+        Returns:
+            signals (dict): see Strategy.generate_signals
+        '''
+        signals = empty_signals(len(df))
+        complete = df.notnull().all(axis=1).to_numpy()
+        close = df['Close'].to_numpy()
+        ema = df['EMA'].to_numpy()
+        srsi_d = df['sRSI_d'].to_numpy()
+        srsi_k = df['sRSI_k'].to_numpy()
+        super_trend = np.column_stack([df['ST_3'].to_numpy(), df['ST_2'].to_numpy(), df['ST_1'].to_numpy()])
+
+        # LONG is only looked at when the SHORT condition cannot be, like in make_trade
+        oversold = complete & (np.minimum(srsi_d, srsi_k) < self.strategy_parameters['rsi_oversold'])
+        overbought = complete & ~oversold & (np.maximum(srsi_d, srsi_k) > self.strategy_parameters['rsi_overbought'])
+
+        below = super_trend < close[:, None]
+        above = super_trend > close[:, None]
+        long = oversold & (close > ema) & (srsi_d < srsi_k) & (below.sum(axis=1) > 1)
+        short = overbought & (close < ema) & (srsi_d > srsi_k) & (above.sum(axis=1) > 1)
+        # second highest level below the Close, second lowest above it
+        long_level = -np.sort(np.where(below, -super_trend, np.inf), axis=1, kind='stable')[:, 1]
+        short_level = np.sort(np.where(above, super_trend, np.inf), axis=1, kind='stable')[:, 1]
+
+        for side, mask, levels, ratio, bound in ((LONG, long, long_level, 'stop_loss_long', max),
+                                                (SHORT, short, short_level, 'stop_loss_short', min)):
+            for i in np.flatnonzero(mask):
+                # scalars of the row's dtype, make_trade rounds numpy scalars
+                row_close = close[i]
+                stopLoss = self._round_price(bound(self.strategy_parameters[ratio] * row_close, levels[i]))
+                takeProfit = self._round_price(row_close + (row_close - stopLoss) * 1.5)
+                signals['side'][i] = side
+                signals['entry'][i] = row_close
+                signals['stop_loss'][i] = stopLoss
+                signals['take_profit'][i] = takeProfit
+        return signals
+
 
     def make_trade(self, type="trade", row=None):
         if row.empty==None: row = self.df_indicators.iloc[-1]
@@ -30,13 +78,13 @@ class TripleSupertrendStrategy(Strategy):
                 takeProfit = self._round_price(takeProfit)
 
                 if type == "trade":
-                    availableBalance = self._get_available_balance()
+                    availableBalance = self._get_trade_balance()
                     quantity = self._calculate_quantity(self.config, row, availableBalance)
                     self.logger.info(
                         f'Placing order: LONG at price: {row.Close} and quantity: {quantity}')
                     self.logger.info(f'Stop Loss: {stopLoss} \nTake Profit: {takeProfit}')
                     orderIds = self._execute_trade_binance(SIDE_BUY, quantity=quantity,
-                                                symbol=self.config['TRADE_SYMBOL'], positionSide='LONG', stopLoss=stopLoss, takeProfit=takeProfit)
+                                                symbol=self.config['trade_symbol'], positionSide='LONG', stopLoss=stopLoss, takeProfit=takeProfit)
                     
                     self._save_trade(self.config, row, 'LONG', quantity, availableBalance)
                     return orderIds
@@ -64,15 +112,15 @@ class TripleSupertrendStrategy(Strategy):
                 takeProfit = self._round_price(takeProfit)
 
                 if type == "trade":
-                    availableBalance = self._get_available_balance()
+                    availableBalance = self._get_trade_balance()
                     quantity = self._calculate_quantity(self.config, row, availableBalance)
                     self.logger.info(
                         f'Placing order: SHORT at price: {row.Close} and quantity: {quantity}')
                     self.logger.info(f'Stop Loss: {stopLoss} \nTake Profit: {takeProfit}')
                     orderIds = self._execute_trade_binance(SIDE_SELL, quantity=quantity,
-                                                symbol=self.config['TRADE_SYMBOL'], positionSide='SHORT', stopLoss=stopLoss, takeProfit=takeProfit)
+                                                symbol=self.config['trade_symbol'], positionSide='SHORT', stopLoss=stopLoss, takeProfit=takeProfit)
 
-                    self._save_trade(self.config, row, 'LONG', quantity, availableBalance)
+                    self._save_trade(self.config, row, 'SHORT', quantity, availableBalance)
                     return orderIds
                 elif type == "backtest":
                     return {'side': 'SHORT', 'entry': row.Close, 'quantity': None, 'stop_loss': stopLoss, 'take_profit': takeProfit}
@@ -0,0 +1,146 @@
+import json
+import threading
+
+
+def position_from_rest(position: dict) -> dict:
+    ''' Position of futures_position_information in the layout of AccountState.symbol_positions '''
+    return {'symbol': position['symbol'], 'positionSide': position.get('positionSide', 'BOTH'),
+            'amount': float(position['positionAmt']), 'entry': float(position['entryPrice']),
+            'unrealized': float(position['unRealizedProfit']), 'time': position.get('updateTime', 0)}
+
+
+class AccountState:
+    ''' Balances and positions of the account, kept in memory for the strategies to read without a request
+
+    The state is loaded with sync (futures_account_balance, futures_position_information
+    and get_account), then kept current by the user data stream events (on_message):
+    ACCOUNT_UPDATE for the futures balances and positions, outboundAccountPosition for
+    the spot balances. start resyncs it over REST on a timer, in case an event was
+    missed or the stream dropped. Every value keeps the exchange time it is from, and a
+    snapshot or event older than the value in place is ignored, so a resync that
+    crosses an event does not undo it.
+
+    The available futures balance of an ACCOUNT_UPDATE is its cross wallet balance:
+    with isolated positions the margin of the positions is already out of it.
+
+    Args:
+        record (str): JSON lines file every event is appended to, for replays
+
+    Attributes:
+        balances (dict): Futures asset -> {'balance', 'available', 'time'}
+        spot (dict): Spot asset -> {'free', 'locked', 'time'}
+        positions (dict): symbol -> positionSide -> {'amount', 'entry', 'unrealized', 'time'}
+        synced (int): Number of REST syncs
+        events (int): Number of stream events applied
+    '''
+    def __init__(self, record: str=None):
+        self.balances = {}
+        self.spot = {}
+        self.positions = {}
+        self.record = record
+        self.synced = 0
+        self.events = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = None
+
+    @staticmethod
+    def _set(table, key, values, time):
+        current = table.get(key)
+        if current is None or time >= current['time']:
+            table[key] = {**values, 'time': time}
+
+    # reads, no request
+
+    def available(self, asset: str='USDT'):
+        ''' Available futures balance of asset, None when it is not known '''
+        balance = self.balances.get(asset)
+        return balance['available'] if balance is not None else None
+
+    def free(self, asset: str, type: str='free'):
+        ''' Free (or locked) spot balance of asset, None when it is not known '''
+        balance = self.spot.get(asset)
+        return balance[type] if balance is not None else None
+
+    def position(self, symbol: str, positionSide: str='BOTH'):
+        ''' Position of symbol on one side, None when there is none '''
+        return self.positions.get(symbol, {}).get(positionSide)
+
+    def symbol_positions(self, symbol: str) -> list:
+        ''' Positions of symbol on every side, symbol, positionSide, amount, entry, unrealized and time '''
+        return [{'symbol': symbol, 'positionSide': side, **position}
+                for side, position in list(self.positions.get(symbol, {}).items())]
+
+    # updates
+
+    def sync(self, client, futures: bool=True, spot: bool=True):
+        ''' Loads the futures balances and positions, and the spot balances, over REST '''
+        balances = client.futures_account_balance() if futures else []
+        positions = client.futures_position_information() if futures else []
+        account = client.get_account() if spot else {'balances': []}
+        with self._lock:
+            for balance in balances:
+                self._set(self.balances, balance['asset'], {'balance': float(balance['balance']),
+                          'available': float(balance['availableBalance'])}, balance.get('updateTime', 0))
+            for position in map(position_from_rest, positions):
+                symbol, side, time = position.pop('symbol'), position.pop('positionSide'), position.pop('time')
+                self._set(self.positions.setdefault(symbol, {}), side, position, time)
+            for balance in account['balances']:
+                self._set(self.spot, balance['asset'], {'free': float(balance['free']),
+                          'locked': float(balance['locked'])}, account.get('updateTime', 0))
+            self.synced += 1
+
+    def on_message(self, message: dict):
+        ''' User data stream callback, futures and spot events '''
+        event = message.get('e')
+        if event not in ('ACCOUNT_UPDATE', 'outboundAccountPosition'):
+            return
+        if self.record is not None:
+            with open(self.record, 'a') as f:
+                f.write(json.dumps(message) + '\n')
+        time = message.get('E', 0)
+        with self._lock:
+            if event == 'ACCOUNT_UPDATE':
+                update = message['a']
+                for balance in update.get('B', []):
+                    self._set(self.balances, balance['a'], {'balance': float(balance['wb']),
+                              'available': float(balance['cw'])}, time)
+                for position in update.get('P', []):
+                    self._set(self.positions.setdefault(position['s'], {}), position.get('ps', 'BOTH'),
+                              {'amount': float(position['pa']), 'entry': float(position['ep']),
+                               'unrealized': float(position['up'])}, time)
+            else:
+                for balance in message['B']:
+                    self._set(self.spot, balance['a'], {'free': float(balance['f']),
+                              'locked': float(balance['l'])}, message.get('u', time))
+            self.events += 1
+
+    def replay(self, source):
+        ''' Applies recorded events, a JSON lines file (see record) or a list of messages '''
+        if isinstance(source, str):
+            with open(source, 'r') as f:
+                source = [json.loads(line) for line in f if line.strip()]
+        for message in source:
+            self.on_message(message)
+
+    def start(self, client, interval: float=60, futures: bool=True, spot: bool=True):
+        ''' Syncs now, then every interval seconds in a daemon thread until stop '''
+        self.sync(client, futures, spot)
+        self._stop.clear()
+
+        def resync():
+            while not self._stop.wait(interval):
+                try:
+                    self.sync(client, futures, spot)
+                except Exception:
+                    # the stream keeps the state current meanwhile, the next resync retries
+                    continue
+
+        self._timer = threading.Thread(target=resync, name='AccountState', daemon=True)
+        self._timer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
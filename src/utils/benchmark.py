@@ -0,0 +1,254 @@
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import ta
+from ta import momentum, others, trend, volatility, volume
+from src.data.calculate_indicators import Indicators
+from src.data.synthetic import synthetic_ohlcv
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Slowdown past which compare fails, 0.25 is 25% fewer rows per second than the baseline
+THRESHOLD = 0.25
+# Each entry is repeated until it ran this long (or REPEATS times), the fastest run is kept
+MIN_SECONDS = 0.2
+REPEATS = 5
+
+# Value given to each Indicators.match_ind entry, like in a strategy config block
+MATCH_IND_VALUES = {
+    'supertrend': {'atr': 10, 'multiplier': 3},
+    'sma': 20,
+    'ema': 200,
+    'macd': {'ema_fast': 12, 'ema_slow': 26, 'signal': 9},
+    'stoch_rsi': 14,
+    'rsi': {'rsi': 14},
+    'vwap': {},
+    'bband': {'period': 20, 'multiplier': 2},
+    'atr': {'atr': 14},
+}
+TA_MODULES = [momentum, trend, volatility, volume, others]
+TA_INPUTS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+
+def _peak_rss_reset() -> bool:
+    # Linux resets the peak resident size of the process (VmHWM) when 5 is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # peak of the whole process, in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _frame(df):
+    return df
+
+
+def ta_entries() -> dict:
+    ''' Every public function of the ta indicator modules, called on the OHLCV columns with its defaults '''
+    entries = {}
+    for module in TA_MODULES:
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith('_') or function.__module__ != module.__name__:
+                continue
+            inputs = [parameter for parameter in inspect.signature(function).parameters if parameter in TA_INPUTS]
+            entries[f'{module.__name__}.{name}'] = (
+                _frame, lambda df, function=function, inputs=inputs: function(**{p: df[TA_INPUTS[p]] for p in inputs})
+            )
+    return entries
+
+
+def match_ind_entries() -> dict:
+    ''' Every Indicators.match_ind entry, with its shared intermediates computed inside the timing '''
+    def run(df, name):
+        indicators = Indicators()
+        return indicators.match_ind[name](df, MATCH_IND_VALUES[name])
+
+    return {f'match_ind.{name}': (_frame, lambda df, name=name: run(df, name)) for name in Indicators().match_ind}
+
+
+def backtest_entry(config: dict) -> dict:
+    ''' Strategy.backtest of the config's strategy, its indicator frame built outside the timing '''
+    from src.strategies.registry import STRATEGIES
+
+    strategy_class = STRATEGIES[config['strategy_name']]
+
+    def setup(df):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return strategy_class(config).indicators.get_indicators(df, config[config['strategy_name']], workers=1)
+
+    def run(frame):
+        strategy = strategy_class(config)
+        strategy.df_indicators = frame
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return strategy.backtest()
+
+    return {'strategy.backtest': (setup, run)}
+
+
+def entries(config: dict=None) -> dict:
+    ''' All the benchmark entries, name -> (setup, function), function timed on setup(df) '''
+    def add_all_ta_features(df):
+        return ta.add_all_ta_features(df.copy(), open='Open', high='High', low='Low', close='Close', volume='Volume')
+
+    result = {**ta_entries(), **match_ind_entries(), 'ta.add_all_ta_features': (_frame, add_all_ta_features)}
+    if config is not None:
+        result.update(backtest_entry(config))
+    return result
+
+
+def measure(function, data, rows: int) -> dict:
+    ''' Times function(data), the fastest of a few runs, and the peak resident memory during the runs
+
+    The first run is left out when it is short, it compiles the numba kernels and fills
+    the lazy caches. Entries taking more than MIN_SECONDS run once.
+
+    Returns:
+        result (dict): rows, seconds, rows_per_s and peak_rss_mb (None when it cannot be reset per entry)
+    '''
+    exact_peak = _peak_rss_reset()
+    start = time.perf_counter()
+    function(data)
+    best = time.perf_counter() - start
+    if best < MIN_SECONDS:
+        best = np.inf
+        spent = 0.0
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            function(data)
+            elapsed = time.perf_counter() - start
+            best = min(best, elapsed)
+            spent += elapsed
+            if spent >= MIN_SECONDS:
+                break
+    return {
+        'rows': rows,
+        'seconds': best,
+        'rows_per_s': rows / best,
+        'peak_rss_mb': _peak_rss_mb() if exact_peak else None,
+    }
+
+
+def run(sizes: list=SIZES, pattern: str=None, config: dict=None, seed: int=0) -> dict:
+    ''' Runs every entry (or those whose name contains pattern) on synthetic OHLCV of each size
+
+    Returns:
+        baseline (dict): 'meta' describing the machine and libraries, 'results' mapping
+            "entry@rows" to the measure of the entry on that many rows
+    '''
+    logging.getLogger('TradingBot').setLevel(logging.WARNING)
+    selected = {name: function for name, function in entries(config).items() if pattern is None or pattern in name}
+    results = {}
+    for rows in sizes:
+        df = synthetic_ohlcv(rows, seed=seed)
+        for name, (setup, function) in selected.items():
+            with warnings.catch_warnings():
+                # the indicators warn about the divisions by zero of their first values
+                warnings.simplefilter('ignore', RuntimeWarning)
+                result = measure(function, setup(df), rows)
+            results[f'{name}@{rows}'] = result
+            print(f"{name:<45} {rows:>9} rows {result['seconds']:>10.4f}s {result['rows_per_s']:>14,.0f} rows/s")
+
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'numba': numba_version,
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float=THRESHOLD) -> pd.DataFrame:
+    ''' Ratio of the current throughput to the baseline for the entries measured in both
+
+    Returns:
+        report (pd.DataFrame): baseline and current rows/s, their ratio and whether the
+            entry slowed down past the threshold, slowest first
+    '''
+    rows = []
+    for key, result in baseline['results'].items():
+        if key not in current['results']:
+            continue
+        ratio = current['results'][key]['rows_per_s'] / result['rows_per_s']
+        rows.append({'entry': key, 'baseline': result['rows_per_s'], 'current': current['results'][key]['rows_per_s'],
+                     'ratio': ratio, 'regression': ratio < 1 - threshold})
+    columns = ['entry', 'baseline', 'current', 'ratio', 'regression']
+    return pd.DataFrame(rows, columns=columns).sort_values('ratio').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the indicators and the backtest on synthetic OHLCV')
+    parser.add_argument('mode', choices=['run', 'compare'])
+    parser.add_argument('baseline', help='JSON file the run writes, or the compare reads')
+    parser.add_argument('--current', help='compare a JSON file from another run instead of running now')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--filter', help='only the entries whose name contains this text')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+
+    if args.mode == 'run':
+        baseline = run(args.sizes, args.filter, config)
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"{len(baseline['results'])} entries saved to {args.baseline}")
+    else:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if args.current:
+            with open(args.current, 'r') as f:
+                current = json.load(f)
+        else:
+            # the sizes and entries of the baseline, measured now
+            sizes = sorted({result['rows'] for result in baseline['results'].values()})
+            current = run(sizes, args.filter, config)
+            current['results'] = {key: result for key, result in current['results'].items()
+                                  if key in baseline['results']}
+        report = compare(baseline, current, args.threshold)
+        print(report.to_string(index=False))
+        regressions = report[report['regression']]
+        if len(regressions):
+            print(f'{len(regressions)} entries slower than the baseline by more than {args.threshold:.0%}')
+            sys.exit(1)
+        print(f'No entry slower than the baseline by more than {args.threshold:.0%}')
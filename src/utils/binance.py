@@ -3,6 +3,7 @@ from binance.enums import *
 import keys
 import json
 
+from src.utils.execution import AsyncExecutor
 from src.utils.logging_config import configure_logging
 
 f = open('data.json',)
@@ -11,6 +12,15 @@ symbol = data['TRADE_SYMBOL']
 
 client = Client(keys.BINANCE_API_KEY, keys.BINANCE_API_SECRET)
 logger = configure_logging()
+executor = None
+
+
+def _executor():
+    # created on the first async order, its connections stay open for the next ones
+    global executor
+    if executor is None:
+        executor = AsyncExecutor(keys.BINANCE_API_KEY, keys.BINANCE_API_SECRET)
+    return executor
 
 def order_futures(side1, side2, symbol, quantity, positionSide, stopLoss, takeProfit):
     try:
@@ -44,4 +54,30 @@ def order(symbol, quantity, price, stopLoss, takeProfit):
         return False
     
     return order, order_stop_loss, order_take_profit
-    
+
+
+def order_futures_async(side1, side2, symbol, quantity, positionSide, stopLoss, takeProfit):
+    ''' order_futures with the stop loss and take profit sent together once the entry is acknowledged '''
+    try:
+        order, order_stop_loss, order_take_profit = _executor().run(_executor().futures_trade(
+            side1, quantity, symbol, positionSide, stopLoss, takeProfit))
+        logger.info(order)
+
+    except Exception as e:
+        logger.error("An error occured while placing the Futures Order - {}".format(e))
+        return False
+
+    return order, order_stop_loss, order_take_profit
+
+def order_async(symbol, quantity, price, stopLoss, takeProfit):
+    ''' order with the stop loss and take profit sent together once the entry is acknowledged '''
+    try:
+        order, order_stop_loss, order_take_profit = _executor().run(_executor().spot_trade(
+            symbol, quantity, price, stopLoss, takeProfit))
+        logger.info(order)
+
+    except Exception as e:
+        logger.error("An error occured while placing the Spot Order - {}".format(e))
+        return False
+
+    return order, order_stop_loss, order_take_profit
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import aiohttp
+import numpy as np
+from yarl import URL
+from binance.client import AsyncClient
+from binance.enums import *
+
+# Bucket edges of the latency histograms in seconds, 4 buckets per doubling from 0.1ms to ~26s
+LATENCY_EDGES = 1e-4 * 2 ** (np.arange(73) / 4)
+
+
+class LatencyHistogram:
+    ''' Latencies of one kind of request, counted in fixed log spaced buckets
+
+    The memory stays the same whatever the number of requests, the percentiles are the
+    upper edge of their bucket so they are at most 19% above the true value.
+    '''
+    def __init__(self, edges: np.ndarray=LATENCY_EDGES):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[np.searchsorted(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        ''' Upper edge of the bucket holding the q-th percentile (0-100), in seconds '''
+        if self.count == 0:
+            return np.nan
+        bucket = int(np.searchsorted(np.cumsum(self.counts), max(np.ceil(self.count * q / 100), 1)))
+        return min(self.edges[bucket], self.max) if bucket < len(self.edges) else self.max
+
+    def summary(self) -> dict:
+        ''' count, mean, p50, p90, p99 and max, the times in milliseconds '''
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count, 'mean': self.total / self.count * 1000,
+                **{f'p{q}': self.percentile(q) * 1000 for q in (50, 90, 99)}, 'max': self.max * 1000}
+
+
+class AsyncExecutor:
+    ''' Places the orders of a trade with an asyncio Binance client on a keep-alive session
+
+    The client (binance.AsyncClient) runs on an event loop of its own thread, so the
+    synchronous strategy code submits coroutines with run. Its aiohttp session keeps the
+    connections open between trades, so an order costs one round trip and not a TCP and
+    TLS handshake more.
+
+    A trade cancels the open orders of the symbol, places the entry and, once the entry
+    is acknowledged, sends the stop loss and take profit at the same time (or as one
+    batchOrders request with batch set). The position goes unprotected for one round
+    trip after the entry instead of two. An exit rejected by the exchange is sent again
+    up to retries times, and if it still fails the other exit is cancelled and the
+    position closed at market, a trade is never left without its stop loss or take profit.
+
+    Args:
+        api_key, api_secret (str): Binance API keys
+        futures_url (str): Futures API root, e.g. http://127.0.0.1:8080/fapi for a local
+            mock exchange, None for Binance
+        spot_url (str): Spot API root, e.g. http://127.0.0.1:8080/api, None for Binance
+        batch (bool): Send the stop loss and the take profit of a futures trade as one request
+        pool_size (int): Connections kept open to the exchange
+        timeout (float): Seconds before a request fails
+        retries (int): Times a rejected exit of a futures trade is sent again
+
+    Attributes:
+        latency (dict): Leg -> LatencyHistogram, the legs are cancel, entry, stop_loss,
+            take_profit (or batch), protection (entry acknowledged to both exits
+            acknowledged), close (the position closed after the exits failed) and trade
+            (the whole trade)
+    '''
+    def __init__(self, api_key: str, api_secret: str, futures_url: str=None, spot_url: str=None,
+                 batch: bool=False, pool_size: int=10, timeout: float=10, retries: int=2):
+        self.batch = batch
+        self.retries = retries
+        self.latency = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='AsyncExecutor', daemon=True)
+        self._thread.start()
+        self.client = self.run(self.__connect(api_key, api_secret, futures_url, spot_url, pool_size, timeout))
+
+    async def __connect(self, api_key, api_secret, futures_url, spot_url, pool_size, timeout):
+        # the session has to be created on the loop it is used from
+        connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+        client = AsyncClient(api_key, api_secret, loop=self.loop, session_params={'connector': connector})
+        client.REQUEST_TIMEOUT = timeout
+        if futures_url is not None:
+            client.FUTURES_URL = futures_url
+        if spot_url is not None:
+            client.API_URL = spot_url
+        return client
+
+    def run(self, coroutine):
+        ''' Runs a coroutine on the executor's loop and returns its result, from any other thread '''
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        ''' Closes the connections and stops the loop '''
+        self.run(self.client.close_connection())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    @contextmanager
+    def _timed(self, leg):
+        start = time.perf_counter()
+        yield
+        self.latency.setdefault(leg, LatencyHistogram()).record(time.perf_counter() - start)
+
+    async def _leg(self, leg, request, **params):
+        with self._timed(leg):
+            return await request(**params)
+
+    async def _batch_orders(self, orders):
+        # AsyncClient.futures_place_batch_order urlencodes batchOrders and aiohttp encodes the
+        # query again, so the signed query is sent here as an already encoded url
+        query = urlencode({'batchOrders': json.dumps(orders, separators=(',', ':')),
+                           'timestamp': int(time.time() * 1000 + self.client.timestamp_offset)})
+        query += '&signature=' + self.client._hmac_signature(query)
+        url = URL(f"{self.client._create_futures_api_uri('batchOrders')}?{query}", encoded=True)
+        async with self.client.session.post(url, timeout=self.client.REQUEST_TIMEOUT) as response:
+            return await self.client._handle_response(response)
+
+    async def futures_trade(self, side, quantity, symbol, positionSide, stopLoss, takeProfit) -> tuple:
+        ''' Places a futures trade, arguments as Strategy._execute_trade_binance
+
+        Returns:
+            order, stop loss order, take profit order (dicts of the exchange)
+
+        Raises:
+            RuntimeError: An exit still failed after the retries, the position was closed
+        '''
+        side_tpsl = SIDE_BUY if side == SIDE_SELL else SIDE_SELL
+        exits = [
+            dict(symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_STOP_MARKET, quantity=quantity,
+                 positionSide=positionSide, stopPrice=stopLoss, timeInForce=TIME_IN_FORCE_GTC),
+            dict(symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET, quantity=quantity,
+                 positionSide=positionSide, stopPrice=takeProfit, timeInForce=TIME_IN_FORCE_GTC),
+        ]
+        with self._timed('trade'):
+            await self._leg('cancel', self.client.futures_cancel_all_open_orders, symbol=symbol)
+            order = await self._leg('entry', self.client.futures_create_order, symbol=symbol, side=side,
+                                    type=ORDER_TYPE_LIMIT_MAKER, quantity=quantity, isolated=True,
+                                    positionSide=positionSide)
+            with self._timed('protection'):
+                if self.batch:
+                    # the values of batchOrders are sent as JSON strings
+                    orders = await self._leg('batch', self._batch_orders,
+                                             orders=[{key: str(value) for key, value in params.items()}
+                                                     for params in exits])
+                    results = [RuntimeError(result) if 'code' in result else result for result in orders]
+                else:
+                    results = await asyncio.gather(
+                        self._leg('stop_loss', self.client.futures_create_order, **exits[0]),
+                        self._leg('take_profit', self.client.futures_create_order, **exits[1]),
+                        return_exceptions=True)
+                for _ in range(self.retries):
+                    failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+                    if not failed:
+                        break
+                    retried = await asyncio.gather(
+                        *[self._leg(('stop_loss', 'take_profit')[i], self.client.futures_create_order, **exits[i])
+                          for i in failed], return_exceptions=True)
+                    for i, result in zip(failed, retried):
+                        results[i] = result
+
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                with self._timed('close'):
+                    # the exit that went through must not outlive the position
+                    await self.client.futures_cancel_all_open_orders(symbol=symbol)
+                    close = dict(symbol=symbol, side=side_tpsl, type=FUTURE_ORDER_TYPE_MARKET, quantity=quantity,
+                                 positionSide=positionSide)
+                    if positionSide == 'BOTH':
+                        # a hedge mode side (LONG, SHORT) is reduce only already and refuses the parameter
+                        close['reduceOnly'] = 'true'
+                    await self.client.futures_create_order(**close)
+                raise RuntimeError(f"Exit orders rejected, position closed: {errors}")
+            stop_loss, take_profit = results
+        return order, stop_loss, take_profit
+
+    async def spot_trade(self, symbol, quantity, price, stopLoss, takeProfit) -> tuple:
+        ''' Places a spot buy with its stop loss and take profit sells, arguments as binance.order '''
+        with self._timed('trade'):
+            order = await self._leg('entry', self.client.create_order, symbol=symbol, side=SIDE_BUY,
+                                    type=ORDER_TYPE_LIMIT, timeInForce=TIME_IN_FORCE_GTC, quantity=quantity,
+                                    price=price)
+            with self._timed('protection'):
+                stop_loss, take_profit = await asyncio.gather(
+                    self._leg('stop_loss', self.client.create_order, symbol=symbol, side=SIDE_SELL,
+                              type=ORDER_TYPE_STOP_LOSS, timeInForce=TIME_IN_FORCE_GTC, quantity=quantity,
+                              stopPrice=stopLoss),
+                    self._leg('take_profit', self.client.create_order, symbol=symbol, side=SIDE_SELL,
+                              type=ORDER_TYPE_TAKE_PROFIT, timeInForce=TIME_IN_FORCE_GTC, quantity=quantity,
+                              stopPrice=takeProfit))
+        return order, stop_loss, take_profit
+
+    def latency_summary(self) -> dict:
+        ''' Leg -> LatencyHistogram.summary '''
+        return {leg: histogram.summary() for leg, histogram in self.latency.items()}
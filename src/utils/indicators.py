@@ -13,6 +13,12 @@ License: GNU GENERAL PUBLIC LICENSE, Version 3, 29 June 2007
 import numpy as np
 import pandas as pd
 
+# Optional dependencies
+try:
+    from numba import njit
+except ImportError:  # the kernels below fall back to plain Python loops
+    njit = None
+
 """
 Usage : 
     data = {
@@ -39,7 +45,7 @@ Usage :
     # Columns as added by each function specific to their computations
     EMA(df, 'close', 'ema_5', 5)
     ATR(df, 14)
-    SuperTrend(df, 10, 3)
+    st, stx = SuperTrend(df, 10, 3)
     MACD(df)
 """
 
@@ -95,8 +101,7 @@ def SMA(df, base, target, period):
         df : Pandas DataFrame with new column added with name 'target'
     """
 
-    df[target] = df[base].rolling(window=period).mean()
-    df[target].fillna(0, inplace=True)
+    df[target] = sma(df[base], period)
 
     return df
 
@@ -136,15 +141,7 @@ def EMA(df, base, target, period, alpha=False):
         df : Pandas DataFrame with new column added with name 'target'
     """
 
-    con = pd.concat([df[:period][base].rolling(
-        window=period).mean(), df[period:][base]])
-
-    if (alpha == True):
-        # (1 - alpha) * previous_val + alpha * current_val where alpha = 1 / period
-        df[target] = con.ewm(alpha=1 / period, adjust=False).mean()
-    else:
-        # ((current_val - previous_val) * coeff) + previous_val where coeff = 2 / (period + 1)
-        df[target] = con.ewm(span=period, adjust=False).mean()
+    df[target] = ema(df[base], period, alpha=alpha)
 
     # df[target].fillna(0, inplace=True)
     return df
@@ -168,13 +165,7 @@ def ATR(df, period, ohlc=['Open', 'High', 'Low', 'Close']):
 
     # Compute true range only if it is not computed and stored earlier in the df
     if not 'TR' in df.columns:
-        df['h-l'] = df[ohlc[1]] - df[ohlc[2]]
-        df['h-yc'] = abs(df[ohlc[1]] - df[ohlc[3]].shift())
-        df['l-yc'] = abs(df[ohlc[2]] - df[ohlc[3]].shift())
-
-        df['TR'] = df[['h-l', 'h-yc', 'l-yc']].max(axis=1)
-
-        df.drop(['h-l', 'h-yc', 'l-yc'], inplace=True, axis=1)
+        df['TR'] = true_range(df[ohlc[1]], df[ohlc[2]], df[ohlc[3]])
 
     # Compute EMA of true range using ATR formula after ignoring first row
     EMA(df, 'TR', atr, period, alpha=True)
@@ -201,29 +192,8 @@ def MACD(df, fastEMA=12, slowEMA=26, signal=9, base='Close'):
             MACD Histogram (MACD (hist_$fastEMA_$slowEMA_$signal)) 
     """
 
-    fE = "ema_" + str(fastEMA)
-    sE = "ema_" + str(slowEMA)
-    macd = "MACD"
-    sig = "Signal"
-    hist = "Hist"
-
-    # Compute fast and slow EMA
-    EMA(df, base, fE, fastEMA)
-    EMA(df, base, sE, slowEMA)
-
-    # Compute MACD
-    df[macd] = np.where(np.logical_and(np.logical_not(
-        df[fE] == 0), np.logical_not(df[sE] == 0)), df[fE] - df[sE], 0)
-
-    # Compute MACD Signal
-    EMA(df, macd, sig, signal)
+    df["MACD"], df["Signal"], df["Hist"] = macd(df[base], fastEMA, slowEMA, signal)
 
-    # Compute MACD Histogram
-    df[hist] = np.where(np.logical_and(np.logical_not(
-        df[macd] == 0), np.logical_not(df[sig] == 0)), df[macd] - df[sig], 0)
-    
-    # Drop unnecessary columns
-    df.drop([fE, sE], inplace=True, axis=1)
     return df
 
 
@@ -243,13 +213,7 @@ def BBand(df, base='Close', period=20, multiplier=2):
             Lower Band (LowerBB_$period_$multiplier)
     """
 
-    upper = 'UpperBB'
-    lower = 'LowerBB'
-
-    sma = df[base].rolling(window=period, min_periods=period - 1).mean()
-    sd = df[base].rolling(window=period).std()
-    df[upper] = sma + (multiplier * sd)
-    df[lower] = sma - (multiplier * sd)
+    df['UpperBB'], df['LowerBB'] = bband(df[base], period, multiplier)
 
     # df[upper].fillna(0, inplace=True)
     # df[lower].fillna(0, inplace=True)
@@ -272,17 +236,7 @@ def RSI(df, base="Close", target="RSI", period=21):
             Relative Strength Index (RSI_$period)
     """
 
-    delta = df[base].diff()
-    up, down = delta.copy(), delta.copy()
-
-    up[up < 0] = 0
-    down[down > 0] = 0
-
-    rUp = up.ewm(com=period - 1,  adjust=False).mean()
-    rDown = down.ewm(com=period - 1, adjust=False).mean().abs()
-
-    df[target] = 100 - 100 / (1 + rUp / rDown)
-    df[target].fillna(0, inplace=True)
+    df[target] = rsi(df[base], period)
 
     return df
 
@@ -341,48 +295,260 @@ def Ichimoku(df, ohlc=['Open', 'High', 'Low', 'Close'], param=[9, 26, 52, 26]):
     return df
 
 
+# Array helpers
+def _pandas(values):
+    # The helpers work along the first axis: a 1-D array is one series and a 2-D
+    # (time x symbol) array is a panel, computed column by column by the same pandas code
+    values = np.asarray(values, dtype=np.float64)
+    return pd.Series(values) if values.ndim == 1 else pd.DataFrame(values)
+
+
+def ema(values, period, alpha=False):
+    """
+    Array counterpart of EMA, seeded with the SMA of the first 'period' values
+
+    Args :
+        values : Array-like of floats, or a 2-D (time x symbol) array computed column by column
+        period : Integer indicates the period of computation in terms of number of candles
+        alpha : Boolean if True uses alpha = 1 / period instead of 2 / (period + 1) (default is False)
+
+    Returns :
+        ema : float64 numpy array, NaN until the seed is available
+    """
+
+    values = _pandas(values)
+    con = pd.concat([values[:period].rolling(window=period).mean(), values[period:]])
+
+    if (alpha == True):
+        return con.ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+    return con.ewm(span=period, adjust=False).mean().to_numpy()
+
+
+def sma(values, period):
+    """
+    Array counterpart of SMA, the first 'period' - 1 values are filled with 0
+    """
+
+    return _pandas(values).rolling(window=period).mean().fillna(0).to_numpy()
+
+
+def macd(values, fastEMA=12, slowEMA=26, signal=9, fE=None, sE=None):
+    """
+    Array counterpart of MACD
+
+    Args :
+        fE, sE : Optional precomputed fast and slow EMAs of values, reused instead of being recomputed
+
+    Returns :
+        macd, signal, hist : float64 numpy arrays
+    """
+
+    if fE is None:
+        fE = ema(values, fastEMA)
+    if sE is None:
+        sE = ema(values, slowEMA)
+
+    # Compute MACD
+    macd = np.where(np.logical_and(np.logical_not(fE == 0), np.logical_not(sE == 0)), fE - sE, 0)
+
+    # Compute MACD Signal
+    sig = ema(macd, signal)
+
+    # Compute MACD Histogram
+    hist = np.where(np.logical_and(np.logical_not(macd == 0), np.logical_not(sig == 0)), macd - sig, 0)
+
+    return macd, sig, hist
+
+
+def bband(values, period=20, multiplier=2):
+    """
+    Array counterpart of BBand
+
+    Returns :
+        upper, lower : float64 numpy arrays
+    """
+
+    values = _pandas(values)
+    mean = values.rolling(window=period, min_periods=period - 1).mean()
+    sd = values.rolling(window=period).std()
+
+    return (mean + (multiplier * sd)).to_numpy(), (mean - (multiplier * sd)).to_numpy()
+
+
+def rsi(values, period=21):
+    """
+    Array counterpart of RSI, the undefined values are filled with 0
+    """
+
+    delta = _pandas(values).diff()
+    up, down = delta.copy(), delta.copy()
+
+    up[up < 0] = 0
+    down[down > 0] = 0
+
+    rUp = up.ewm(com=period - 1,  adjust=False).mean()
+    rDown = down.ewm(com=period - 1, adjust=False).mean().abs()
+
+    return (100 - 100 / (1 + rUp / rDown)).fillna(0).to_numpy()
+
+
+def vwap(high, low, close, volume):
+    """
+    Array counterpart of VWAP, cumulated from the first candle
+    """
+
+    v = np.asarray(volume, dtype=np.float64)
+    tp = (np.asarray(low, dtype=np.float64) + np.asarray(close, dtype=np.float64) + np.asarray(high, dtype=np.float64)) / 3
+    return (tp * v).cumsum(axis=0) / v.cumsum(axis=0)
+
+
+def true_range(high, low, close):
+    """
+    Function to compute True Range (TR) on arrays
+
+    Args :
+        high, low, close : Array-like of floats
+
+    Returns :
+        tr : float64 numpy array, the first value is High - Low
+    """
+
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+
+    # fmax skips the NaN of the first row the same way DataFrame.max(axis=1) does
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def _supertrend_loop(basic_ub, basic_lb, close, period, final_ub, final_lb, st):
+    # Band recursion of SuperTrend, written into the preallocated outputs. Runs as a
+    # Numba kernel on arrays, or as plain Python on lists when Numba is not installed
+    for i in range(period, len(close)):
+        final_ub[i] = basic_ub[i] if basic_ub[i] < final_ub[i - 1] or close[i - 1] > final_ub[i - 1] else final_ub[i - 1]
+        final_lb[i] = basic_lb[i] if basic_lb[i] > final_lb[i - 1] or close[i - 1] < final_lb[i - 1] else final_lb[i - 1]
+
+        if st[i - 1] == final_ub[i - 1] and close[i] <= final_ub[i]:
+            st[i] = final_ub[i]
+        elif st[i - 1] == final_ub[i - 1] and close[i] > final_ub[i]:
+            st[i] = final_lb[i]
+        elif st[i - 1] == final_lb[i - 1] and close[i] >= final_lb[i]:
+            st[i] = final_lb[i]
+        elif st[i - 1] == final_lb[i - 1] and close[i] < final_lb[i]:
+            st[i] = final_ub[i]
+        else:
+            st[i] = 0.00
+
+
+_supertrend_kernel = njit(cache=True, nogil=True)(_supertrend_loop) if njit is not None else None
+
+
+def _supertrend_band(basic_ub, basic_lb, close, period):
+    n = len(close)
+    if _supertrend_kernel is not None:
+        final_ub, final_lb, st = np.zeros(n), np.zeros(n), np.zeros(n)
+        _supertrend_kernel(basic_ub, basic_lb, close, period, final_ub, final_lb, st)
+        return st
+    final_ub, final_lb, st = [0.00] * n, [0.00] * n, [0.00] * n
+    _supertrend_loop(basic_ub.tolist(), basic_lb.tolist(), close.tolist(), period, final_ub, final_lb, st)
+    return np.array(st, dtype=np.float64)
+
+
 # My Indicators
-def SuperTrend(df, period, multiplier, ohlc=['Open', 'High', 'Low', 'Close']):
+# Categories of the compact STX columns, one byte per candle instead of a Python string
+TREND_DTYPE = pd.CategoricalDtype(['down', 'up'])
 
-    ATR(df, period, ohlc=ohlc)
-    atr = 'ATR'
-    st = 'ST_' + str(period) + '_' + str(multiplier)
-    stx = 'STX_' + str(period) + '_' + str(multiplier)
+
+def trend_labels(direction):
+    """
+    Maps a SuperTrend direction array to the 'up'/'down'/None labels of the STX columns
+    """
+
+    return np.where(direction == 0, None, np.where(direction < 0, 'down', 'up'))
+
+
+def trend_categories(direction):
+    """
+    Compact counterpart of trend_labels, a categorical of 'down'/'up' with NaN where the trend is undefined.
+    It compares to the labels the same way, e.g. column == 'up'
+    """
+
+    codes = np.where(direction == 0, -1, direction > 0).astype(np.int8)
+    return pd.Categorical.from_codes(codes, dtype=TREND_DTYPE)
+
+
+def supertrend(high, low, close, period, multiplier, tr=None, atr=None):
+    """
+    Function to compute SuperTrend on arrays, without touching any DataFrame
+
+    Args :
+        high, low, close : Array-like of floats, or 2-D (time x symbol) arrays with one symbol per column
+        period : Integer indicates the ATR period
+        multiplier : Number of ATRs between the mid price and the bands
+        tr : Optional precomputed True Range, reused instead of being recomputed
+        atr : Optional precomputed ATR of 'period' (ema of tr with alpha), skips the ATR computation
+
+    Returns :
+        st : float64 numpy array with the SuperTrend band, NaN for the first 'period' candles
+        direction : int8 numpy array, 1 for up, -1 for down and 0 where the trend is undefined
+    """
+
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if atr is None:
+        atr = ema(true_range(high, low, close) if tr is None else tr, period, alpha=True)
 
     # Compute basic upper and lower bands
-    df['basic_ub'] = (df[ohlc[1]] + df[ohlc[2]]) / 2 + multiplier * df[atr]
-    df['basic_lb'] = (df[ohlc[1]] + df[ohlc[2]]) / 2 - multiplier * df[atr]
-
-    # Compute final upper and lower bands
-    df['final_ub'] = 0.00
-    df['final_lb'] = 0.00
-    for i in range(period, len(df)):
-        df['final_ub'].iat[i] = df['basic_ub'].iat[i] if df['basic_ub'].iat[i] < df['final_ub'].iat[i -
-                                                                                                    1] or df[ohlc[3]].iat[i - 1] > df['final_ub'].iat[i - 1] else df['final_ub'].iat[i - 1]
-        df['final_lb'].iat[i] = df['basic_lb'].iat[i] if df['basic_lb'].iat[i] > df['final_lb'].iat[i -
-                                                                                                    1] or df[ohlc[3]].iat[i - 1] < df['final_lb'].iat[i - 1] else df['final_lb'].iat[i - 1]
-
-    # Set the Supertrend value
-    df[st] = 0.00
-    for i in range(period, len(df)):
-        df[st].iat[i] = df['final_ub'].iat[i] if df[st].iat[i - 1] == df['final_ub'].iat[i - 1] and df[ohlc[3]].iat[i] <= df['final_ub'].iat[i] else \
-            df['final_lb'].iat[i] if df[st].iat[i - 1] == df['final_ub'].iat[i - 1] and df[ohlc[3]].iat[i] > df['final_ub'].iat[i] else \
-            df['final_lb'].iat[i] if df[st].iat[i - 1] == df['final_lb'].iat[i - 1] and df[ohlc[3]].iat[i] >= df['final_lb'].iat[i] else \
-            df['final_ub'].iat[i] if df[st].iat[i - 1] == df['final_lb'].iat[i -
-                                                                             1] and df[ohlc[3]].iat[i] < df['final_lb'].iat[i] else 0.00
+    basic_ub = (high + low) / 2 + multiplier * atr
+    basic_lb = (high + low) / 2 - multiplier * atr
+
+    # Compute final upper and lower bands and the Supertrend value
+    if close.ndim == 1:
+        st = _supertrend_band(basic_ub, basic_lb, close, period)
+    else:
+        # the band recursion runs once per symbol of a (time x symbol) panel
+        st = np.empty_like(close)
+        for j in range(close.shape[1]):
+            st[:, j] = _supertrend_band(np.ascontiguousarray(basic_ub[:, j]), np.ascontiguousarray(basic_lb[:, j]),
+                                        np.ascontiguousarray(close[:, j]), period)
 
     # Mark the trend direction up/down
-    df[stx] = np.where((df[st] > 0.00), np.where(
-        (df[ohlc[3]] < df[st]), 'down',  'up'), None)
-    
+    direction = np.where(st > 0.00, np.where(close < st, -1, 1), 0).astype(np.int8)
+
     # Add nulls to the initial periods
-    for i in range(0, period):
-        df[st].iat[i] = None
+    st[:period] = np.nan
+
+    return st, direction
+
+
+def SuperTrend(df, period, multiplier, ohlc=['Open', 'High', 'Low', 'Close']):
+    """
+    Function to compute SuperTrend
+
+    Args :
+        df : Pandas DataFrame which contains ['date', 'open', 'high', 'low', 'close', 'volume'] columns
+        period : Integer indicates the ATR period
+        multiplier : Number of ATRs between the mid price and the bands
+        ohlc: List defining OHLC Column names (default ['Open', 'High', 'Low', 'Close'])
+
+    Returns :
+        SuperTrend (ST_$period_$multiplier) and its direction 'up'/'down'/None (STX_$period_$multiplier)
+        as two Pandas Series, df is left untouched
+    """
+
+    st = 'ST_' + str(period) + '_' + str(multiplier)
+    stx = 'STX_' + str(period) + '_' + str(multiplier)
+
+    band, direction = supertrend(df[ohlc[1]], df[ohlc[2]], df[ohlc[3]], period, multiplier)
 
-    return df[st], df[stx]
+    return pd.Series(band, index=df.index, name=st), \
+        pd.Series(trend_labels(direction), index=df.index, name=stx)
 
 
 def VWAP(df):
-    v = df['Volume'].values
-    tp = (df['Low'] + df['Close'] + df['High']).div(3).values
-    return df.assign(vwap=(tp * v).cumsum() / v.cumsum())
+    return df.assign(vwap=vwap(df['High'], df['Low'], df['Close'], df['Volume']))
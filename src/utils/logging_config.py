@@ -3,6 +3,9 @@ import logging
 def configure_logging():
     # Create a main logger for the project
     main_logger = logging.getLogger('TradingBot')
+    if main_logger.handlers:
+        # Already configured, adding the handlers again would duplicate every record
+        return main_logger
     main_logger.setLevel(logging.DEBUG)  # Set the main logger's level to the lowest level you want to capture
 
     # Create separate handlers for different log files
@@ -0,0 +1,439 @@
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from binance.enums import *
+from binance.exceptions import BinanceAPIException
+
+# Orders resting until the price reaches their stopPrice, the others fill when placed
+STOP_TYPES = (FUTURE_ORDER_TYPE_STOP_MARKET, FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET)
+
+
+def _error(code: int, message: str, status: int=400) -> BinanceAPIException:
+    return BinanceAPIException(None, status, json.dumps({'code': code, 'msg': message}))
+
+
+def _triggered(order: dict, low: float, high: float) -> bool:
+    # a stop buys once the price rises to it and sells once it falls to it, a take profit the opposite
+    rising = (order['type'] == FUTURE_ORDER_TYPE_STOP_MARKET) == (order['side'] == SIDE_BUY)
+    return high >= order['stopPrice'] if rising else low <= order['stopPrice']
+
+
+class MockExchange:
+    ''' In-process stand-in for the futures order, balance and position endpoints of binance.client.Client
+
+    Entry orders (MARKET, LIMIT, LIMIT_MAKER) fill when placed, at their price or at the
+    last price. STOP_MARKET and TAKE_PROFIT_MARKET orders rest in the book until a
+    replayed candle (on_kline) or trade (on_trade) reaches their stopPrice, and only
+    reduce the position they protect: once it is flat the other exit orders of that
+    position expire. When a candle reaches both a stop loss and a take profit, the stop
+    loss fills first, like the backtest's default tie_break. A stop fills at its
+    stopPrice, or at the Open when the candle opened past it. A reduceOnly order only
+    reduces the position too, and expires when it is flat.
+
+    Positions are isolated, a fill moves the margin (notional / leverage) between the
+    available balance and the position and realizes the PnL of what it closes.
+
+    Every fill sends the ACCOUNT_UPDATE event of the futures user data stream to the
+    subscribed callbacks (see subscribe), e.g. AccountState.on_message.
+
+    Every call waits latency seconds plus an exponential jitter, and fails with a
+    BinanceAPIException with probability failure_rate or when queued with fail_next,
+    to measure the live loop under a slow or flaky exchange.
+
+    Args:
+        balance (float): Starting futures balance of asset
+        asset (str): Margin asset of the futures account
+        spot (dict): Spot balances, asset -> free amount
+        leverage (int): Leverage of every symbol, see futures_change_leverage
+        latency (float): Seconds every call waits
+        jitter (float): Mean of the exponential extra wait, in seconds
+        failure_rate (float): Probability that a call fails
+        seed (int): Seed of the jitter and failures
+
+    Attributes:
+        orders (dict): orderId -> order (numbers as floats, see _view for the Binance layout)
+        positions (dict): (symbol, positionSide) -> {'amount', 'entry'}, amount signed
+        prices (dict): symbol -> last price
+        fills (list): Filled orders in fill order
+        calls (dict): method -> number of calls
+    '''
+    def __init__(self, balance: float=1000, asset: str='USDT', spot: dict=None, leverage: int=1,
+                 latency: float=0, jitter: float=0, failure_rate: float=0, seed: int=0):
+        self.asset = asset
+        self.balance = float(balance)
+        self.spot = {asset: float(amount) for asset, amount in (spot or {asset: balance}).items()}
+        self.leverage = {}
+        self.default_leverage = leverage
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.orders = {}
+        self.positions = {}
+        self.prices = {}
+        self.fills = []
+        self.calls = {}
+        self.listeners = []
+        self.time = 0
+        self._ids = itertools.count(1)
+        self._failures = []
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+
+    def fail_next(self, count: int=1, code: int=-1001,
+                  message: str='Internal error; unable to process your request. Please try again.'):
+        ''' Makes the next count calls fail with the given Binance error '''
+        with self._lock:
+            self._failures.extend([(code, message)] * count)
+
+    def subscribe(self, callback):
+        ''' Calls callback with every user data stream event, like ThreadedWebsocketManager.start_futures_user_socket '''
+        self.listeners.append(callback)
+
+    def _call(self, method: str):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            wait = self.latency + (self._rng.exponential(self.jitter) if self.jitter else 0)
+            failure = self._failures.pop(0) if self._failures else None
+            if failure is None and self.failure_rate and self._rng.random() < self.failure_rate:
+                failure = (-1001, 'Internal error; unable to process your request. Please try again.')
+        if wait:
+            time.sleep(wait)
+        if failure is not None:
+            raise _error(*failure)
+
+    # exchange side
+
+    def on_trade(self, symbol: str, price: float, time: int=None):
+        ''' A trade at price, fills the resting orders it reaches '''
+        self.on_kline(symbol, {'Date': time, 'Open': price, 'High': price, 'Low': price, 'Close': price})
+
+    def on_kline(self, symbol: str, candle: dict):
+        ''' A closed candle (Date, Open, High, Low, Close), fills the resting orders its range reaches
+
+        The Close becomes the last price, the one the next entry orders fill at.
+        '''
+        with self._lock:
+            if candle.get('Date') is not None:
+                self.time = int(candle['Date'])
+            low, high, opening = float(candle['Low']), float(candle['High']), float(candle['Open'])
+            resting = [order for order in self.orders.values() if order['symbol'] == symbol
+                       and order['status'] == ORDER_STATUS_NEW and _triggered(order, low, high)]
+            resting.sort(key=lambda order: (order['type'] != FUTURE_ORDER_TYPE_STOP_MARKET, order['orderId']))
+            for order in resting:
+                if order['status'] != ORDER_STATUS_NEW:
+                    continue
+                # opened past the stop: filled at the Open
+                price = opening if _triggered(order, opening, opening) else order['stopPrice']
+                self._fill(order, price)
+            self.prices[symbol] = float(candle['Close'])
+
+    def replay(self, symbol: str, df: pd.DataFrame):
+        ''' on_kline of every candle of an OHLCV frame '''
+        for candle in df[['Date', 'Open', 'High', 'Low', 'Close']].to_dict('records'):
+            self.on_kline(symbol, candle)
+
+    def _fill(self, order, price):
+        key = (order['symbol'], order['positionSide'])
+        position = self.positions.setdefault(key, {'amount': 0.0, 'entry': 0.0})
+        leverage = self.leverage.get(order['symbol'], self.default_leverage)
+        signed = order['quantity'] if order['side'] == SIDE_BUY else -order['quantity']
+
+        if order['type'] in STOP_TYPES or order['reduceOnly']:
+            # exits only reduce the position they protect
+            if position['amount'] == 0 or np.sign(signed) == np.sign(position['amount']):
+                order['status'] = ORDER_STATUS_EXPIRED
+                return
+            signed = np.sign(signed) * min(abs(signed), abs(position['amount']))
+
+        amount = position['amount']
+        if amount == 0 or np.sign(signed) == np.sign(amount):
+            position['entry'] = (abs(amount) * position['entry'] + abs(signed) * price) / (abs(amount) + abs(signed))
+            position['amount'] = amount + signed
+        else:
+            closed = min(abs(signed), abs(amount))
+            self.balance += closed * (price - position['entry']) * np.sign(amount)
+            position['amount'] = amount + signed
+            if abs(signed) > abs(amount):
+                # flipped, the rest opened at price
+                position['entry'] = price
+            elif position['amount'] == 0:
+                position['entry'] = 0.0
+        position['margin'] = abs(position['amount']) * position['entry'] / leverage
+
+        order.update(status=ORDER_STATUS_FILLED, executedQty=abs(signed), avgPrice=price, updateTime=self.time)
+        self.fills.append(dict(order))
+        if position['amount'] == 0:
+            for other in self.orders.values():
+                if (other['symbol'], other['positionSide']) == key and other['status'] == ORDER_STATUS_NEW:
+                    other['status'] = ORDER_STATUS_EXPIRED
+
+        event = {'e': 'ACCOUNT_UPDATE', 'E': self.time, 'T': self.time, 'a': {'m': 'ORDER', 'B': [
+            {'a': self.asset, 'wb': str(self.balance), 'cw': str(self._available()), 'bc': '0'}], 'P': [
+            {'s': order['symbol'], 'pa': str(position['amount']), 'ep': str(position['entry']), 'cr': '0', 'up': '0',
+             'mt': 'isolated', 'iw': str(position['margin']), 'ps': order['positionSide']}]}}
+        for callback in self.listeners:
+            callback(event)
+
+    def _available(self):
+        return self.balance - sum(position.get('margin', 0.0) for position in self.positions.values())
+
+    @staticmethod
+    def _view(order: dict) -> dict:
+        # order as Binance returns it, numbers as strings
+        view = {key: value for key, value in order.items() if key != 'quantity'}
+        view.update(origQty=str(order['quantity']), executedQty=str(order['executedQty']),
+                    price=str(order['price']), avgPrice=str(order['avgPrice']), stopPrice=str(order['stopPrice']))
+        return view
+
+    # client side, same methods and results as binance.client.Client
+
+    def futures_create_order(self, **params):
+        self._call('futures_create_order')
+        return self._create_order(params)
+
+    def _create_order(self, params):
+        with self._lock:
+            symbol = params['symbol']
+            order = {
+                'orderId': next(self._ids), 'clientOrderId': params.get('newClientOrderId', ''),
+                'symbol': symbol, 'status': ORDER_STATUS_NEW, 'type': params['type'], 'side': params['side'],
+                'positionSide': params.get('positionSide', 'BOTH'), 'quantity': float(params['quantity']),
+                'executedQty': 0.0, 'price': float(params.get('price', 0)), 'avgPrice': 0.0,
+                'stopPrice': float(params.get('stopPrice', 0)), 'timeInForce': params.get('timeInForce', TIME_IN_FORCE_GTC),
+                'reduceOnly': str(params.get('reduceOnly', False)).lower() == 'true', 'updateTime': self.time,
+            }
+            last = self.prices.get(symbol)
+            if order['type'] in STOP_TYPES:
+                if last is not None and _triggered(order, last, last):
+                    raise _error(-2021, 'Order would immediately trigger.')
+                self.orders[order['orderId']] = order
+                return self._view(order)
+
+            price = order['price'] or last
+            if price is None:
+                raise _error(-1121, 'Invalid symbol.')
+            key = (symbol, order['positionSide'])
+            amount = self.positions.get(key, {}).get('amount', 0.0)
+            signed = order['quantity'] if order['side'] == SIDE_BUY else -order['quantity']
+            if not order['reduceOnly'] and (amount == 0 or np.sign(signed) == np.sign(amount)):
+                margin = order['quantity'] * price / self.leverage.get(symbol, self.default_leverage)
+                if margin > self._available() + 1e-9:
+                    raise _error(-2019, 'Margin is insufficient.')
+            self.orders[order['orderId']] = order
+            self._fill(order, price)
+            return self._view(order)
+
+    def futures_place_batch_order(self, **params):
+        ''' Places the orders of batchOrders (a list, or its JSON), each result is the order or its error '''
+        self._call('futures_place_batch_order')
+        orders = params['batchOrders']
+        results = []
+        for order in json.loads(orders) if isinstance(orders, str) else orders:
+            try:
+                results.append(self._create_order(order))
+            except BinanceAPIException as e:
+                results.append({'code': e.code, 'msg': e.message})
+        return results
+
+    def futures_cancel_all_open_orders(self, **params):
+        self._call('futures_cancel_all_open_orders')
+        with self._lock:
+            for order in self.orders.values():
+                if order['symbol'] == params['symbol'] and order['status'] == ORDER_STATUS_NEW:
+                    order['status'] = ORDER_STATUS_CANCELED
+        return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+
+    def futures_get_open_orders(self, **params):
+        self._call('futures_get_open_orders')
+        with self._lock:
+            return [self._view(order) for order in self.orders.values() if order['status'] == ORDER_STATUS_NEW
+                    and params.get('symbol', order['symbol']) == order['symbol']]
+
+    def futures_change_leverage(self, **params):
+        self._call('futures_change_leverage')
+        with self._lock:
+            self.leverage[params['symbol']] = int(params['leverage'])
+        return {'symbol': params['symbol'], 'leverage': int(params['leverage'])}
+
+    def futures_account_balance(self, **params):
+        self._call('futures_account_balance')
+        with self._lock:
+            return [{'asset': self.asset, 'balance': str(self.balance), 'availableBalance': str(self._available()),
+                     'updateTime': self.time}]
+
+    def futures_position_information(self, **params):
+        self._call('futures_position_information')
+        with self._lock:
+            positions = []
+            for (symbol, side), position in self.positions.items():
+                if params.get('symbol', symbol) != symbol:
+                    continue
+                mark = self.prices.get(symbol, position['entry'])
+                positions.append({
+                    'symbol': symbol, 'positionSide': side, 'positionAmt': str(position['amount']),
+                    'entryPrice': str(position['entry']), 'markPrice': str(mark),
+                    'unRealizedProfit': str((mark - position['entry']) * position['amount']),
+                    'leverage': str(self.leverage.get(symbol, self.default_leverage)), 'marginType': 'isolated',
+                    'isolatedMargin': str(position.get('margin', 0.0)), 'updateTime': self.time})
+            return positions
+
+    def get_account(self, **params):
+        self._call('get_account')
+        with self._lock:
+            return {'balances': [{'asset': asset, 'free': str(free), 'locked': '0.0'} for asset, free in self.spot.items()]}
+
+    def get_asset_balance(self, asset, **params):
+        for balance in self.get_account(**params)['balances']:
+            if balance['asset'].lower() == asset.lower():
+                return balance
+        return None
+
+
+def serve_exchange(exchange: MockExchange, port: int=0):
+    ''' Serves a MockExchange over HTTP on localhost, on the Binance paths of its methods
+
+    Point a client at it with futures url http://127.0.0.1:{port}/fapi and spot url
+    http://127.0.0.1:{port}/api (see execution.AsyncExecutor). Parameters are read from
+    the query and the form body, signatures are not checked. Connections are kept alive
+    (HTTP/1.1) so pooled clients reuse them.
+
+    Args:
+        port (int): Port to listen on, 0 picks a free one (see server.server_address)
+
+    Returns:
+        server (ThreadingHTTPServer): Running in a daemon thread, stop it with server.shutdown()
+    '''
+    routes = {
+        ('POST', '/fapi/v1/order'): exchange.futures_create_order,
+        ('POST', '/fapi/v1/batchOrders'): exchange.futures_place_batch_order,
+        ('DELETE', '/fapi/v1/allOpenOrders'): exchange.futures_cancel_all_open_orders,
+        ('GET', '/fapi/v1/openOrders'): exchange.futures_get_open_orders,
+        ('POST', '/fapi/v1/leverage'): exchange.futures_change_leverage,
+        ('GET', '/fapi/v1/balance'): exchange.futures_account_balance,
+        ('GET', '/fapi/v2/balance'): exchange.futures_account_balance,
+        ('GET', '/fapi/v1/positionRisk'): exchange.futures_position_information,
+        ('GET', '/fapi/v2/positionRisk'): exchange.futures_position_information,
+        ('GET', '/api/v3/account'): exchange.get_account,
+        ('GET', '/api/v3/ping'): lambda **params: {},
+        ('GET', '/api/v3/time'): lambda **params: {'serverTime': int(time.time() * 1000)},
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body go out in two writes, Nagle would hold the body for the delayed ack
+        disable_nagle_algorithm = True
+
+        def handle_request(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode() if length else ''
+            method = routes.get((self.command, url.path))
+            if method is None:
+                status, result = 404, {'code': -1000, 'msg': f'Unknown path {url.path}'}
+            else:
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                params.update({key: values[0] for key, values in parse_qs(body).items()})
+                params.pop('signature', None)
+                try:
+                    status, result = 200, method(**params)
+                except BinanceAPIException as e:
+                    status, result = e.status_code, {'code': e.code, 'msg': e.message}
+
+            body = json.dumps(result).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_DELETE = handle_request
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark_live(engine, exchange: MockExchange, df: pd.DataFrame, warm_up: int) -> dict:
+    ''' Trades the candles of df after the first warm_up ones through a LiveEngine on a MockExchange
+
+    Each candle first goes to the exchange, which fills the resting exits its range
+    reaches, then to the engine, whose trades fill at its Close.
+
+    Returns:
+        result (dict): candles, candles_per_s, the decision latency (candle to make_trade
+            result, orders included) percentiles in milliseconds, trades, fills and balance
+    '''
+    from src.utils.execution import LatencyHistogram
+
+    symbol = engine.strategy.config['trade_symbol']
+    engine.warm_up(df.iloc[:warm_up])
+    exchange.replay(symbol, df.iloc[:warm_up])
+    candles = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].iloc[warm_up:].to_dict('records')
+
+    trades = 0
+    start = time.perf_counter()
+    for candle in candles:
+        exchange.on_kline(symbol, candle)
+        trades += bool(engine.on_candle(candle))
+    elapsed = time.perf_counter() - start
+
+    latency = LatencyHistogram()
+    for seconds in engine.latency:
+        latency.record(seconds)
+    return {'candles': len(candles), 'candles_per_s': len(candles) / elapsed, **latency.summary(),
+            'trades': trades, 'fills': len(exchange.fills), 'balance': exchange.balance}
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+
+    import yaml
+
+    from src.data.synthetic import synthetic_ohlcv
+    from src.strategies.live import LiveEngine
+    from src.strategies.registry import STRATEGIES
+    from src.utils.account_state import AccountState
+
+    parser = argparse.ArgumentParser(description='Benchmarks the live loop trading synthetic candles on a mock exchange')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--rows', type=int, default=20000, help='number of synthetic candles')
+    parser.add_argument('--warm-up', type=int, default=1000, help='candles fed before trading')
+    parser.add_argument('--latency', type=float, default=0, help='seconds every exchange call waits')
+    parser.add_argument('--jitter', type=float, default=0, help='mean exponential extra wait, in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--http', action='store_true',
+                        help='serve the exchange on localhost and trade through the async executor')
+    parser.add_argument('--account', action='store_true',
+                        help='read the balances from an AccountState fed by the exchange events')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    exchange = MockExchange(balance=1000, leverage=config['leverage'], latency=args.latency, jitter=args.jitter,
+                            failure_rate=args.failure_rate)
+    if args.http:
+        server = serve_exchange(exchange)
+        config['execution'] = {**config.get('execution', {}), 'async': True,
+                               'futures_url': f'http://127.0.0.1:{server.server_address[1]}/fapi'}
+    account = None
+    if args.account:
+        account = AccountState()
+        account.sync(exchange)
+        exchange.subscribe(account.on_message)
+    strategy = STRATEGIES[config['strategy_name']](config, client=exchange, account=account)
+    engine = LiveEngine(strategy, trade=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = benchmark_live(engine, exchange, synthetic_ohlcv(args.rows), args.warm_up)
+    print(json.dumps(result, indent=2))
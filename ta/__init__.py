@@ -9,6 +9,7 @@ from ta.wrapper import (
     add_all_ta_features,
     add_momentum_ta,
     add_others_ta,
+    add_ta_features,
     add_trend_ta,
     add_volatility_ta,
     add_volume_ta,
@@ -18,6 +19,7 @@ __all__ = [
     "add_all_ta_features",
     "add_momentum_ta",
     "add_others_ta",
+    "add_ta_features",
     "add_trend_ta",
     "add_volatility_ta",
     "add_volume_ta",
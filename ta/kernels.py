@@ -0,0 +1,222 @@
+"""
+.. module:: kernels
+   :synopsis: Compiled recursions of the loop based indicators.
+
+Each recursion is written once as a plain loop over indexable inputs that writes
+into preallocated outputs. With Numba installed the loop is compiled and runs on
+float64 arrays, otherwise the same loop runs on Python lists, which still avoids
+the per element pandas indexing of the original loops. Both paths do the same
+float operations in the same order, so the outputs do not depend on the path.
+
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # the loops run on lists instead
+    njit = None
+
+
+def _compile(loop):
+    return njit(cache=True, nogil=True)(loop) if njit is not None else None
+
+
+def _run(loop, kernel, args, outputs):
+    """Run a loop on args, writing into the float64 outputs, and return the outputs"""
+    if kernel is not None:
+        kernel(*args, *outputs)
+        return outputs
+    lists = [output.tolist() for output in outputs]
+    loop(
+        *[arg.tolist() if isinstance(arg, np.ndarray) else arg for arg in args],
+        *lists,
+    )
+    return [np.array(values, dtype=np.float64) for values in lists]
+
+
+def _wilder_average_loop(values, window, start, out):
+    for i in range(start, len(out)):
+        out[i] = (out[i - 1] * (window - 1) + values[i]) / float(window)
+
+
+def _wilder_sum_loop(values, window, out):
+    for i in range(1, len(out) - 1):
+        out[i] = out[i - 1] - (out[i - 1] / float(window)) + values[window + i]
+
+
+def _kama_loop(close, smoothing_constant, out):
+    first_value = True
+    for i in range(len(out)):
+        if smoothing_constant[i] != smoothing_constant[i]:
+            out[i] = np.nan
+        elif first_value:
+            out[i] = close[i]
+            first_value = False
+        else:
+            out[i] = out[i - 1] + smoothing_constant[i] * (close[i] - out[i - 1])
+
+
+def _psar_loop(high, low, step, max_step, psar, psar_up, psar_down):  # noqa
+    up_trend = True
+    acceleration_factor = step
+    up_trend_high = high[0]
+    down_trend_low = low[0]
+
+    for i in range(2, len(psar)):
+        reversal = False
+
+        max_high = high[i]
+        min_low = low[i]
+
+        if up_trend:
+            psar[i] = psar[i - 1] + (acceleration_factor * (up_trend_high - psar[i - 1]))
+
+            if min_low < psar[i]:
+                reversal = True
+                psar[i] = up_trend_high
+                down_trend_low = min_low
+                acceleration_factor = step
+            else:
+                if max_high > up_trend_high:
+                    up_trend_high = max_high
+                    acceleration_factor = min(acceleration_factor + step, max_step)
+
+                if low[i - 2] < psar[i]:
+                    psar[i] = low[i - 2]
+                elif low[i - 1] < psar[i]:
+                    psar[i] = low[i - 1]
+        else:
+            psar[i] = psar[i - 1] - (acceleration_factor * (psar[i - 1] - down_trend_low))
+
+            if max_high > psar[i]:
+                reversal = True
+                psar[i] = down_trend_low
+                up_trend_high = max_high
+                acceleration_factor = step
+            else:
+                if min_low < down_trend_low:
+                    down_trend_low = min_low
+                    acceleration_factor = min(acceleration_factor + step, max_step)
+
+                if high[i - 2] > psar[i]:
+                    psar[i] = high[i - 2]
+                elif high[i - 1] > psar[i]:
+                    psar[i] = high[i - 1]
+
+        up_trend = up_trend != reversal  # XOR
+
+        if up_trend:
+            psar_up[i] = psar[i]
+        else:
+            psar_down[i] = psar[i]
+
+
+def _nvi_loop(price_change, vol_decrease, out):
+    for i in range(1, len(out)):
+        if vol_decrease[i]:
+            out[i] = out[i - 1] * (1.0 + price_change[i])
+        else:
+            out[i] = out[i - 1]
+
+
+def _rolling_argmax_loop(values, window, queue, out):
+    # queue holds the indices of a monotonic deque, decreasing values from head to
+    # tail, where nan is above everything and ties keep the earliest index, so the
+    # head is the first maximum of the window like np.argmax
+    head = 0
+    tail = 0
+    for i in range(len(values)):
+        value = values[i]
+        while tail > head:
+            last = values[queue[tail - 1]]
+            if last < value or (value != value and last == last):
+                tail -= 1
+            else:
+                break
+        queue[tail] = i
+        tail += 1
+        start = max(i - window + 1, 0)
+        if queue[head] < start:
+            head += 1
+        out[i] = queue[head] - start + 1
+
+
+_wilder_average_kernel = _compile(_wilder_average_loop)
+_wilder_sum_kernel = _compile(_wilder_sum_loop)
+_kama_kernel = _compile(_kama_loop)
+_psar_kernel = _compile(_psar_loop)
+_nvi_kernel = _compile(_nvi_loop)
+_rolling_argmax_kernel = _compile(_rolling_argmax_loop)
+
+
+def _float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def wilder_average(values, window: int, start: int, seed: float, size: int = None) -> np.ndarray:
+    """Wilder's moving average, out[i] = (out[i-1] * (window-1) + values[i]) / window.
+
+    Args:
+        values(array): inputs, values[i] is used for out[i].
+        window(int): n period.
+        start(int): first smoothed index, out[start-1] is the seed and the values
+            before it are 0.
+        seed(float): value of out[start-1].
+        size(int): length of the output, defaults to the length of values.
+
+    Returns:
+        numpy.ndarray: the smoothed values.
+    """
+    values = _float_array(values)
+    out = np.zeros(len(values) if size is None else size)
+    out[start - 1] = seed
+    return _run(_wilder_average_loop, _wilder_average_kernel, (values, window, start), [out])[0]
+
+
+def wilder_sum(values, window: int, seed: float) -> np.ndarray:
+    """Wilder's running sum of ADXIndicator, n - window + 1 values from the seed sum.
+
+    out[i] = out[i-1] - out[i-1] / window + values[window + i], the last value is
+    left at 0 like in the original loops.
+    """
+    values = _float_array(values)
+    out = np.zeros(len(values) - (window - 1))
+    out[0] = seed
+    return _run(_wilder_sum_loop, _wilder_sum_kernel, (values, window), [out])[0]
+
+
+def kama(close, smoothing_constant) -> np.ndarray:
+    """Kaufman's Adaptive Moving Average from its smoothing constants, NaN where they are NaN"""
+    close = _float_array(close)
+    smoothing_constant = _float_array(smoothing_constant)
+    return _run(_kama_loop, _kama_kernel, (close, smoothing_constant), [np.zeros(len(close))])[0]
+
+
+def psar(high, low, close, step: float, max_step: float):
+    """Parabolic SAR, returns the psar, psar_up and psar_down arrays (the trend ones NaN elsewhere)"""
+    high = _float_array(high)
+    low = _float_array(low)
+    outputs = [_float_array(close).copy(), np.full(len(close), np.nan), np.full(len(close), np.nan)]
+    return tuple(_run(_psar_loop, _psar_kernel, (high, low, float(step), float(max_step)), outputs))
+
+
+def negative_volume_index(price_change, vol_decrease) -> np.ndarray:
+    """Negative Volume Index from 1000, moved by the price change on the volume decreases"""
+    price_change = _float_array(price_change)
+    vol_decrease = np.ascontiguousarray(vol_decrease, dtype=np.bool_)
+    out = np.full(len(price_change), np.nan)
+    out[0] = 1000
+    return _run(_nvi_loop, _nvi_kernel, (price_change, vol_decrease), [out])[0]
+
+
+def rolling_argmax(values, window: int) -> np.ndarray:
+    """1-based position of the first maximum in the window ending on each value.
+
+    Windows are shorter than window at the start, nan counts as the maximum like in
+    np.argmax. Runs in O(n) whatever the window.
+    """
+    values = _float_array(values)
+    queue = np.zeros(len(values), dtype=np.int64)
+    return _run(
+        _rolling_argmax_loop, _rolling_argmax_kernel, (values, window, queue), [np.zeros(len(values))]
+    )[0]
@@ -5,10 +5,65 @@
 .. moduleauthor:: Dario Lopez Padial (Bukosabino)
 
 """
+import math
+from collections import deque
+
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin, _ema
+from ta import kernels
+from ta.utils import (
+    IndicatorMixin,
+    RollingMean,
+    RollingMinMax,
+    RollingSum,
+    RunningEWM,
+    _divide,
+    _ema,
+    _nanmax,
+    _rolling_max,
+    _rolling_min,
+    _true_range,
+)
+
+
+def _rsi_step(window: int, fillna: bool):
+    """Incremental RSIIndicator._run, returns a function of the next close giving its rsi"""
+    min_periods = 0 if fillna else window
+    emaup = RunningEWM(alpha=1 / window, min_periods=min_periods)
+    emadn = RunningEWM(alpha=1 / window, min_periods=min_periods)
+    prev_close = [None]
+
+    def step(close):
+        diff = close - prev_close[0] if prev_close[0] is not None else math.nan
+        prev_close[0] = close
+        up_direction = emaup.update(diff if diff > 0 else 0.0)
+        down_direction = emadn.update(-(diff if diff < 0 else 0.0))
+        if down_direction == 0:
+            return 100.0
+        return 100 - (100 / (1 + _divide(up_direction, down_direction)))
+
+    return step
+
+
+def _oscillator_step(window_slow: int, window_fast: int, window_sign: int, fillna: bool):
+    """Incremental PercentagePriceOscillator._run, returns a function of the next value giving
+    the oscillator, its signal and its histogram"""
+
+    def ema(window):
+        return RunningEWM(span=window, min_periods=0 if fillna else window)
+
+    emafast = ema(window_fast)
+    emaslow = ema(window_slow)
+    signal = ema(window_sign)
+
+    def step(value):
+        slow = emaslow.update(value)
+        oscillator = _divide(emafast.update(value) - slow, slow) * 100
+        oscillator_signal = signal.update(oscillator)
+        return oscillator, oscillator_signal, oscillator - oscillator_signal
+
+    return step
 
 
 class RSIIndicator(IndicatorMixin):
@@ -50,6 +105,13 @@ class RSIIndicator(IndicatorMixin):
             index=self._close.index,
         )
 
+    _online_inputs = ("close",)
+    _online_fills = {"rsi": 50}
+
+    def _online_step(self):
+        rsi = _rsi_step(self._window, self._fillna)
+        return lambda bar: {"rsi": rsi(bar["close"])}
+
     def rsi(self) -> pd.Series:
         """Relative Strength Index (RSI)
 
@@ -109,6 +171,26 @@ class TSIIndicator(IndicatorMixin):
         self._tsi = smoothed / smoothed_abs
         self._tsi *= 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"tsi": 0}
+
+    def _online_step(self):
+        def smoothing():
+            slow = RunningEWM(span=self._window_slow, min_periods=0 if self._fillna else self._window_slow)
+            fast = RunningEWM(span=self._window_fast, min_periods=0 if self._fillna else self._window_fast)
+            return lambda value: fast.update(slow.update(value))
+
+        smoothed = smoothing()
+        smoothed_abs = smoothing()
+        prev_close = [math.nan]
+
+        def step(bar):
+            diff_close = bar["close"] - prev_close[0]
+            prev_close[0] = bar["close"]
+            return {"tsi": _divide(smoothed(diff_close), smoothed_abs(abs(diff_close))) * 100}
+
+        return step
+
     def tsi(self) -> pd.Series:
         """True strength index (TSI)
 
@@ -175,7 +257,7 @@ class UltimateOscillator(IndicatorMixin):
 
     def _run(self):
         close_shift = self._close.shift(1)
-        true_range = self._true_range(self._high, self._low, close_shift)
+        true_range = _true_range(self._high, self._low, self._close)
         buying_pressure = self._close - pd.DataFrame(
             {"low": self._low, "close": close_shift}
         ).min(axis=1, skipna=False)
@@ -204,6 +286,43 @@ class UltimateOscillator(IndicatorMixin):
             / (self._weight1 + self._weight2 + self._weight3)
         )
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"ultimate_oscillator": 50}
+
+    def _online_step(self):
+        def average(window):
+            min_periods = 0 if self._fillna else window
+            buying_pressure = RollingSum(window, min_periods)
+            true_range = RollingSum(window, min_periods)
+            return lambda bp, tr: _divide(buying_pressure.update(bp), true_range.update(tr))
+
+        avg_s = average(self._window1)
+        avg_m = average(self._window2)
+        avg_l = average(self._window3)
+        prev_close = [math.nan]
+
+        def step(bar):
+            high, low, close = bar["high"], bar["low"], bar["close"]
+            close_shift = prev_close[0]
+            prev_close[0] = close
+            true_range = _nanmax(high - low, abs(high - close_shift), abs(low - close_shift))
+            # the minimum of _run does not skip the missing values
+            buying_pressure = close - (
+                math.nan if low != low or close_shift != close_shift else min(low, close_shift)
+            )
+            uo = (
+                100.0
+                * (
+                    (self._weight1 * avg_s(buying_pressure, true_range))
+                    + (self._weight2 * avg_m(buying_pressure, true_range))
+                    + (self._weight3 * avg_l(buying_pressure, true_range))
+                )
+                / (self._weight1 + self._weight2 + self._weight3)
+            )
+            return {"ultimate_oscillator": uo}
+
+        return step
+
     def ultimate_oscillator(self) -> pd.Series:
         """Ultimate Oscillator
 
@@ -252,10 +371,28 @@ class StochasticOscillator(IndicatorMixin):
 
     def _run(self):
         min_periods = 0 if self._fillna else self._window
-        smin = self._low.rolling(self._window, min_periods=min_periods).min()
-        smax = self._high.rolling(self._window, min_periods=min_periods).max()
+        smin = _rolling_min(self._low, self._window, min_periods)
+        smax = _rolling_max(self._high, self._window, min_periods)
         self._stoch_k = 100 * (self._close - smin) / (smax - smin)
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"stoch": 50, "stoch_signal": 50}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        smin = RollingMinMax(self._window, "min", min_periods)
+        smax = RollingMinMax(self._window, "max", min_periods)
+        stoch_d = RollingMean(
+            self._smooth_window, 0 if self._fillna else self._smooth_window
+        )
+
+        def step(bar):
+            low = smin.update(bar["low"])
+            stoch_k = _divide(100 * (bar["close"] - low), smax.update(bar["high"]) - low)
+            return {"stoch": stoch_k, "stoch_signal": stoch_d.update(stoch_k)}
+
+        return step
+
     def stoch(self) -> pd.Series:
         """Stochastic Oscillator
 
@@ -331,20 +468,52 @@ class KAMAIndicator(IndicatorMixin):
             ** 2.0
         ).values
 
-        self._kama = np.zeros(smoothing_constant.size)
-        len_kama = len(self._kama)
-        first_value = True
-
-        for i in range(len_kama):
-            if np.isnan(smoothing_constant[i]):
-                self._kama[i] = np.nan
-            elif first_value:
-                self._kama[i] = close_values[i]
-                first_value = False
+        self._kama = kernels.kama(close_values, smoothing_constant)
+
+    _online_inputs = ("close",)
+
+    def _online_step(self):
+        # np.roll wraps around on the constructor closes, so their differences are taken
+        # from _run and the ones of the later bars from the last closes
+        close_values = np.asarray(self._close, dtype=np.float64)
+        history_vol = np.abs(close_values - np.roll(close_values, 1)).tolist()
+        history_er_num = np.abs(close_values - np.roll(close_values, self._window)).tolist()
+        closes = deque(maxlen=self._window + 1)
+        er_den = RollingSum(self._window, 0 if self._fillna else self._window)
+        fast = 2.0 / (self._pow1 + 1) - 2.0 / (self._pow2 + 1.0)
+        slow = 2 / (self._pow2 + 1.0)
+        state = {"bar": 0, "kama": math.nan, "first_value": True, "filled": None}
+
+        def step(bar):
+            close = bar["close"]
+            closes.append(close)
+            i = state["bar"]
+            state["bar"] += 1
+            if i < len(history_vol):
+                vol, er_num = history_vol[i], history_er_num[i]
             else:
-                self._kama[i] = self._kama[i - 1] + smoothing_constant[i] * (
-                    close_values[i] - self._kama[i - 1]
-                )
+                vol = abs(close - closes[-2])
+                er_num = abs(close - closes[0])
+
+            smoothing_constant = (_divide(er_num, er_den.update(vol)) * fast + slow) ** 2.0
+            if smoothing_constant != smoothing_constant:
+                kama = math.nan
+            elif state["first_value"]:
+                kama = close
+                state["first_value"] = False
+            else:
+                kama = state["kama"] + smoothing_constant * (close - state["kama"])
+            state["kama"] = kama
+
+            # the accessor fills forward, and with the close before the first value
+            if self._fillna:
+                if kama == kama and not math.isinf(kama):
+                    state["filled"] = kama
+                else:
+                    kama = close if state["filled"] is None else state["filled"]
+            return {"kama": kama}
+
+        return step
 
     def kama(self) -> pd.Series:
         """Kaufman's Adaptive Moving Average (KAMA)
@@ -393,6 +562,19 @@ class ROCIndicator(IndicatorMixin):
             / self._close.shift(self._window)
         ) * 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"roc": 0}
+
+    def _online_step(self):
+        closes = deque(maxlen=self._window + 1)
+
+        def step(bar):
+            closes.append(bar["close"])
+            shifted = closes[0] if len(closes) > self._window else math.nan
+            return {"roc": _divide(bar["close"] - shifted, shifted) * 100}
+
+        return step
+
     def roc(self) -> pd.Series:
         """Rate of Change (ROC)
 
@@ -461,6 +643,19 @@ class AwesomeOscillatorIndicator(IndicatorMixin):
             - median_price.rolling(self._window2, min_periods=min_periods_len).mean()
         )
 
+    _online_inputs = ("high", "low")
+    _online_fills = {"awesome_oscillator": 0}
+
+    def _online_step(self):
+        sma_s = RollingMean(self._window1, 0 if self._fillna else self._window1)
+        sma_l = RollingMean(self._window2, 0 if self._fillna else self._window2)
+
+        def step(bar):
+            median_price = 0.5 * (bar["high"] + bar["low"])
+            return {"awesome_oscillator": sma_s.update(median_price) - sma_l.update(median_price)}
+
+        return step
+
     def awesome_oscillator(self) -> pd.Series:
         """Awesome Oscillator
 
@@ -526,14 +721,26 @@ class WilliamsRIndicator(IndicatorMixin):
 
     def _run(self):
         min_periods = 0 if self._fillna else self._lbp
-        highest_high = self._high.rolling(
-            self._lbp, min_periods=min_periods
-        ).max()  # highest high over lookback period lbp
-        lowest_low = self._low.rolling(
-            self._lbp, min_periods=min_periods
-        ).min()  # lowest low over lookback period lbp
+        # highest high and lowest low over lookback period lbp
+        highest_high = _rolling_max(self._high, self._lbp, min_periods)
+        lowest_low = _rolling_min(self._low, self._lbp, min_periods)
         self._wr = -100 * (highest_high - self._close) / (highest_high - lowest_low)
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"williams_r": -50}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._lbp
+        highest_high = RollingMinMax(self._lbp, "max", min_periods)
+        lowest_low = RollingMinMax(self._lbp, "min", min_periods)
+
+        def step(bar):
+            high = highest_high.update(bar["high"])
+            low = lowest_low.update(bar["low"])
+            return {"williams_r": _divide(-100 * (high - bar["close"]), high - low)}
+
+        return step
+
     def williams_r(self) -> pd.Series:
         """Williams %R
 
@@ -588,6 +795,32 @@ class StochRSIIndicator(IndicatorMixin):
         )
         self._stochrsi_k = self._stochrsi.rolling(self._smooth1).mean()
 
+    _online_inputs = ("close",)
+    _online_fills = {"stochrsi": 0, "stochrsi_k": 0, "stochrsi_d": 0}
+
+    def _online_step(self):
+        rsi = _rsi_step(self._window, self._fillna)
+        lowest_low_rsi = RollingMinMax(self._window, "min")
+        highest_high_rsi = RollingMinMax(self._window, "max")
+        stochrsi_k = RollingMean(self._smooth1)
+        stochrsi_d = RollingMean(self._smooth2)
+        # the stochastic is computed on RSIIndicator.rsi(), filled when fillna is set
+        last_rsi = [50.0]
+
+        def step(bar):
+            value = rsi(bar["close"])
+            if self._fillna:
+                if value != value or math.isinf(value):
+                    value = last_rsi[0]
+                else:
+                    last_rsi[0] = value
+            low = lowest_low_rsi.update(value)
+            stochrsi = _divide(value - low, highest_high_rsi.update(value) - low)
+            k = stochrsi_k.update(stochrsi)
+            return {"stochrsi": stochrsi, "stochrsi_k": k, "stochrsi_d": stochrsi_d.update(k)}
+
+        return step
+
     def stochrsi(self):
         """Stochastic RSI
 
@@ -654,6 +887,13 @@ class PercentagePriceOscillator(IndicatorMixin):
         self._ppo_signal = _ema(self._ppo, self._window_sign, self._fillna)
         self._ppo_hist = self._ppo - self._ppo_signal
 
+    _online_inputs = ("close",)
+    _online_fills = {"ppo": 0, "ppo_signal": 0, "ppo_hist": 0}
+
+    def _online_step(self):
+        ppo = _oscillator_step(self._window_slow, self._window_fast, self._window_sign, self._fillna)
+        return lambda bar: dict(zip(("ppo", "ppo_signal", "ppo_hist"), ppo(bar["close"])))
+
     def ppo(self):
         """Percentage Price Oscillator Line
 
@@ -728,6 +968,13 @@ class PercentageVolumeOscillator(IndicatorMixin):
         self._pvo_signal = _ema(self._pvo, self._window_sign, self._fillna)
         self._pvo_hist = self._pvo - self._pvo_signal
 
+    _online_inputs = ("volume",)
+    _online_fills = {"pvo": 0, "pvo_signal": 0, "pvo_hist": 0}
+
+    def _online_step(self):
+        pvo = _oscillator_step(self._window_slow, self._window_fast, self._window_sign, self._fillna)
+        return lambda bar: dict(zip(("pvo", "pvo_signal", "pvo_hist"), pvo(bar["volume"])))
+
     def pvo(self) -> pd.Series:
         """PVO Line
 
@@ -5,10 +5,12 @@
 .. moduleauthor:: Dario Lopez Padial (Bukosabino)
 
 """
+import math
+
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin
+from ta.utils import IndicatorMixin, _divide
 
 
 class DailyReturnIndicator(IndicatorMixin):
@@ -30,6 +32,21 @@ class DailyReturnIndicator(IndicatorMixin):
         ) - 1
         self._dr *= 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"daily_return": 0}
+
+    def _online_step(self):
+        # the first close is divided by the mean of the constructor closes, like the shift of _run
+        state = {"prev_close": self._close.mean()}
+
+        def step(bar):
+            close = bar["close"]
+            daily_return = (_divide(close, state["prev_close"]) - 1) * 100
+            state["prev_close"] = close
+            return {"daily_return": daily_return}
+
+        return step
+
     def daily_return(self) -> pd.Series:
         """Daily Return (DR)
 
@@ -59,6 +76,21 @@ class DailyLogReturnIndicator(IndicatorMixin):
         self._dr = pd.Series(np.log(self._close)).diff()
         self._dr *= 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"daily_log_return": 0}
+
+    def _online_step(self):
+        state = {"prev_log": math.nan}
+
+        def step(bar):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                log = float(np.log(bar["close"]))
+            daily_log_return = (log - state["prev_log"]) * 100
+            state["prev_log"] = log
+            return {"daily_log_return": daily_log_return}
+
+        return step
+
     def daily_log_return(self) -> pd.Series:
         """Daily Log Return (DLR)
 
@@ -86,6 +118,19 @@ class CumulativeReturnIndicator(IndicatorMixin):
         self._cr = (self._close / self._close.iloc[0]) - 1
         self._cr *= 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"cumulative_return": -1}
+
+    def _online_step(self):
+        state = {}
+
+        def step(bar):
+            close = bar["close"]
+            first = state.setdefault("first_close", close)
+            return {"cumulative_return": (_divide(close, first) - 1) * 100}
+
+        return step
+
     def cumulative_return(self) -> pd.Series:
         """Cumulative Return (CR)
 
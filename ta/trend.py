@@ -5,10 +5,36 @@
 .. moduleauthor:: Dario Lopez Padial (Bukosabino)
 
 """
+import math
+from collections import deque
+
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin, _ema, _get_min_max, _sma
+from ta import kernels
+from ta.utils import (
+    IndicatorMixin,
+    RollingApply,
+    RollingMean,
+    RollingMinMax,
+    RollingSum,
+    RunningEWM,
+    _divide,
+    _ema,
+    _get_min_max,
+    _rolling_apply,
+    _rolling_valid,
+    _rolling_values,
+    _nanmax,
+    _observation,
+    _sma,
+    _typical_price,
+)
+
+
+def _mad(windows):
+    """Mean absolute deviation of each window, the rows of a 2d array"""
+    return np.mean(np.abs(windows - np.mean(windows, axis=1, keepdims=True)), axis=1)
 
 
 class AroonIndicator(IndicatorMixin):
@@ -36,14 +62,42 @@ class AroonIndicator(IndicatorMixin):
 
     def _run(self):
         min_periods = 0 if self._fillna else self._window
-        rolling_close = self._close.rolling(self._window, min_periods=min_periods)
-        self._aroon_up = rolling_close.apply(
-            lambda x: float(np.argmax(x) + 1) / self._window * 100, raw=True
+        close = _rolling_values(self._close)
+        valid = _rolling_valid(close, self._window, min_periods)
+        # argmin is the argmax of the opposite values, nan first in both
+        aroon_up = kernels.rolling_argmax(close, self._window) / self._window * 100
+        aroon_down = kernels.rolling_argmax(-close, self._window) / self._window * 100
+        self._aroon_up = pd.Series(
+            np.where(valid, aroon_up, np.nan), index=self._close.index
         )
-        self._aroon_down = rolling_close.apply(
-            lambda x: float(np.argmin(x) + 1) / self._window * 100, raw=True
+        self._aroon_down = pd.Series(
+            np.where(valid, aroon_down, np.nan), index=self._close.index
         )
 
+    _online_inputs = ("close",)
+    _online_fills = {"aroon_up": 0, "aroon_down": 0, "aroon_indicator": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        window = deque(maxlen=self._window)
+
+        def step(bar):
+            window.append(_observation(bar["close"]))
+            close = np.array(window)
+            if np.count_nonzero(close == close) < min_periods:
+                aroon_up = aroon_down = math.nan
+            else:
+                # np.argmax is the first maximum with nan first, like kernels.rolling_argmax
+                aroon_up = (int(np.argmax(close)) + 1) / self._window * 100
+                aroon_down = (int(np.argmax(-close)) + 1) / self._window * 100
+            return {
+                "aroon_up": aroon_up,
+                "aroon_down": aroon_down,
+                "aroon_indicator": aroon_up - aroon_down,
+            }
+
+        return step
+
     def aroon_up(self) -> pd.Series:
         """Aroon Up Channel
 
@@ -111,6 +165,24 @@ class MACD(IndicatorMixin):
         self._macd_signal = _ema(self._macd, self._window_sign, self._fillna)
         self._macd_diff = self._macd - self._macd_signal
 
+    _online_inputs = ("close",)
+    _online_fills = {"macd": 0, "macd_signal": 0, "macd_diff": 0}
+
+    def _online_step(self):
+        def ema(window):
+            return RunningEWM(span=window, min_periods=0 if self._fillna else window)
+
+        emafast = ema(self._window_fast)
+        emaslow = ema(self._window_slow)
+        macd_signal = ema(self._window_sign)
+
+        def step(bar):
+            macd = emafast.update(bar["close"]) - emaslow.update(bar["close"])
+            signal = macd_signal.update(macd)
+            return {"macd": macd, "macd_signal": signal, "macd_diff": macd - signal}
+
+        return step
+
     def macd(self) -> pd.Series:
         """MACD Line
 
@@ -161,6 +233,12 @@ class EMAIndicator(IndicatorMixin):
         self._window = window
         self._fillna = fillna
 
+    _online_inputs = ("close",)
+
+    def _online_step(self):
+        ema = RunningEWM(span=self._window, min_periods=0 if self._fillna else self._window)
+        return lambda bar: {"ema_indicator": ema.update(bar["close"])}
+
     def ema_indicator(self) -> pd.Series:
         """Exponential Moving Average (EMA)
 
@@ -185,6 +263,12 @@ class SMAIndicator(IndicatorMixin):
         self._window = window
         self._fillna = fillna
 
+    _online_inputs = ("close",)
+
+    def _online_step(self):
+        sma = RollingMean(self._window, 0 if self._fillna else self._window)
+        return lambda bar: {"sma_indicator": sma.update(bar["close"])}
+
     def sma_indicator(self) -> pd.Series:
         """Simple Moving Average (SMA)
 
@@ -211,22 +295,23 @@ class WMAIndicator(IndicatorMixin):
         self._run()
 
     def _run(self):
-        _weight = pd.Series(
+        self._weight = np.array(
             [
                 i * 2 / (self._window * (self._window + 1))
                 for i in range(1, self._window + 1)
             ]
         )
+        self._wma = _rolling_apply(self._close, self._window, self._weighted_average)
 
-        def weighted_average(weight):
-            def _weighted_average(x):
-                return (weight * x).sum()
+    def _weighted_average(self, windows):
+        return (self._weight * windows).sum(axis=1)
 
-            return _weighted_average
+    _online_inputs = ("close",)
+    _online_fills = {"wma": 0}
 
-        self._wma = self._close.rolling(self._window).apply(
-            weighted_average(_weight), raw=True
-        )
+    def _online_step(self):
+        wma = RollingApply(self._window, self._weighted_average)
+        return lambda bar: {"wma": wma.update(bar["close"])}
 
     def wma(self) -> pd.Series:
         """Weighted Moving Average (WMA)
@@ -262,11 +347,29 @@ class TRIXIndicator(IndicatorMixin):
         ema1 = _ema(self._close, self._window, self._fillna)
         ema2 = _ema(ema1, self._window, self._fillna)
         ema3 = _ema(ema2, self._window, self._fillna)
-        self._trix = (ema3 - ema3.shift(1, fill_value=ema3.mean())) / ema3.shift(
-            1, fill_value=ema3.mean()
+        self._ema3_mean = ema3.mean()
+        self._trix = (ema3 - ema3.shift(1, fill_value=self._ema3_mean)) / ema3.shift(
+            1, fill_value=self._ema3_mean
         )
         self._trix *= 100
 
+    _online_inputs = ("close",)
+    _online_fills = {"trix": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        emas = [RunningEWM(span=self._window, min_periods=min_periods) for _ in range(3)]
+        # the first bar is compared with the mean of the constructor ema3, like _run
+        prev_ema3 = [self._ema3_mean]
+
+        def step(bar):
+            ema3 = emas[2].update(emas[1].update(emas[0].update(bar["close"])))
+            trix = _divide(ema3 - prev_ema3[0], prev_ema3[0]) * 100
+            prev_ema3[0] = ema3
+            return {"trix": trix}
+
+        return step
+
     def trix(self) -> pd.Series:
         """Trix (TRIX)
 
@@ -317,6 +420,21 @@ class MassIndex(IndicatorMixin):
         mass = ema1 / ema2
         self._mass = mass.rolling(self._window_slow, min_periods=min_periods).sum()
 
+    _online_inputs = ("high", "low")
+    _online_fills = {"mass_index": 0}
+
+    def _online_step(self):
+        min_periods_fast = 0 if self._fillna else self._window_fast
+        ema1 = RunningEWM(span=self._window_fast, min_periods=min_periods_fast)
+        ema2 = RunningEWM(span=self._window_fast, min_periods=min_periods_fast)
+        mass = RollingSum(self._window_slow, 0 if self._fillna else self._window_slow)
+
+        def step(bar):
+            amplitude = ema1.update(bar["high"] - bar["low"])
+            return {"mass_index": mass.update(_divide(amplitude, ema2.update(amplitude)))}
+
+        return step
+
     def mass_index(self) -> pd.Series:
         """Mass Index (MI)
 
@@ -375,6 +493,61 @@ class IchimokuIndicator(IndicatorMixin):
             + self._low.rolling(self._window2, min_periods=min_periods_n2).min()
         )
 
+    _online_inputs = ("high", "low")
+    _online_fills = {
+        "ichimoku_conversion_line": -1,
+        "ichimoku_base_line": -1,
+        "ichimoku_a": -1,
+        "ichimoku_b": -1,
+    }
+
+    def _online_step(self):
+        def middle(window, min_periods):
+            highest = RollingMinMax(window, "max", min_periods)
+            lowest = RollingMinMax(window, "min", min_periods)
+            return lambda high, low: 0.5 * (highest.update(high) + lowest.update(low))
+
+        conv = middle(self._window1, 0 if self._fillna else self._window1)
+        base = middle(self._window2, 0 if self._fillna else self._window2)
+        span_b = middle(self._window3, 0)
+
+        def visual(mean):
+            # the spans are shifted by window2 bars, the first ones are the mean of the
+            # constructor span like in the accessors
+            spans = deque()
+
+            def shift(span):
+                spans.append(span)
+                return spans.popleft() if len(spans) > self._window2 else mean
+
+            return shift
+
+        if self._visual:
+            shift_a = visual((0.5 * (self._conv + self._base)).mean())
+            shift_b = visual(
+                (
+                    0.5
+                    * (
+                        self._high.rolling(self._window3, min_periods=0).max()
+                        + self._low.rolling(self._window3, min_periods=0).min()
+                    )
+                ).mean()
+            )
+        else:
+            shift_a = shift_b = lambda span: span
+
+        def step(bar):
+            high, low = bar["high"], bar["low"]
+            conversion, base_line = conv(high, low), base(high, low)
+            return {
+                "ichimoku_conversion_line": conversion,
+                "ichimoku_base_line": base_line,
+                "ichimoku_a": shift_a(0.5 * (conversion + base_line)),
+                "ichimoku_b": shift_b(span_b(high, low)),
+            }
+
+        return step
+
     def ichimoku_conversion_line(self) -> pd.Series:
         """Tenkan-sen (Conversion Line)
 
@@ -532,6 +705,30 @@ class KSTIndicator(IndicatorMixin):
         self._kst = 100 * (rocma1 + 2 * rocma2 + 3 * rocma3 + 4 * rocma4)
         self._kst_sig = self._kst.rolling(self._nsig, min_periods=0).mean()
 
+    _online_inputs = ("close",)
+    _online_fills = {"kst": 0, "kst_sig": 0, "kst_diff": 0}
+
+    def _online_step(self):
+        rocs = (self._r1, self._r2, self._r3, self._r4)
+        windows = (self._window1, self._window2, self._window3, self._window4)
+        rocmas = [RollingMean(window, 0 if self._fillna else window) for window in windows]
+        kst_sig = RollingMean(self._nsig, 0)
+        closes = deque(maxlen=max(rocs) + 1)
+        # the closes before the first ones are the mean of the constructor closes, like _run
+        close_mean = self._close.mean()
+
+        def step(bar):
+            closes.append(bar["close"])
+            rocma = []
+            for roc, mean in zip(rocs, rocmas):
+                close_shift = closes[-1 - roc] if len(closes) > roc else close_mean
+                rocma.append(mean.update(_divide(bar["close"] - close_shift, close_shift)))
+            kst = 100 * (rocma[0] + 2 * rocma[1] + 3 * rocma[2] + 4 * rocma[3])
+            signal = kst_sig.update(kst)
+            return {"kst": kst, "kst_sig": signal, "kst_diff": kst - signal}
+
+        return step
+
     def kst(self) -> pd.Series:
         """Know Sure Thing (KST)
 
@@ -594,6 +791,22 @@ class DPOIndicator(IndicatorMixin):
             - self._close.rolling(self._window, min_periods=min_periods).mean()
         )
 
+    _online_inputs = ("close",)
+    _online_fills = {"dpo": 0}
+
+    def _online_step(self):
+        shift = int((0.5 * self._window) + 1)
+        sma = RollingMean(self._window, 0 if self._fillna else self._window)
+        closes = deque(maxlen=shift + 1)
+        close_mean = self._close.mean()
+
+        def step(bar):
+            closes.append(bar["close"])
+            close_shift = closes[0] if len(closes) > shift else close_mean
+            return {"dpo": close_shift - sma.update(bar["close"])}
+
+        return step
+
     def dpo(self) -> pd.Series:
         """Detrended Price Oscillator (DPO)
 
@@ -642,21 +855,35 @@ class CCIIndicator(IndicatorMixin):
         self._run()
 
     def _run(self):
-        def _mad(x):
-            return np.mean(np.abs(x - np.mean(x)))
-
         min_periods = 0 if self._fillna else self._window
-        typical_price = (self._high + self._low + self._close) / 3.0
+        typical_price = _typical_price(self._high, self._low, self._close)
         self._cci = (
             typical_price
             - typical_price.rolling(self._window, min_periods=min_periods).mean()
         ) / (
             self._constant
-            * typical_price.rolling(self._window, min_periods=min_periods).apply(
-                _mad, True
-            )
+            * _rolling_apply(typical_price, self._window, _mad, min_periods)
         )
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"cci": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        sma = RollingMean(self._window, min_periods)
+        mad = RollingApply(self._window, _mad, min_periods)
+
+        def step(bar):
+            typical_price = (bar["high"] + bar["low"] + bar["close"]) / 3.0
+            return {
+                "cci": _divide(
+                    typical_price - sma.update(typical_price),
+                    self._constant * mad.update(typical_price),
+                )
+            }
+
+        return step
+
     def cci(self) -> pd.Series:
         """Commodity Channel Index (CCI)
 
@@ -717,45 +944,89 @@ class ADXIndicator(IndicatorMixin):
         diff_directional_movement = pdm - pdn
 
         self._trs_initial = np.zeros(self._window - 1)
-        self._trs = np.zeros(len(self._close) - (self._window - 1))
-        self._trs[0] = diff_directional_movement.dropna()[0 : self._window].sum()
-        diff_directional_movement = diff_directional_movement.reset_index(drop=True)
-
-        for i in range(1, len(self._trs) - 1):
-            self._trs[i] = (
-                self._trs[i - 1]
-                - (self._trs[i - 1] / float(self._window))
-                + diff_directional_movement[self._window + i]
-            )
+        self._trs = kernels.wilder_sum(
+            diff_directional_movement.values,
+            self._window,
+            seed=diff_directional_movement.dropna()[0 : self._window].sum(),
+        )
 
         diff_up = self._high - self._high.shift(1)
         diff_down = self._low.shift(1) - self._low
         pos = abs(((diff_up > diff_down) & (diff_up > 0)) * diff_up)
         neg = abs(((diff_down > diff_up) & (diff_down > 0)) * diff_down)
 
-        self._dip = np.zeros(len(self._close) - (self._window - 1))
-        self._dip[0] = pos.dropna()[0 : self._window].sum()
-
-        pos = pos.reset_index(drop=True)
+        self._dip = kernels.wilder_sum(
+            pos.values, self._window, seed=pos.dropna()[0 : self._window].sum()
+        )
+        self._din = kernels.wilder_sum(
+            neg.values, self._window, seed=neg.dropna()[0 : self._window].sum()
+        )
 
-        for i in range(1, len(self._dip) - 1):
-            self._dip[i] = (
-                self._dip[i - 1]
-                - (self._dip[i - 1] / float(self._window))
-                + pos[self._window + i]
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"adx": 20, "adx_pos": 20, "adx_neg": 20}
+
+    def _online_step(self):
+        window = self._window
+        # the running sums are seeded with the sums of the first window values (of the bars
+        # 1 to window) and smoothed from the next bar on, the adx with the mean of the
+        # first window directional indexes
+        seeds = ([], [], [])
+        directional_indexes = []
+        state = {"bar": 0, "high": math.nan, "low": math.nan, "close": math.nan}
+
+        def step(bar):
+            high, low, close = bar["high"], bar["low"], bar["close"]
+            prev_close = state["close"]
+            if high != high or prev_close != prev_close:
+                pdm = math.nan
+            else:
+                pdm = max(high, prev_close)
+            if low != low or prev_close != prev_close:
+                pdn = math.nan
+            else:
+                pdn = min(low, prev_close)
+            diff_up = high - state["high"]
+            diff_down = state["low"] - low
+            values = (
+                pdm - pdn,
+                abs(float(diff_up > diff_down and diff_up > 0) * diff_up),
+                abs(float(diff_down > diff_up and diff_down > 0) * diff_down),
             )
+            state["high"], state["low"], state["close"] = high, low, close
+            i = state["bar"]
+            state["bar"] += 1
+
+            if i <= window:
+                for seed, value in zip(seeds, values):
+                    if value == value and len(seed) < window:
+                        seed.append(value)
+                if i < window:
+                    return {"adx": 0.0, "adx_pos": 0.0, "adx_neg": 0.0}
+                state["sums"] = [float(np.sum(np.array(seed))) for seed in seeds]
+            else:
+                state["sums"] = [
+                    total - (total / float(window)) + value
+                    for total, value in zip(state["sums"], values)
+                ]
+
+            trs, dip, din = state["sums"]
+            adx_pos = 100 * _divide(dip, trs)
+            adx_neg = 100 * _divide(din, trs)
+            directional_index = 100 * abs(_divide(adx_pos - adx_neg, adx_pos + adx_neg))
+            if i < 2 * window:
+                directional_indexes.append(directional_index)
+                adx = 0.0
+                if i == 2 * window - 1:
+                    adx = state["adx"] = float(np.array(directional_indexes).mean())
+            else:
+                adx = state["adx"] = (
+                    state["adx"] * (window - 1) + directional_index
+                ) / float(window)
+            if i == window:
+                adx_pos = adx_neg = 0.0
+            return {"adx": adx, "adx_pos": adx_pos, "adx_neg": adx_neg}
 
-        self._din = np.zeros(len(self._close) - (self._window - 1))
-        self._din[0] = neg.dropna()[0 : self._window].sum()
-
-        neg = neg.reset_index(drop=True)
-
-        for i in range(1, len(self._din) - 1):
-            self._din[i] = (
-                self._din[i - 1]
-                - (self._din[i - 1] / float(self._window))
-                + neg[self._window + i]
-            )
+        return step
 
     def adx(self) -> pd.Series:
         """Average Directional Index (ADX)
@@ -763,23 +1034,18 @@ class ADXIndicator(IndicatorMixin):
         Returns:
             pandas.Series: New feature generated.tr
         """
-        dip = np.zeros(len(self._trs))
-        for i in range(len(self._trs)):
-            dip[i] = 100 * (self._dip[i] / self._trs[i])
-
-        din = np.zeros(len(self._trs))
-        for i in range(len(self._trs)):
-            din[i] = 100 * (self._din[i] / self._trs[i])
+        dip = 100 * (self._dip / self._trs)
+        din = 100 * (self._din / self._trs)
 
         directional_index = 100 * np.abs((dip - din) / (dip + din))
 
-        adx_series = np.zeros(len(self._trs))
-        adx_series[self._window] = directional_index[0 : self._window].mean()
-
-        for i in range(self._window + 1, len(adx_series)):
-            adx_series[i] = (
-                (adx_series[i - 1] * (self._window - 1)) + directional_index[i - 1]
-            ) / float(self._window)
+        # adx[i] smooths directional_index[i - 1]
+        adx_series = kernels.wilder_average(
+            np.concatenate(([np.nan], directional_index[:-1])),
+            self._window,
+            start=self._window + 1,
+            seed=directional_index[0 : self._window].mean(),
+        )
 
         adx_series = np.concatenate((self._trs_initial, adx_series), axis=0)
         adx_series = pd.Series(data=adx_series, index=self._close.index)
@@ -794,8 +1060,9 @@ class ADXIndicator(IndicatorMixin):
             pandas.Series: New feature generated.
         """
         dip = np.zeros(len(self._close))
-        for i in range(1, len(self._trs) - 1):
-            dip[i + self._window] = 100 * (self._dip[i] / self._trs[i])
+        dip[self._window + 1 : self._window + len(self._trs) - 1] = 100 * (
+            self._dip[1:-1] / self._trs[1:-1]
+        )
 
         adx_pos_series = self._check_fillna(
             pd.Series(dip, index=self._close.index), value=20
@@ -809,8 +1076,9 @@ class ADXIndicator(IndicatorMixin):
             pandas.Series: New feature generated.
         """
         din = np.zeros(len(self._close))
-        for i in range(1, len(self._trs) - 1):
-            din[i + self._window] = 100 * (self._din[i] / self._trs[i])
+        din[self._window + 1 : self._window + len(self._trs) - 1] = 100 * (
+            self._din[1:-1] / self._trs[1:-1]
+        )
 
         adx_neg_series = self._check_fillna(
             pd.Series(din, index=self._close.index), value=20
@@ -860,6 +1128,37 @@ class VortexIndicator(IndicatorMixin):
         self._vip = vmp.rolling(self._window, min_periods=min_periods).sum() / trn
         self._vin = vmm.rolling(self._window, min_periods=min_periods).sum() / trn
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {
+        "vortex_indicator_pos": 1,
+        "vortex_indicator_neg": 1,
+        "vortex_indicator_diff": 0,
+    }
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        trn = RollingSum(self._window, min_periods)
+        vmp = RollingSum(self._window, min_periods)
+        vmm = RollingSum(self._window, min_periods)
+        # the close before the first one is the mean of the constructor closes, like _run
+        state = {"close": self._close.mean(), "high": math.nan, "low": math.nan}
+
+        def step(bar):
+            high, low, close_shift = bar["high"], bar["low"], state["close"]
+            true_range = trn.update(
+                _nanmax(high - low, abs(high - close_shift), abs(low - close_shift))
+            )
+            vip = _divide(vmp.update(abs(high - state["low"])), true_range)
+            vin = _divide(vmm.update(abs(low - state["high"])), true_range)
+            state["close"], state["high"], state["low"] = bar["close"], high, low
+            return {
+                "vortex_indicator_pos": vip,
+                "vortex_indicator_neg": vin,
+                "vortex_indicator_diff": vip - vin,
+            }
+
+        return step
+
     def vortex_indicator_pos(self):
         """+VI
 
@@ -926,75 +1225,99 @@ class PSARIndicator(IndicatorMixin):
         self._fillna = fillna
         self._run()
 
-    def _run(self):  # noqa
-        up_trend = True
-        acceleration_factor = self._step
-        up_trend_high = self._high.iloc[0]
-        down_trend_low = self._low.iloc[0]
-
-        self._psar = self._close.copy()
-        self._psar_up = pd.Series(index=self._psar.index)
-        self._psar_down = pd.Series(index=self._psar.index)
-
-        for i in range(2, len(self._close)):
-            reversal = False
-
-            max_high = self._high.iloc[i]
-            min_low = self._low.iloc[i]
-
-            if up_trend:
-                self._psar.iloc[i] = self._psar.iloc[i - 1] + (
-                    acceleration_factor * (up_trend_high - self._psar.iloc[i - 1])
-                )
-
-                if min_low < self._psar.iloc[i]:
-                    reversal = True
-                    self._psar.iloc[i] = up_trend_high
-                    down_trend_low = min_low
-                    acceleration_factor = self._step
-                else:
-                    if max_high > up_trend_high:
-                        up_trend_high = max_high
-                        acceleration_factor = min(
-                            acceleration_factor + self._step, self._max_step
-                        )
-
-                    low1 = self._low.iloc[i - 1]
-                    low2 = self._low.iloc[i - 2]
-                    if low2 < self._psar.iloc[i]:
-                        self._psar.iloc[i] = low2
-                    elif low1 < self._psar.iloc[i]:
-                        self._psar.iloc[i] = low1
+    def _run(self):
+        psar, psar_up, psar_down = kernels.psar(
+            self._high.values,
+            self._low.values,
+            self._close.values,
+            self._step,
+            self._max_step,
+        )
+        self._psar = pd.Series(psar, index=self._close.index, name=self._close.name)
+        self._psar_up = pd.Series(psar_up, index=self._close.index)
+        self._psar_down = pd.Series(psar_down, index=self._close.index)
+
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"psar": -1, "psar_up": -1, "psar_down": -1}
+
+    def _online_step(self):
+        # kernels._psar_loop one bar at a time
+        step_, max_step = float(self._step), float(self._max_step)
+        highs, lows = deque(maxlen=3), deque(maxlen=3)
+        state = {"bar": 0, "up_trend": True, "acceleration_factor": step_}
+        prev = {"psar_up": math.nan, "psar_down": math.nan}
+
+        def step(bar):
+            high, low = bar["high"], bar["low"]
+            highs.append(high)
+            lows.append(low)
+            i = state["bar"]
+            state["bar"] += 1
+            psar_up = psar_down = math.nan
+            if i == 0:
+                state["up_trend_high"], state["down_trend_low"] = high, low
+            if i < 2:
+                psar = bar["close"]
             else:
-                self._psar.iloc[i] = self._psar.iloc[i - 1] - (
-                    acceleration_factor * (self._psar.iloc[i - 1] - down_trend_low)
-                )
-
-                if max_high > self._psar.iloc[i]:
-                    reversal = True
-                    self._psar.iloc[i] = down_trend_low
-                    up_trend_high = max_high
-                    acceleration_factor = self._step
+                reversal = False
+                acceleration_factor = state["acceleration_factor"]
+                up_trend_high, down_trend_low = state["up_trend_high"], state["down_trend_low"]
+                prev_psar = state["psar"]
+                if state["up_trend"]:
+                    psar = prev_psar + (acceleration_factor * (up_trend_high - prev_psar))
+                    if low < psar:
+                        reversal = True
+                        psar = up_trend_high
+                        down_trend_low = low
+                        acceleration_factor = step_
+                    else:
+                        if high > up_trend_high:
+                            up_trend_high = high
+                            acceleration_factor = min(acceleration_factor + step_, max_step)
+                        if lows[0] < psar:
+                            psar = lows[0]
+                        elif lows[1] < psar:
+                            psar = lows[1]
                 else:
-                    if min_low < down_trend_low:
-                        down_trend_low = min_low
-                        acceleration_factor = min(
-                            acceleration_factor + self._step, self._max_step
-                        )
-
-                    high1 = self._high.iloc[i - 1]
-                    high2 = self._high.iloc[i - 2]
-                    if high2 > self._psar.iloc[i]:
-                        self._psar[i] = high2
-                    elif high1 > self._psar.iloc[i]:
-                        self._psar.iloc[i] = high1
-
-            up_trend = up_trend != reversal  # XOR
-
-            if up_trend:
-                self._psar_up.iloc[i] = self._psar.iloc[i]
-            else:
-                self._psar_down.iloc[i] = self._psar.iloc[i]
+                    psar = prev_psar - (acceleration_factor * (prev_psar - down_trend_low))
+                    if high > psar:
+                        reversal = True
+                        psar = down_trend_low
+                        up_trend_high = high
+                        acceleration_factor = step_
+                    else:
+                        if low < down_trend_low:
+                            down_trend_low = low
+                            acceleration_factor = min(acceleration_factor + step_, max_step)
+                        if highs[0] > psar:
+                            psar = highs[0]
+                        elif highs[1] > psar:
+                            psar = highs[1]
+                state["up_trend"] = state["up_trend"] != reversal
+                state["acceleration_factor"] = acceleration_factor
+                state["up_trend_high"], state["down_trend_low"] = up_trend_high, down_trend_low
+                if state["up_trend"]:
+                    psar_up = psar
+                else:
+                    psar_down = psar
+            state["psar"] = psar
+
+            # the indicators are 1 on the first bar of a trend, psar_down_indicator reads
+            # the psar_up value of the bar like its accessor
+            up_start = psar_up == psar_up and prev["psar_up"] != prev["psar_up"]
+            down_start = psar_down == psar_down and prev["psar_down"] != prev["psar_down"]
+            up_indicator = psar_up if up_start else 0
+            down_indicator = psar_up if down_start else 0
+            prev["psar_up"], prev["psar_down"] = psar_up, psar_down
+            return {
+                "psar": psar,
+                "psar_up": psar_up,
+                "psar_down": psar_down,
+                "psar_up_indicator": 0.0 if up_indicator == 0 else 1.0,
+                "psar_down_indicator": 0.0 if down_indicator == 0 else 1.0,
+            }
+
+        return step
 
     def psar(self) -> pd.Series:
         """PSAR value
@@ -1105,6 +1428,34 @@ class STCIndicator(IndicatorMixin):
         _stoch_kd = 100 * (_stoch_d - _stoch_d_min) / (_stoch_d_max - _stoch_d_min)
         self._stc = _ema(_stoch_kd, self._smooth2, self._fillna)
 
+    _online_inputs = ("close",)
+    _online_fills = {"stc": 0}
+
+    def _online_step(self):
+        def ema(window):
+            return RunningEWM(span=window, min_periods=0 if self._fillna else window)
+
+        def stoch():
+            lowest = RollingMinMax(self._cycle, "min")
+            highest = RollingMinMax(self._cycle, "max")
+
+            def update(value):
+                low = lowest.update(value)
+                return _divide(100 * (value - low), highest.update(value) - low)
+
+            return update
+
+        emafast = ema(self._window_fast)
+        emaslow = ema(self._window_slow)
+        stoch_k, stoch_kd = stoch(), stoch()
+        stoch_d, stc = ema(self._smooth1), ema(self._smooth2)
+
+        def step(bar):
+            macd = emafast.update(bar["close"]) - emaslow.update(bar["close"])
+            return {"stc": stc.update(stoch_kd(stoch_d.update(stoch_k(macd))))}
+
+        return step
+
     def stc(self):
         """Schaff Trend Cycle
 
@@ -6,6 +6,9 @@
 
 """
 import math
+import threading
+from collections import deque
+from contextlib import contextmanager
 
 import numpy as np
 import pandas as pd
@@ -35,6 +38,83 @@ class IndicatorMixin:
                 series = series_output.fillna(method="ffill").fillna(value)
         return series
 
+    # Constructor series read by update/extend, in the order given to the _online_step function
+    _online_inputs = ()
+    # Output -> fill value of its accessor, for the outputs the accessors pass to _check_fillna
+    _online_fills = {}
+    _online = None
+
+    def _online_step(self):
+        """Build the incremental state of the indicator.
+
+        Every indicator of ta defines it, a subclass that does not cannot be updated.
+
+        Returns:
+            callable: takes a dict of the next bar's inputs and returns a dict of the
+            raw (not filled) outputs on that bar, keyed by accessor name.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no incremental update")
+
+    def _online_fill(self, values: dict) -> dict:
+        if self._fillna:
+            for name, fill in self._online_fills.items():
+                value = values[name]
+                if value != value or math.isinf(value):
+                    values[name] = self._online_last.get(name, fill)
+                else:
+                    self._online_last[name] = value
+        return values
+
+    def update(self, bar: dict) -> dict:
+        """Absorb one more bar and return the indicator values on it.
+
+        The state (last EMA values, ring buffers of the windows, monotonic deques for the
+        rolling min/max) is built on the first call by replaying the series given to the
+        constructor. After that each bar costs constant time, or the window length for the
+        outputs computed over a window. The accessors keep describing the constructor series.
+
+        Args:
+            bar(dict): values of the bar keyed like the constructor series ('high', 'low',
+                'close', 'volume'), case insensitive.
+
+        Returns:
+            dict: accessor name -> value on the bar, filled like the accessor when fillna is set.
+        """
+        if self._online is None:
+            step = self._online_step()
+            self._online_last = {}
+            history = [
+                np.asarray(getattr(self, f"_{name}"), dtype=np.float64).tolist()
+                for name in self._online_inputs
+            ]
+            for values in zip(*history):
+                self._online_fill(step(dict(zip(self._online_inputs, values))))
+            self._online = step
+        bar = {str(key).lower(): value for key, value in bar.items()}
+        return self._online_fill(
+            self._online({name: float(bar[name]) for name in self._online_inputs})
+        )
+
+    def extend(self, arrays: dict) -> dict:
+        """Absorb several bars, see update.
+
+        Args:
+            arrays(dict): equal length arrays keyed like the constructor series.
+
+        Returns:
+            dict: accessor name -> numpy array of the values on the new bars.
+        """
+        arrays = {
+            str(key).lower(): np.asarray(values, dtype=np.float64).tolist()
+            for key, values in arrays.items()
+        }
+        columns = [arrays[name] for name in self._online_inputs]
+        outputs = {}
+        for values in zip(*columns):
+            for name, value in self.update(dict(zip(self._online_inputs, values))).items():
+                outputs.setdefault(name, []).append(value)
+        return {name: np.array(values, dtype=np.float64) for name, values in outputs.items()}
+
     @staticmethod
     def _true_range(
         high: pd.Series, low: pd.Series, prev_close: pd.Series
@@ -46,6 +126,81 @@ class IndicatorMixin:
         return true_range
 
 
+# Intermediates of a shared_intermediates block: key -> [lock, value, inputs], None outside
+_shared_values = None
+_shared_depth = 0
+_shared_lock = threading.Lock()
+
+
+@contextmanager
+def shared_intermediates():
+    """Compute the intermediates several indicators are made of once per set of inputs.
+
+    Inside the block (on any thread) the true range, the typical price and the rolling
+    min/max of a series are kept the first time an indicator computes them and given to
+    the next indicators built on the same series objects with the same parameters, e.g.
+    the typical price of CCI, MFI, VWAP and KeltnerChannel. The values are the ones each
+    indicator would compute. They are dropped when the outermost block exits.
+    """
+    global _shared_values, _shared_depth
+    with _shared_lock:
+        if _shared_depth == 0:
+            _shared_values = {}
+        _shared_depth += 1
+    try:
+        yield
+    finally:
+        with _shared_lock:
+            _shared_depth -= 1
+            if _shared_depth == 0:
+                _shared_values = None
+
+
+def _shared(name: str, inputs: tuple, compute):
+    # the inputs are kept with the value, so the ids in the key are not reused meanwhile
+    with _shared_lock:
+        if _shared_values is None:
+            entry = None
+        else:
+            key = (name, *map(id, inputs))
+            entry = _shared_values.setdefault(key, [threading.Lock(), None, inputs])
+    if entry is None:
+        return compute()
+    with entry[0]:
+        if entry[1] is None:
+            entry[1] = compute()
+        return entry[1]
+
+
+def _true_range(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
+    """True range of each bar, from the close of the bar before (NaN on the first)"""
+    return _shared(
+        "true_range",
+        (high, low, close),
+        lambda: IndicatorMixin._true_range(high, low, close.shift(1)),
+    )
+
+
+def _typical_price(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
+    return _shared("typical_price", (high, low, close), lambda: (high + low + close) / 3.0)
+
+
+def _rolling_min(series: pd.Series, window: int, min_periods: int) -> pd.Series:
+    return _shared(
+        f"rolling_min({window}, {min_periods})",
+        (series,),
+        lambda: series.rolling(window, min_periods=min_periods).min(),
+    )
+
+
+def _rolling_max(series: pd.Series, window: int, min_periods: int) -> pd.Series:
+    return _shared(
+        f"rolling_max({window}, {min_periods})",
+        (series,),
+        lambda: series.rolling(window, min_periods=min_periods).max(),
+    )
+
+
 def dropna(df: pd.DataFrame) -> pd.DataFrame:
     """Drop rows with "Nans" values"""
     df = df.copy()
@@ -78,3 +233,375 @@ def _get_min_max(series1: pd.Series, series2: pd.Series, function: str = "min"):
         raise ValueError('"f" variable value should be "min" or "max"')
 
     return pd.Series(output)
+
+
+def _rolling_values(series) -> np.ndarray:
+    """Float64 values as pandas rolling windows see them, inf replaced by nan"""
+    values = np.array(series, dtype=np.float64)
+    values[np.isinf(values)] = np.nan
+    return values
+
+
+def _rolling_valid(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """True where the window ending on each value holds at least min_periods observations"""
+    observations = np.cumsum(values == values)
+    counts = observations.copy()
+    counts[window:] -= observations[:-window]
+    return counts >= min_periods
+
+
+def _rolling_apply(series: pd.Series, window: int, function, min_periods: int = None):
+    """series.rolling(window, min_periods).apply(f, raw=True) without a Python call per window.
+
+    function takes a 2d array holding one window per row and returns f of each row,
+    computed with the same numpy reductions as f so the values are the same.
+    """
+    values = _rolling_values(series)
+    min_periods = window if min_periods is None else min_periods
+    output = np.full(len(values), np.nan)
+
+    # the first windows are shorter, they only count with min_periods < window
+    if min_periods < window:
+        for i in range(min(window - 1, len(values))):
+            output[i] = function(values[np.newaxis, : i + 1])[0]
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        rows = max(1, 2**20 // window)
+        for start in range(0, len(windows), rows):
+            output[window - 1 + start : window - 1 + start + rows] = function(
+                windows[start : start + rows]
+            )
+
+    output[~_rolling_valid(values, window, min_periods)] = np.nan
+    return pd.Series(output, index=series.index, name=series.name)
+
+
+def _observation(value) -> float:
+    """Float of a stream value as pandas windows see it, inf replaced by nan"""
+    value = float(value)
+    return math.nan if math.isinf(value) else value
+
+
+def _nanmax(*values) -> float:
+    """Largest value that is not nan, nan when all are, like DataFrame.max(axis=1)"""
+    values = [value for value in values if value == value]
+    return max(values) if values else math.nan
+
+
+def _divide(numerator: float, denominator: float) -> float:
+    """Divide two floats the way numpy arrays do: x/0 is +-inf and 0/0 is nan"""
+    if denominator == 0:
+        if numerator == 0 or numerator != numerator:
+            return math.nan
+        return math.inf if (numerator > 0) == (math.copysign(1.0, denominator) > 0) else -math.inf
+    return numerator / denominator
+
+
+class RunningEWM:
+    """Exponentially weighted mean of a stream, updated one value at a time.
+
+    Performs the operations of ``Series.ewm(..., adjust=False).mean()`` in the same
+    order, so every value equals the batch one bit for bit.
+
+    Args:
+        com(float): center of mass.
+        span(float): span, com = (span - 1) / 2.
+        alpha(float): smoothing factor, com = 1 / alpha - 1.
+        min_periods(int): observations needed to have a value.
+    """
+
+    def __init__(self, com=None, span=None, alpha=None, min_periods: int = 0):
+        if com is None:
+            com = (span - 1) / 2.0 if span is not None else 1.0 / alpha - 1.0
+        alpha = 1.0 / (1.0 + com)
+        self._old_wt_factor = 1.0 - alpha
+        self._new_wt = alpha
+        self._min_periods = max(int(min_periods), 1)
+        self._weighted = None
+        self._old_wt = 1.0
+        self._nobs = 0
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        value = _observation(value)
+        is_observation = value == value
+        if self._weighted is None:
+            self._weighted = value
+            self._nobs = int(is_observation)
+        else:
+            self._nobs += is_observation
+            if self._weighted == self._weighted:
+                self._old_wt *= self._old_wt_factor
+                if is_observation:
+                    if self._weighted != value:
+                        weighted = self._old_wt * self._weighted + self._new_wt * value
+                        self._weighted = weighted / (self._old_wt + self._new_wt)
+                    self._old_wt = 1.0
+            elif is_observation:
+                self._weighted = value
+        self.value = self._weighted if self._nobs >= self._min_periods else math.nan
+        return self.value
+
+
+class RollingMean:
+    """Rolling mean of a stream with a ring buffer of the window.
+
+    Uses the same Kahan summation as ``Series.rolling(window).mean()``, values are
+    equal to the batch ones bit for bit.
+
+    Args:
+        window(int): n period.
+        min_periods(int): observations needed to have a value, defaults to window.
+    """
+
+    def __init__(self, window: int, min_periods: int = None):
+        self._window = window
+        self._min_periods = window if min_periods is None else min_periods
+        self._values = deque()
+        self._reset()
+        self.value = math.nan
+
+    def _reset(self):
+        self._nobs = self._neg_ct = self._same = 0
+        self._sum = self._compensation_add = self._compensation_remove = 0.0
+        self._prev = math.nan
+
+    def update(self, value: float) -> float:
+        value = _observation(value)
+        if self._window == 1:
+            # a window of one is recomputed from scratch by pandas
+            self._values.clear()
+            self._reset()
+        if len(self._values) == self._window:
+            old = self._values.popleft()
+            if old == old:
+                self._nobs -= 1
+                y = -old - self._compensation_remove
+                t = self._sum + y
+                self._compensation_remove = t - self._sum - y
+                self._sum = t
+                if math.copysign(1.0, old) < 0:
+                    self._neg_ct -= 1
+        self._values.append(value)
+        if value == value:
+            self._nobs += 1
+            y = value - self._compensation_add
+            t = self._sum + y
+            self._compensation_add = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, value) < 0:
+                self._neg_ct += 1
+            self._same = self._same + 1 if value == self._prev else 1
+            self._prev = value
+
+        if self._nobs >= self._min_periods and self._nobs > 0:
+            result = self._sum / self._nobs
+            if self._same >= self._nobs:
+                result = self._prev
+            elif self._neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self._neg_ct == self._nobs and result > 0:
+                result = 0.0
+        else:
+            result = math.nan
+        self.value = result
+        return result
+
+
+class RollingSum:
+    """Rolling sum of a stream with a ring buffer of the window.
+
+    Uses the same Kahan summation as ``Series.rolling(window).sum()``, values are
+    equal to the batch ones bit for bit.
+
+    Args:
+        window(int): n period.
+        min_periods(int): observations needed to have a value, defaults to window.
+    """
+
+    def __init__(self, window: int, min_periods: int = None):
+        self._window = window
+        self._min_periods = window if min_periods is None else min_periods
+        self._values = deque()
+        self._reset()
+        self.value = math.nan
+
+    def _reset(self):
+        self._nobs = self._same = 0
+        self._sum = self._compensation_add = self._compensation_remove = 0.0
+        self._prev = math.nan
+
+    def update(self, value: float) -> float:
+        value = _observation(value)
+        if self._window == 1:
+            self._values.clear()
+            self._reset()
+        if len(self._values) == self._window:
+            old = self._values.popleft()
+            if old == old:
+                self._nobs -= 1
+                y = -old - self._compensation_remove
+                t = self._sum + y
+                self._compensation_remove = t - self._sum - y
+                self._sum = t
+        self._values.append(value)
+        if value == value:
+            self._nobs += 1
+            y = value - self._compensation_add
+            t = self._sum + y
+            self._compensation_add = t - self._sum - y
+            self._sum = t
+            self._same = self._same + 1 if value == self._prev else 1
+            self._prev = value
+
+        if self._nobs == 0 == self._min_periods:
+            result = 0.0
+        elif self._nobs >= self._min_periods:
+            result = self._prev * self._nobs if self._same >= self._nobs else self._sum
+        else:
+            result = math.nan
+        self.value = result
+        return result
+
+
+class RollingVar:
+    """Rolling variance of a stream with a ring buffer of the window.
+
+    Uses the same Welford / Kahan updates as ``Series.rolling(window).var()``, values
+    are equal to the batch ones bit for bit.
+
+    Args:
+        window(int): n period.
+        min_periods(int): observations needed to have a value, defaults to window.
+        ddof(int): delta degrees of freedom.
+    """
+
+    def __init__(self, window: int, min_periods: int = None, ddof: int = 1):
+        self._window = window
+        self._min_periods = max(window if min_periods is None else min_periods, 1)
+        self._ddof = ddof
+        self._values = deque()
+        self._reset()
+        self.value = math.nan
+
+    def _reset(self):
+        self._nobs = self._mean = self._ssqdm = 0.0
+        self._compensation_add = self._compensation_remove = 0.0
+        self._same = 0
+        self._prev = math.nan
+
+    def update(self, value: float) -> float:
+        value = _observation(value)
+        if self._window == 1:
+            self._values.clear()
+            self._reset()
+        if len(self._values) == self._window:
+            old = self._values.popleft()
+            if old == old:
+                self._nobs -= 1
+                if self._nobs:
+                    prev_mean = self._mean - self._compensation_remove
+                    y = old - self._compensation_remove
+                    t = y - self._mean
+                    self._compensation_remove = t + self._mean - y
+                    self._mean = self._mean - t / self._nobs
+                    self._ssqdm = self._ssqdm - (old - prev_mean) * (old - self._mean)
+                else:
+                    self._mean = 0.0
+                    self._ssqdm = 0.0
+        self._values.append(value)
+        if value == value:
+            self._nobs += 1
+            self._same = self._same + 1 if value == self._prev else 1
+            self._prev = value
+            prev_mean = self._mean - self._compensation_add
+            y = value - self._compensation_add
+            t = y - self._mean
+            self._compensation_add = t + self._mean - y
+            self._mean = self._mean + t / self._nobs
+            self._ssqdm = self._ssqdm + (value - prev_mean) * (value - self._mean)
+
+        if self._nobs >= self._min_periods and self._nobs > self._ddof:
+            if self._nobs == 1 or self._same >= self._nobs:
+                result = 0.0
+            else:
+                result = self._ssqdm / (self._nobs - self._ddof)
+        else:
+            result = math.nan
+        self.value = result
+        return result
+
+    @property
+    def std(self) -> float:
+        """Square root of the current variance, 0 when rounding made it negative"""
+        return 0.0 if self.value < 0 else math.sqrt(self.value)
+
+
+class RollingMinMax:
+    """Rolling minimum or maximum of a stream with a monotonic deque.
+
+    Args:
+        window(int): n period.
+        function(str): "min" or "max".
+        min_periods(int): observations needed to have a value, defaults to window.
+    """
+
+    def __init__(self, window: int, function: str = "min", min_periods: int = None):
+        if function not in ("min", "max"):
+            raise ValueError('"function" should be "min" or "max"')
+        self._window = window
+        self._is_max = function == "max"
+        self._min_periods = max(window if min_periods is None else min_periods, 1)
+        self._queue = deque()
+        self._observed = deque()
+        self._nobs = 0
+        self._count = 0
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        value = _observation(value)
+        index = self._count
+        self._count += 1
+
+        if len(self._observed) == self._window:
+            self._nobs -= self._observed.popleft()
+        while self._queue and self._queue[0][0] <= index - self._window:
+            self._queue.popleft()
+
+        is_observation = value == value
+        self._observed.append(is_observation)
+        if is_observation:
+            self._nobs += 1
+            # the newest of equal values is kept, like pandas
+            while self._queue and (self._queue[-1][1] <= value if self._is_max else self._queue[-1][1] >= value):
+                self._queue.pop()
+            self._queue.append((index, value))
+
+        self.value = self._queue[0][1] if self._queue and self._nobs >= self._min_periods else math.nan
+        return self.value
+
+
+class RollingApply:
+    """``_rolling_apply`` of a stream, the function applied to the ring buffer of the window.
+
+    Args:
+        window(int): n period.
+        function(callable): the function given to _rolling_apply, of a 2d array of windows.
+        min_periods(int): observations needed to have a value, defaults to window.
+    """
+
+    def __init__(self, window: int, function, min_periods: int = None):
+        self._window = window
+        self._function = function
+        self._min_periods = window if min_periods is None else min_periods
+        self._values = deque(maxlen=window)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        self._values.append(_observation(value))
+        values = np.array(self._values)
+        if np.count_nonzero(values == values) < self._min_periods:
+            self.value = math.nan
+        else:
+            self.value = float(self._function(values[np.newaxis])[0])
+        return self.value
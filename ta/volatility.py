@@ -8,7 +8,48 @@
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin
+from ta import kernels
+from ta.utils import (
+    IndicatorMixin,
+    RollingApply,
+    RollingMean,
+    RollingMinMax,
+    RollingVar,
+    RunningEWM,
+    _divide,
+    _nanmax,
+    _rolling_apply,
+    _true_range,
+    _typical_price,
+)
+
+
+def _atr_step(window: int):
+    """Incremental AverageTrueRange._run, returns a function of the next high, low and close giving its atr"""
+    state = {"prev_close": None, "true_ranges": [], "atr": 0.0, "count": 0}
+
+    def step(high, low, close):
+        if state["prev_close"] is None:
+            true_range = high - low
+        else:
+            prev_close = state["prev_close"]
+            true_range = _nanmax(high - low, abs(high - prev_close), abs(low - prev_close))
+        state["prev_close"] = close
+
+        i = state["count"]
+        state["count"] += 1
+        if i < window:
+            state["true_ranges"].append(true_range)
+            if i < window - 1:
+                return 0.0
+            # the seed is the pandas mean of the first window, like in _run
+            state["atr"] = pd.Series(state["true_ranges"]).mean()
+            state["true_ranges"] = None
+        else:
+            state["atr"] = (state["atr"] * (window - 1) + true_range) / float(window)
+        return state["atr"]
+
+    return step
 
 
 class AverageTrueRange(IndicatorMixin):
@@ -44,16 +85,22 @@ class AverageTrueRange(IndicatorMixin):
         self._run()
 
     def _run(self):
-        close_shift = self._close.shift(1)
-        true_range = self._true_range(self._high, self._low, close_shift)
-        atr = np.zeros(len(self._close))
-        atr[self._window - 1] = true_range[0 : self._window].mean()
-        for i in range(self._window, len(atr)):
-            atr[i] = (atr[i - 1] * (self._window - 1) + true_range.iloc[i]) / float(
-                self._window
-            )
+        true_range = _true_range(self._high, self._low, self._close)
+        atr = kernels.wilder_average(
+            true_range.values,
+            self._window,
+            start=self._window,
+            seed=true_range[0 : self._window].mean(),
+        )
         self._atr = pd.Series(data=atr, index=true_range.index)
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {"average_true_range": 0}
+
+    def _online_step(self):
+        atr = _atr_step(self._window)
+        return lambda bar: {"average_true_range": atr(bar["high"], bar["low"], bar["close"])}
+
     def average_true_range(self) -> pd.Series:
         """Average True Range (ATR)
 
@@ -98,6 +145,40 @@ class BollingerBands(IndicatorMixin):
         self._hband = self._mavg + self._window_dev * self._mstd
         self._lband = self._mavg - self._window_dev * self._mstd
 
+    _online_inputs = ("close",)
+    _online_fills = {
+        "bollinger_mavg": -1,
+        "bollinger_hband": -1,
+        "bollinger_lband": -1,
+        "bollinger_wband": 0,
+        "bollinger_pband": 0,
+        "bollinger_hband_indicator": 0,
+        "bollinger_lband_indicator": 0,
+    }
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        mavg = RollingMean(self._window, min_periods)
+        mvar = RollingVar(self._window, min_periods, ddof=0)
+
+        def step(bar):
+            close = bar["close"]
+            mean = mavg.update(close)
+            mvar.update(close)
+            hband = mean + self._window_dev * mvar.std
+            lband = mean - self._window_dev * mvar.std
+            return {
+                "bollinger_mavg": mean,
+                "bollinger_hband": hband,
+                "bollinger_lband": lband,
+                "bollinger_wband": _divide(hband - lband, mean) * 100,
+                "bollinger_pband": _divide(close - lband, hband - lband),
+                "bollinger_hband_indicator": 1.0 if close > hband else 0.0,
+                "bollinger_lband_indicator": 1.0 if close < lband else 0.0,
+            }
+
+        return step
+
     def bollinger_mavg(self) -> pd.Series:
         """Bollinger Channel Middle Band
 
@@ -222,7 +303,7 @@ class KeltnerChannel(IndicatorMixin):
         min_periods = 1 if self._fillna else self._window
         if self._original_version:
             self._tp = (
-                ((self._high + self._low + self._close) / 3.0)
+                _typical_price(self._high, self._low, self._close)
                 .rolling(self._window, min_periods=min_periods)
                 .mean()
             )
@@ -250,6 +331,55 @@ class KeltnerChannel(IndicatorMixin):
             self._tp_high = self._tp + (2 * atr)
             self._tp_low = self._tp - (2 * atr)
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {
+        "keltner_channel_mband": -1,
+        "keltner_channel_hband": -1,
+        "keltner_channel_lband": -1,
+        "keltner_channel_wband": 0,
+        "keltner_channel_pband": 0,
+        "keltner_channel_hband_indicator": 0,
+        "keltner_channel_lband_indicator": 0,
+    }
+
+    def _online_step(self):
+        min_periods = 1 if self._fillna else self._window
+        if self._original_version:
+            tp_mean = RollingMean(self._window, min_periods)
+            tp_high_mean = RollingMean(self._window, 0)
+            tp_low_mean = RollingMean(self._window, 0)
+
+            def bands(high, low, close):
+                return (
+                    tp_mean.update((high + low + close) / 3.0),
+                    tp_high_mean.update(((4 * high) - (2 * low) + close) / 3.0),
+                    tp_low_mean.update(((-2 * high) + (4 * low) + close) / 3.0),
+                )
+
+        else:
+            tp_ema = RunningEWM(span=self._window, min_periods=min_periods)
+            atr_step = _atr_step(self._window_atr)
+
+            def bands(high, low, close):
+                tp = tp_ema.update(close)
+                atr = atr_step(high, low, close)
+                return tp, tp + (2 * atr), tp - (2 * atr)
+
+        def step(bar):
+            close = bar["close"]
+            tp, tp_high, tp_low = bands(bar["high"], bar["low"], close)
+            return {
+                "keltner_channel_mband": tp,
+                "keltner_channel_hband": tp_high,
+                "keltner_channel_lband": tp_low,
+                "keltner_channel_wband": _divide(tp_high - tp_low, tp) * 100,
+                "keltner_channel_pband": _divide(close - tp_low, tp_high - tp_low),
+                "keltner_channel_hband_indicator": 1.0 if close > tp_high else 0.0,
+                "keltner_channel_lband_indicator": 1.0 if close < tp_low else 0.0,
+            }
+
+        return step
+
     def keltner_channel_mband(self) -> pd.Series:
         """Keltner Channel Middle Band
 
@@ -365,6 +495,36 @@ class DonchianChannel(IndicatorMixin):
             self._window, min_periods=self._min_periods
         ).min()
 
+    _online_inputs = ("high", "low", "close")
+    _online_fills = {
+        "donchian_channel_hband": -1,
+        "donchian_channel_lband": -1,
+        "donchian_channel_mband": -1,
+        "donchian_channel_wband": 0,
+        "donchian_channel_pband": 0,
+    }
+
+    def _online_step(self):
+        if self._offset != 0:
+            raise ValueError("update/extend need offset=0, shift the values instead")
+        hband_max = RollingMinMax(self._window, "max", self._min_periods)
+        lband_min = RollingMinMax(self._window, "min", self._min_periods)
+        mavg = RollingMean(self._window, self._min_periods)
+
+        def step(bar):
+            close = bar["close"]
+            hband = hband_max.update(bar["high"])
+            lband = lband_min.update(bar["low"])
+            return {
+                "donchian_channel_hband": hband,
+                "donchian_channel_lband": lband,
+                "donchian_channel_mband": ((hband - lband) / 2.0) + lband,
+                "donchian_channel_wband": _divide(hband - lband, mavg.update(close)) * 100,
+                "donchian_channel_pband": _divide(close - lband, hband - lband),
+            }
+
+        return step
+
     def donchian_channel_hband(self) -> pd.Series:
         """Donchian Channel High Band
 
@@ -445,14 +605,24 @@ class UlcerIndex(IndicatorMixin):
     def _run(self):
         _ui_max = self._close.rolling(self._window, min_periods=1).max()
         _r_i = 100 * (self._close - _ui_max) / _ui_max
+        self._ulcer_idx = _rolling_apply(_r_i, self._window, self._ui_function)
+
+    def _ui_function(self, x):
+        return np.sqrt((x ** 2 / self._window).sum(axis=1))
+
+    _online_inputs = ("close",)
+    _online_fills = {"ulcer_index": 0}
 
-        def ui_function():
-            def _ui_function(x):
-                return np.sqrt((x ** 2 / self._window).sum())
+    def _online_step(self):
+        ui_max = RollingMinMax(self._window, "max", 1)
+        ulcer_idx = RollingApply(self._window, self._ui_function)
 
-            return _ui_function
+        def step(bar):
+            close = bar["close"]
+            highest = ui_max.update(close)
+            return {"ulcer_index": ulcer_idx.update(_divide(100 * (close - highest), highest))}
 
-        self._ulcer_idx = _r_i.rolling(self._window).apply(ui_function(), raw=True)
+        return step
 
     def ulcer_index(self) -> pd.Series:
         """Ulcer Index (UI)
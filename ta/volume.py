@@ -5,11 +5,24 @@
 .. moduleauthor:: Dario Lopez Padial (Bukosabino)
 
 """
+import math
+from collections import deque
 
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin, _ema
+from ta import kernels
+from ta.utils import (
+    IndicatorMixin,
+    RollingMean,
+    RollingSum,
+    RunningEWM,
+    _divide,
+    _ema,
+    _observation,
+    _rolling_apply,
+    _typical_price,
+)
 
 
 class AccDistIndexIndicator(IndicatorMixin):
@@ -50,6 +63,24 @@ class AccDistIndexIndicator(IndicatorMixin):
         adi = clv * self._volume
         self._adi = adi.cumsum()
 
+    _online_inputs = ("high", "low", "close", "volume")
+    _online_fills = {"acc_dist_index": 0}
+
+    def _online_step(self):
+        state = {"adi": 0.0}
+
+        def step(bar):
+            high, low, close = bar["high"], bar["low"], bar["close"]
+            clv = _divide((close - low) - (high - close), high - low)
+            adi = (0.0 if clv != clv else clv) * bar["volume"]
+            # cumsum skips the missing values and leaves them missing
+            if adi != adi:
+                return {"acc_dist_index": math.nan}
+            state["adi"] += adi
+            return {"acc_dist_index": state["adi"]}
+
+        return step
+
     def acc_dist_index(self) -> pd.Series:
         """Accumulation/Distribution Index (ADI)
 
@@ -84,6 +115,24 @@ class OnBalanceVolumeIndicator(IndicatorMixin):
         obv = np.where(self._close < self._close.shift(1), -self._volume, self._volume)
         self._obv = pd.Series(obv, index=self._close.index).cumsum()
 
+    _online_inputs = ("close", "volume")
+    _online_fills = {"on_balance_volume": 0}
+
+    def _online_step(self):
+        state = {"prev_close": math.nan, "obv": 0.0}
+
+        def step(bar):
+            close, volume = bar["close"], bar["volume"]
+            signed = -volume if close < state["prev_close"] else volume
+            state["prev_close"] = close
+            # cumsum skips the missing values and leaves them missing
+            if signed != signed:
+                return {"on_balance_volume": math.nan}
+            state["obv"] += signed
+            return {"on_balance_volume": state["obv"]}
+
+        return step
+
     def on_balance_volume(self) -> pd.Series:
         """On-balance volume (OBV)
 
@@ -139,6 +188,26 @@ class ChaikinMoneyFlowIndicator(IndicatorMixin):
             / self._volume.rolling(self._window, min_periods=min_periods).sum()
         )
 
+    _online_inputs = ("high", "low", "close", "volume")
+    _online_fills = {"chaikin_money_flow": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        mfv_sum = RollingSum(self._window, min_periods)
+        volume_sum = RollingSum(self._window, min_periods)
+
+        def step(bar):
+            high, low, close = bar["high"], bar["low"], bar["close"]
+            mfv = _divide((close - low) - (high - close), high - low)
+            mfv = (0.0 if mfv != mfv else mfv) * bar["volume"]
+            return {
+                "chaikin_money_flow": _divide(
+                    mfv_sum.update(mfv), volume_sum.update(bar["volume"])
+                )
+            }
+
+        return step
+
     def chaikin_money_flow(self) -> pd.Series:
         """Chaikin Money Flow (CMF)
 
@@ -182,6 +251,22 @@ class ForceIndexIndicator(IndicatorMixin):
         fi_series = (self._close - self._close.shift(1)) * self._volume
         self._fi = _ema(fi_series, self._window, fillna=self._fillna)
 
+    _online_inputs = ("close", "volume")
+    _online_fills = {"force_index": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        ema = RunningEWM(span=self._window, min_periods=min_periods)
+        state = {"prev_close": math.nan}
+
+        def step(bar):
+            close = bar["close"]
+            force_index = (close - state["prev_close"]) * bar["volume"]
+            state["prev_close"] = close
+            return {"force_index": ema.update(force_index)}
+
+        return step
+
     def force_index(self) -> pd.Series:
         """Force Index (FI)
 
@@ -231,6 +316,26 @@ class EaseOfMovementIndicator(IndicatorMixin):
         )
         self._emv *= 100000000
 
+    _online_inputs = ("high", "low", "volume")
+    _online_fills = {"ease_of_movement": 0, "sma_ease_of_movement": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        sma = RollingMean(self._window, min_periods)
+        state = {"prev_high": math.nan, "prev_low": math.nan}
+
+        def step(bar):
+            high, low = bar["high"], bar["low"]
+            emv = _divide(
+                ((high - state["prev_high"]) + (low - state["prev_low"])) * (high - low),
+                2 * bar["volume"],
+            )
+            emv *= 100000000
+            state["prev_high"], state["prev_low"] = high, low
+            return {"ease_of_movement": emv, "sma_ease_of_movement": sma.update(emv)}
+
+        return step
+
     def ease_of_movement(self) -> pd.Series:
         """Ease of movement (EoM, EMV)
 
@@ -278,7 +383,24 @@ class VolumePriceTrendIndicator(IndicatorMixin):
             (self._close - self._close.shift(1, fill_value=self._close.mean()))
             / self._close.shift(1, fill_value=self._close.mean())
         )
-        self._vpt = vpt.shift(1, fill_value=vpt.mean()) + vpt
+        self._vpt_mean = vpt.mean()
+        self._vpt = vpt.shift(1, fill_value=self._vpt_mean) + vpt
+
+    _online_inputs = ("close", "volume")
+    _online_fills = {"volume_price_trend": 0}
+
+    def _online_step(self):
+        # the first bar is shifted against the means of the constructor series, like _run
+        state = {"prev_close": self._close.mean(), "prev_vpt": self._vpt_mean}
+
+        def step(bar):
+            close = bar["close"]
+            vpt = bar["volume"] * _divide(close - state["prev_close"], state["prev_close"])
+            volume_price_trend = state["prev_vpt"] + vpt
+            state["prev_close"], state["prev_vpt"] = close, vpt
+            return {"volume_price_trend": volume_price_trend}
+
+        return step
 
     def volume_price_trend(self) -> pd.Series:
         """Volume-price trend (VPT)
@@ -311,14 +433,30 @@ class NegativeVolumeIndexIndicator(IndicatorMixin):
         price_change = self._close.pct_change()
         vol_decrease = self._volume.shift(1) > self._volume
         self._nvi = pd.Series(
-            data=np.nan, index=self._close.index, dtype="float64", name="nvi"
+            data=kernels.negative_volume_index(price_change.values, vol_decrease.values),
+            index=self._close.index,
+            name="nvi",
         )
-        self._nvi.iloc[0] = 1000
-        for i in range(1, len(self._nvi)):
-            if vol_decrease.iloc[i]:
-                self._nvi.iloc[i] = self._nvi.iloc[i - 1] * (1.0 + price_change.iloc[i])
-            else:
-                self._nvi.iloc[i] = self._nvi.iloc[i - 1]
+
+    _online_inputs = ("close", "volume")
+    _online_fills = {"negative_volume_index": 1000}
+
+    def _online_step(self):
+        state = {"close": math.nan, "volume": math.nan, "nvi": None}
+
+        def step(bar):
+            # pct_change pads the missing closes before dividing
+            prev_close = state["close"]
+            close = prev_close if bar["close"] != bar["close"] else bar["close"]
+            volume = bar["volume"]
+            if state["nvi"] is None:
+                state["nvi"] = 1000.0
+            elif state["volume"] > volume:
+                state["nvi"] = state["nvi"] * (1.0 + (_divide(close, prev_close) - 1))
+            state["close"], state["volume"] = close, volume
+            return {"negative_volume_index": state["nvi"]}
+
+        return step
 
     def negative_volume_index(self) -> pd.Series:
         """Negative Volume Index (NVI)
@@ -369,7 +507,7 @@ class MFIIndicator(IndicatorMixin):
         self._run()
 
     def _run(self):
-        typical_price = (self._high + self._low + self._close) / 3.0
+        typical_price = _typical_price(self._high, self._low, self._close)
         up_down = np.where(
             typical_price > typical_price.shift(1),
             1,
@@ -379,12 +517,18 @@ class MFIIndicator(IndicatorMixin):
 
         # Positive and negative money flow with n periods
         min_periods = 0 if self._fillna else self._window
-        n_positive_mf = mfr.rolling(self._window, min_periods=min_periods).apply(
-            lambda x: np.sum(np.where(x >= 0.0, x, 0.0)), raw=True
+        n_positive_mf = _rolling_apply(
+            mfr,
+            self._window,
+            lambda x: np.sum(np.where(x >= 0.0, x, 0.0), axis=1),
+            min_periods,
         )
         n_negative_mf = abs(
-            mfr.rolling(self._window, min_periods=min_periods).apply(
-                lambda x: np.sum(np.where(x < 0.0, x, 0.0)), raw=True
+            _rolling_apply(
+                mfr,
+                self._window,
+                lambda x: np.sum(np.where(x < 0.0, x, 0.0), axis=1),
+                min_periods,
             )
         )
 
@@ -395,6 +539,31 @@ class MFIIndicator(IndicatorMixin):
         mfi = n_positive_mf / n_negative_mf
         self._mfi = 100 - (100 / (1 + mfi))
 
+    _online_inputs = ("high", "low", "close", "volume")
+    _online_fills = {"money_flow_index": 50}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        window = deque(maxlen=self._window)
+        state = {"prev_typical_price": math.nan}
+
+        def step(bar):
+            typical_price = (bar["high"] + bar["low"] + bar["close"]) / 3.0
+            prev = state["prev_typical_price"]
+            up_down = 1 if typical_price > prev else (-1 if typical_price < prev else 0)
+            state["prev_typical_price"] = typical_price
+            window.append(_observation(typical_price * bar["volume"] * up_down))
+
+            # same sums as the rolling apply of _run, over the window ring buffer
+            values = np.array(window)
+            if np.count_nonzero(values == values) < min_periods:
+                return {"money_flow_index": math.nan}
+            n_positive_mf = float(np.sum(np.where(values >= 0.0, values, 0.0)))
+            n_negative_mf = abs(float(np.sum(np.where(values < 0.0, values, 0.0))))
+            return {"money_flow_index": 100 - (100 / (1 + _divide(n_positive_mf, n_negative_mf)))}
+
+        return step
+
     def money_flow_index(self) -> pd.Series:
         """Money Flow Index (MFI)
 
@@ -447,7 +616,7 @@ class VolumeWeightedAveragePrice(IndicatorMixin):
 
     def _run(self):
         # 1 typical price
-        typical_price = (self._high + self._low + self._close) / 3.0
+        typical_price = _typical_price(self._high, self._low, self._close)
 
         # 2 typical price * volume
         typical_price_volume = typical_price * self._volume
@@ -463,6 +632,25 @@ class VolumeWeightedAveragePrice(IndicatorMixin):
 
         self.vwap = total_pv / total_volume
 
+    _online_inputs = ("high", "low", "close", "volume")
+    _online_fills = {"volume_weighted_average_price": 0}
+
+    def _online_step(self):
+        min_periods = 0 if self._fillna else self._window
+        total_pv = RollingSum(self._window, min_periods)
+        total_volume = RollingSum(self._window, min_periods)
+
+        def step(bar):
+            typical_price = (bar["high"] + bar["low"] + bar["close"]) / 3.0
+            return {
+                "volume_weighted_average_price": _divide(
+                    total_pv.update(typical_price * bar["volume"]),
+                    total_volume.update(bar["volume"]),
+                )
+            }
+
+        return step
+
     def volume_weighted_average_price(self) -> pd.Series:
         """Volume Weighted Average Price (VWAP)
 
@@ -5,15 +5,17 @@
 .. moduleauthor:: Dario Lopez Padial (Bukosabino)
 """
 
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
 import pandas as pd
 
 from ta.momentum import (
     AwesomeOscillatorIndicator,
     KAMAIndicator,
-    PercentagePriceOscillator,
     PercentageVolumeOscillator,
     ROCIndicator,
-    RSIIndicator,
     StochasticOscillator,
     StochRSIIndicator,
     TSIIndicator,
@@ -31,7 +33,6 @@ from ta.trend import (
     AroonIndicator,
     CCIIndicator,
     DPOIndicator,
-    EMAIndicator,
     IchimokuIndicator,
     KSTIndicator,
     MassIndex,
@@ -48,6 +49,7 @@ from ta.volatility import (
     KeltnerChannel,
     UlcerIndex,
 )
+from ta.utils import shared_intermediates
 from ta.volume import (
     AccDistIndexIndicator,
     ChaikinMoneyFlowIndicator,
@@ -61,6 +63,663 @@ from ta.volume import (
 )
 
 
+VOLUME_FEATURES = [
+    "volume_adi",
+    "volume_obv",
+    "volume_cmf",
+    "volume_fi",
+    "volume_mfi",
+    "volume_em",
+    "volume_sma_em",
+    "volume_vpt",
+    "volume_nvi",
+    "volume_vwap",
+]
+VOLATILITY_FEATURES = [
+    "volatility_atr",
+    "volatility_bbm",
+    "volatility_bbh",
+    "volatility_bbl",
+    "volatility_bbw",
+    "volatility_bbp",
+    "volatility_bbhi",
+    "volatility_bbli",
+    "volatility_kcc",
+    "volatility_kch",
+    "volatility_kcl",
+    "volatility_kcw",
+    "volatility_kcp",
+    "volatility_kchi",
+    "volatility_kcli",
+    "volatility_dcl",
+    "volatility_dch",
+    "volatility_dcm",
+    "volatility_dcw",
+    "volatility_dcp",
+    "volatility_ui",
+]
+TREND_FEATURES = [
+    "trend_macd",
+    "trend_macd_signal",
+    "trend_macd_diff",
+    "trend_sma_fast",
+    "trend_sma_slow",
+    "trend_ema_fast",
+    "trend_ema_slow",
+    "trend_adx",
+    "trend_adx_pos",
+    "trend_adx_neg",
+    "trend_vortex_ind_pos",
+    "trend_vortex_ind_neg",
+    "trend_vortex_ind_diff",
+    "trend_trix",
+    "trend_mass_index",
+    "trend_cci",
+    "trend_dpo",
+    "trend_kst",
+    "trend_kst_sig",
+    "trend_kst_diff",
+    "trend_ichimoku_conv",
+    "trend_ichimoku_base",
+    "trend_ichimoku_a",
+    "trend_ichimoku_b",
+    "trend_visual_ichimoku_a",
+    "trend_visual_ichimoku_b",
+    "trend_aroon_up",
+    "trend_aroon_down",
+    "trend_aroon_ind",
+    "trend_psar_up",
+    "trend_psar_down",
+    "trend_psar_up_indicator",
+    "trend_psar_down_indicator",
+    "trend_stc",
+]
+MOMENTUM_FEATURES = [
+    "momentum_rsi",
+    "momentum_stoch_rsi",
+    "momentum_stoch_rsi_k",
+    "momentum_stoch_rsi_d",
+    "momentum_tsi",
+    "momentum_uo",
+    "momentum_stoch",
+    "momentum_stoch_signal",
+    "momentum_wr",
+    "momentum_ao",
+    "momentum_kama",
+    "momentum_roc",
+    "momentum_ppo",
+    "momentum_ppo_signal",
+    "momentum_ppo_hist",
+]
+OTHERS_FEATURES = ["others_dr", "others_dlr", "others_cr"]
+FEATURES = (
+    VOLUME_FEATURES
+    + VOLATILITY_FEATURES
+    + TREND_FEATURES
+    + MOMENTUM_FEATURES
+    + OTHERS_FEATURES
+)
+
+# Feature groups, each builds its indicator objects once and returns the accessors of
+# its columns. Indicators made of another one's outputs (the EMAs of MACD, the RSI of
+# StochRSI, the bands of Ichimoku) are in the same group so they are computed once. The
+# intermediates of indicators in different groups (the true range of ATR and UO, the
+# typical price of CCI, MFI, VWAP and KC, the rolling low and high of Stoch and WR) are
+# computed once through ta.utils.shared_intermediates.
+_GROUPS = []
+
+
+def _group(*columns):
+    def register(function):
+        _GROUPS.append((columns, function))
+        return function
+
+    return register
+
+
+@_group("volume_adi")
+def _adi(src, fillna):
+    indicator = AccDistIndexIndicator(
+        high=src.high, low=src.low, close=src.close, volume=src.volume, fillna=fillna
+    )
+    return {"volume_adi": indicator.acc_dist_index}
+
+
+@_group("volume_obv")
+def _obv(src, fillna):
+    indicator = OnBalanceVolumeIndicator(
+        close=src.close, volume=src.volume, fillna=fillna
+    )
+    return {"volume_obv": indicator.on_balance_volume}
+
+
+@_group("volume_cmf")
+def _cmf(src, fillna):
+    indicator = ChaikinMoneyFlowIndicator(
+        high=src.high, low=src.low, close=src.close, volume=src.volume, fillna=fillna
+    )
+    return {"volume_cmf": indicator.chaikin_money_flow}
+
+
+@_group("volume_fi")
+def _fi(src, fillna):
+    indicator = ForceIndexIndicator(
+        close=src.close, volume=src.volume, window=13, fillna=fillna
+    )
+    return {"volume_fi": indicator.force_index}
+
+
+@_group("volume_mfi")
+def _mfi(src, fillna):
+    indicator = MFIIndicator(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        volume=src.volume,
+        window=14,
+        fillna=fillna,
+    )
+    return {"volume_mfi": indicator.money_flow_index}
+
+
+@_group("volume_em", "volume_sma_em")
+def _eom(src, fillna):
+    indicator = EaseOfMovementIndicator(
+        high=src.high, low=src.low, volume=src.volume, window=14, fillna=fillna
+    )
+    return {
+        "volume_em": indicator.ease_of_movement,
+        "volume_sma_em": indicator.sma_ease_of_movement,
+    }
+
+
+@_group("volume_vpt")
+def _vpt(src, fillna):
+    indicator = VolumePriceTrendIndicator(
+        close=src.close, volume=src.volume, fillna=fillna
+    )
+    return {"volume_vpt": indicator.volume_price_trend}
+
+
+@_group("volume_nvi")
+def _nvi(src, fillna):
+    indicator = NegativeVolumeIndexIndicator(
+        close=src.close, volume=src.volume, fillna=fillna
+    )
+    return {"volume_nvi": indicator.negative_volume_index}
+
+
+@_group("volume_vwap")
+def _vwap(src, fillna):
+    indicator = VolumeWeightedAveragePrice(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        volume=src.volume,
+        window=14,
+        fillna=fillna,
+    )
+    return {"volume_vwap": indicator.volume_weighted_average_price}
+
+
+@_group("volatility_atr")
+def _atr(src, fillna):
+    indicator = AverageTrueRange(
+        close=src.close, high=src.high, low=src.low, window=10, fillna=fillna
+    )
+    return {"volatility_atr": indicator.average_true_range}
+
+
+@_group(*VOLATILITY_FEATURES[1:8])
+def _bb(src, fillna):
+    indicator = BollingerBands(close=src.close, window=20, window_dev=2, fillna=fillna)
+    return {
+        "volatility_bbm": indicator.bollinger_mavg,
+        "volatility_bbh": indicator.bollinger_hband,
+        "volatility_bbl": indicator.bollinger_lband,
+        "volatility_bbw": indicator.bollinger_wband,
+        "volatility_bbp": indicator.bollinger_pband,
+        "volatility_bbhi": indicator.bollinger_hband_indicator,
+        "volatility_bbli": indicator.bollinger_lband_indicator,
+    }
+
+
+@_group(*VOLATILITY_FEATURES[8:15])
+def _kc(src, fillna):
+    indicator = KeltnerChannel(
+        close=src.close, high=src.high, low=src.low, window=10, fillna=fillna
+    )
+    return {
+        "volatility_kcc": indicator.keltner_channel_mband,
+        "volatility_kch": indicator.keltner_channel_hband,
+        "volatility_kcl": indicator.keltner_channel_lband,
+        "volatility_kcw": indicator.keltner_channel_wband,
+        "volatility_kcp": indicator.keltner_channel_pband,
+        "volatility_kchi": indicator.keltner_channel_hband_indicator,
+        "volatility_kcli": indicator.keltner_channel_lband_indicator,
+    }
+
+
+@_group(*VOLATILITY_FEATURES[15:20])
+def _dc(src, fillna):
+    indicator = DonchianChannel(
+        high=src.high, low=src.low, close=src.close, window=20, offset=0, fillna=fillna
+    )
+    return {
+        "volatility_dcl": indicator.donchian_channel_lband,
+        "volatility_dch": indicator.donchian_channel_hband,
+        "volatility_dcm": indicator.donchian_channel_mband,
+        "volatility_dcw": indicator.donchian_channel_wband,
+        "volatility_dcp": indicator.donchian_channel_pband,
+    }
+
+
+@_group("volatility_ui")
+def _ui(src, fillna):
+    indicator = UlcerIndex(close=src.close, window=14, fillna=fillna)
+    return {"volatility_ui": indicator.ulcer_index}
+
+
+@_group(*TREND_FEATURES[0:3], "trend_ema_fast", "trend_ema_slow")
+def _macd(src, fillna):
+    indicator = MACD(
+        close=src.close, window_slow=26, window_fast=12, window_sign=9, fillna=fillna
+    )
+    # EMAIndicator(close, 12) and (close, 26) are the EMAs MACD is made of
+    return {
+        "trend_macd": indicator.macd,
+        "trend_macd_signal": indicator.macd_signal,
+        "trend_macd_diff": indicator.macd_diff,
+        "trend_ema_fast": lambda: pd.Series(indicator._emafast, name="ema_12"),
+        "trend_ema_slow": lambda: pd.Series(indicator._emaslow, name="ema_26"),
+    }
+
+
+@_group("trend_sma_fast")
+def _sma_fast(src, fillna):
+    indicator = SMAIndicator(close=src.close, window=12, fillna=fillna)
+    return {"trend_sma_fast": indicator.sma_indicator}
+
+
+@_group("trend_sma_slow")
+def _sma_slow(src, fillna):
+    indicator = SMAIndicator(close=src.close, window=26, fillna=fillna)
+    return {"trend_sma_slow": indicator.sma_indicator}
+
+
+@_group("trend_adx", "trend_adx_pos", "trend_adx_neg")
+def _adx(src, fillna):
+    indicator = ADXIndicator(
+        high=src.high, low=src.low, close=src.close, window=14, fillna=fillna
+    )
+    return {
+        "trend_adx": indicator.adx,
+        "trend_adx_pos": indicator.adx_pos,
+        "trend_adx_neg": indicator.adx_neg,
+    }
+
+
+@_group("trend_vortex_ind_pos", "trend_vortex_ind_neg", "trend_vortex_ind_diff")
+def _vortex(src, fillna):
+    indicator = VortexIndicator(
+        high=src.high, low=src.low, close=src.close, window=14, fillna=fillna
+    )
+    return {
+        "trend_vortex_ind_pos": indicator.vortex_indicator_pos,
+        "trend_vortex_ind_neg": indicator.vortex_indicator_neg,
+        "trend_vortex_ind_diff": indicator.vortex_indicator_diff,
+    }
+
+
+@_group("trend_trix")
+def _trix(src, fillna):
+    indicator = TRIXIndicator(close=src.close, window=15, fillna=fillna)
+    return {"trend_trix": indicator.trix}
+
+
+@_group("trend_mass_index")
+def _mass_index(src, fillna):
+    indicator = MassIndex(
+        high=src.high, low=src.low, window_fast=9, window_slow=25, fillna=fillna
+    )
+    return {"trend_mass_index": indicator.mass_index}
+
+
+@_group("trend_cci")
+def _cci(src, fillna):
+    indicator = CCIIndicator(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        window=20,
+        constant=0.015,
+        fillna=fillna,
+    )
+    return {"trend_cci": indicator.cci}
+
+
+@_group("trend_dpo")
+def _dpo(src, fillna):
+    indicator = DPOIndicator(close=src.close, window=20, fillna=fillna)
+    return {"trend_dpo": indicator.dpo}
+
+
+@_group("trend_kst", "trend_kst_sig", "trend_kst_diff")
+def _kst(src, fillna):
+    indicator = KSTIndicator(
+        close=src.close,
+        roc1=10,
+        roc2=15,
+        roc3=20,
+        roc4=30,
+        window1=10,
+        window2=10,
+        window3=10,
+        window4=15,
+        nsig=9,
+        fillna=fillna,
+    )
+    return {
+        "trend_kst": indicator.kst,
+        "trend_kst_sig": indicator.kst_sig,
+        "trend_kst_diff": indicator.kst_diff,
+    }
+
+
+@_group(*TREND_FEATURES[20:26])
+def _ichimoku(src, fillna):
+    indicator = IchimokuIndicator(
+        high=src.high,
+        low=src.low,
+        window1=9,
+        window2=26,
+        window3=52,
+        visual=False,
+        fillna=fillna,
+    )
+    # the visual lines are shifted copies of the same conversion and base lines
+    indicator_visual = copy.copy(indicator)
+    indicator_visual._visual = True
+    return {
+        "trend_ichimoku_conv": indicator.ichimoku_conversion_line,
+        "trend_ichimoku_base": indicator.ichimoku_base_line,
+        "trend_ichimoku_a": indicator.ichimoku_a,
+        "trend_ichimoku_b": indicator.ichimoku_b,
+        "trend_visual_ichimoku_a": indicator_visual.ichimoku_a,
+        "trend_visual_ichimoku_b": indicator_visual.ichimoku_b,
+    }
+
+
+@_group("trend_aroon_up", "trend_aroon_down", "trend_aroon_ind")
+def _aroon(src, fillna):
+    indicator = AroonIndicator(close=src.close, window=25, fillna=fillna)
+    return {
+        "trend_aroon_up": indicator.aroon_up,
+        "trend_aroon_down": indicator.aroon_down,
+        "trend_aroon_ind": indicator.aroon_indicator,
+    }
+
+
+@_group(*TREND_FEATURES[29:33])
+def _psar(src, fillna):
+    indicator = PSARIndicator(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        step=0.02,
+        max_step=0.20,
+        fillna=fillna,
+    )
+    return {
+        "trend_psar_up": indicator.psar_up,
+        "trend_psar_down": indicator.psar_down,
+        "trend_psar_up_indicator": indicator.psar_up_indicator,
+        "trend_psar_down_indicator": indicator.psar_down_indicator,
+    }
+
+
+@_group("trend_stc")
+def _stc(src, fillna):
+    indicator = STCIndicator(
+        close=src.close,
+        window_slow=50,
+        window_fast=23,
+        cycle=10,
+        smooth1=3,
+        smooth2=3,
+        fillna=fillna,
+    )
+    return {"trend_stc": indicator.stc}
+
+
+@_group(*MOMENTUM_FEATURES[0:4])
+def _stoch_rsi(src, fillna):
+    indicator = StochRSIIndicator(
+        close=src.close, window=14, smooth1=3, smooth2=3, fillna=fillna
+    )
+    # RSIIndicator(close, 14) is the RSI StochRSI is made of
+    return {
+        "momentum_rsi": lambda: pd.Series(indicator._rsi, name="rsi"),
+        "momentum_stoch_rsi": indicator.stochrsi,
+        "momentum_stoch_rsi_k": indicator.stochrsi_k,
+        "momentum_stoch_rsi_d": indicator.stochrsi_d,
+    }
+
+
+@_group("momentum_tsi")
+def _tsi(src, fillna):
+    indicator = TSIIndicator(
+        close=src.close, window_slow=25, window_fast=13, fillna=fillna
+    )
+    return {"momentum_tsi": indicator.tsi}
+
+
+@_group("momentum_uo")
+def _uo(src, fillna):
+    indicator = UltimateOscillator(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        window1=7,
+        window2=14,
+        window3=28,
+        weight1=4.0,
+        weight2=2.0,
+        weight3=1.0,
+        fillna=fillna,
+    )
+    return {"momentum_uo": indicator.ultimate_oscillator}
+
+
+@_group("momentum_stoch", "momentum_stoch_signal")
+def _stoch(src, fillna):
+    indicator = StochasticOscillator(
+        high=src.high,
+        low=src.low,
+        close=src.close,
+        window=14,
+        smooth_window=3,
+        fillna=fillna,
+    )
+    return {
+        "momentum_stoch": indicator.stoch,
+        "momentum_stoch_signal": indicator.stoch_signal,
+    }
+
+
+@_group("momentum_wr")
+def _wr(src, fillna):
+    indicator = WilliamsRIndicator(
+        high=src.high, low=src.low, close=src.close, lbp=14, fillna=fillna
+    )
+    return {"momentum_wr": indicator.williams_r}
+
+
+@_group("momentum_ao")
+def _ao(src, fillna):
+    indicator = AwesomeOscillatorIndicator(
+        high=src.high, low=src.low, window1=5, window2=34, fillna=fillna
+    )
+    return {"momentum_ao": indicator.awesome_oscillator}
+
+
+@_group("momentum_kama")
+def _kama(src, fillna):
+    indicator = KAMAIndicator(
+        close=src.close, window=10, pow1=2, pow2=30, fillna=fillna
+    )
+    return {"momentum_kama": indicator.kama}
+
+
+@_group("momentum_roc")
+def _roc(src, fillna):
+    indicator = ROCIndicator(close=src.close, window=12, fillna=fillna)
+    return {"momentum_roc": indicator.roc}
+
+
+@_group("momentum_ppo", "momentum_ppo_signal", "momentum_ppo_hist")
+def _pvo(src, fillna):
+    # The momentum_ppo columns have always held the Percentage Volume Oscillator,
+    # written over the Percentage Price Oscillator, so only the PVO is computed
+    indicator = PercentageVolumeOscillator(
+        volume=src.volume, window_slow=26, window_fast=12, window_sign=9, fillna=fillna
+    )
+    return {
+        "momentum_ppo": indicator.pvo,
+        "momentum_ppo_signal": indicator.pvo_signal,
+        "momentum_ppo_hist": indicator.pvo_hist,
+    }
+
+
+@_group("others_dr")
+def _dr(src, fillna):
+    return {"others_dr": DailyReturnIndicator(close=src.close, fillna=fillna).daily_return}
+
+
+@_group("others_dlr")
+def _dlr(src, fillna):
+    indicator = DailyLogReturnIndicator(close=src.close, fillna=fillna)
+    return {"others_dlr": indicator.daily_log_return}
+
+
+@_group("others_cr")
+def _cr(src, fillna):
+    indicator = CumulativeReturnIndicator(close=src.close, fillna=fillna)
+    return {"others_cr": indicator.cumulative_return}
+
+
+def _select_features(features) -> list:
+    """Feature names matching the selection, each item being a name or a name prefix"""
+    if features is None:
+        return list(FEATURES)
+    selected = set()
+    for feature in features:
+        matches = [name for name in FEATURES if name.startswith(feature)]
+        if not matches:
+            raise ValueError(f"Unknown feature: {feature}")
+        selected.update(matches)
+    return [name for name in FEATURES if name in selected]
+
+
+def _aligned(series: pd.Series, index: pd.Index):
+    # values put in the frame as column assignment would, aligned on the index
+    if series.index.equals(index):
+        return series.to_numpy()
+    return series.reindex(index).to_numpy()
+
+
+def add_ta_features(
+    df: pd.DataFrame,
+    open: str = None,  # noqa
+    high: str = None,
+    low: str = None,
+    close: str = None,
+    volume: str = None,
+    fillna: bool = False,
+    colprefix: str = "",
+    features: list = None,
+    workers: int = None,
+    cache=None,
+) -> pd.DataFrame:
+    """Add technical analysis features to dataframe, computed in one batch.
+
+    The indicator groups of the selected features run on a thread pool, the
+    indicators sharing intermediates are built once (see _GROUPS), and the new columns are assigned
+    to the dataframe in place in one step, features added before replaced where they
+    are. The values are the ones of the add_*_ta functions.
+
+    Args:
+        df (pandas.core.frame.DataFrame): Dataframe base.
+        open (str): Name of 'open' column.
+        high (str): Name of 'high' column.
+        low (str): Name of 'low' column.
+        close (str): Name of 'close' column.
+        volume (str): Name of 'volume' column.
+        fillna(bool): if True, fill nan values.
+        colprefix(str): Prefix column names inserted
+        features(list): Names (see FEATURES) or name prefixes of the features to add,
+            e.g. ["trend_macd", "volatility_bb", "momentum"]. All of them by default.
+        workers(int): Size of the thread pool, 1 computes the groups one after the other.
+        cache: Store of the features computed before, looked up by the fingerprint of
+            the input columns, e.g. src.data.indicator_cache.IndicatorCache. Any object
+            with its fingerprint, get and put methods.
+
+    Returns:
+        pandas.core.frame.DataFrame: Dataframe with new features.
+    """
+    selected = _select_features(features)
+    src = SimpleNamespace(
+        open=df[open] if open is not None else None,
+        high=df[high] if high is not None else None,
+        low=df[low] if low is not None else None,
+        close=df[close] if close is not None else None,
+        volume=df[volume] if volume is not None else None,
+    )
+    wanted = set(selected)
+    groups = [
+        (function, [name for name in columns if name in wanted])
+        for columns, function in _GROUPS
+        if wanted.intersection(columns)
+    ]
+
+    if cache is not None:
+        given = [field for field, series in vars(src).items() if series is not None]
+        fingerprint = cache.fingerprint(
+            df.index.to_numpy(), *[getattr(src, field).to_numpy() for field in given]
+        )
+        inputs = ",".join(given)
+
+    def compute(function, names):
+        if cache is None:
+            accessors = function(src, fillna)
+            return {name: _aligned(accessors[name](), df.index) for name in names}
+        keys = {name: f"ta.{name}(fillna={fillna}, inputs={inputs})" for name in names}
+        result = {name: cache.get(keys[name], fingerprint) for name in names}
+        missing = [name for name, value in result.items() if value is None]
+        if missing:
+            accessors = function(src, fillna)
+            for name in missing:
+                result[name] = _aligned(accessors[name](), df.index)
+                cache.put(keys[name], fingerprint, result[name])
+        return result
+
+    values = {}
+    with shared_intermediates():
+        if workers == 1:
+            for function, names in groups:
+                values.update(compute(function, names))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for result in pool.map(lambda group: compute(*group), groups):
+                    values.update(result)
+
+    frame = pd.DataFrame({f"{colprefix}{name}": values[name] for name in selected}, index=df.index)
+    df[list(frame.columns)] = frame
+    # the assignment adds one block per column, merged into as few as a concat would leave
+    df._consolidate_inplace()
+    return df
+
+
 def add_volume_ta(
     df: pd.DataFrame,
     high: str,
@@ -84,65 +743,16 @@ def add_volume_ta(
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-
-    # Accumulation Distribution Index
-    df[f"{colprefix}volume_adi"] = AccDistIndexIndicator(
-        high=df[high], low=df[low], close=df[close], volume=df[volume], fillna=fillna
-    ).acc_dist_index()
-
-    # On Balance Volume
-    df[f"{colprefix}volume_obv"] = OnBalanceVolumeIndicator(
-        close=df[close], volume=df[volume], fillna=fillna
-    ).on_balance_volume()
-
-    # Chaikin Money Flow
-    df[f"{colprefix}volume_cmf"] = ChaikinMoneyFlowIndicator(
-        high=df[high], low=df[low], close=df[close], volume=df[volume], fillna=fillna
-    ).chaikin_money_flow()
-
-    # Force Index
-    df[f"{colprefix}volume_fi"] = ForceIndexIndicator(
-        close=df[close], volume=df[volume], window=13, fillna=fillna
-    ).force_index()
-
-    # Money Flow Indicator
-    df[f"{colprefix}volume_mfi"] = MFIIndicator(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        volume=df[volume],
-        window=14,
-        fillna=fillna,
-    ).money_flow_index()
-
-    # Ease of Movement
-    indicator_eom = EaseOfMovementIndicator(
-        high=df[high], low=df[low], volume=df[volume], window=14, fillna=fillna
-    )
-    df[f"{colprefix}volume_em"] = indicator_eom.ease_of_movement()
-    df[f"{colprefix}volume_sma_em"] = indicator_eom.sma_ease_of_movement()
-
-    # Volume Price Trend
-    df[f"{colprefix}volume_vpt"] = VolumePriceTrendIndicator(
-        close=df[close], volume=df[volume], fillna=fillna
-    ).volume_price_trend()
-
-    # Negative Volume Index
-    df[f"{colprefix}volume_nvi"] = NegativeVolumeIndexIndicator(
-        close=df[close], volume=df[volume], fillna=fillna
-    ).negative_volume_index()
-
-    # Volume Weighted Average Price
-    df[f"{colprefix}volume_vwap"] = VolumeWeightedAveragePrice(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        volume=df[volume],
-        window=14,
+    return add_ta_features(
+        df=df,
+        high=high,
+        low=low,
+        close=close,
+        volume=volume,
         fillna=fillna,
-    ).volume_weighted_average_price()
-
-    return df
+        colprefix=colprefix,
+        features=["volume"],
+    )
 
 
 def add_volatility_ta(
@@ -166,52 +776,15 @@ def add_volatility_ta(
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-
-    # Average True Range
-    df[f"{colprefix}volatility_atr"] = AverageTrueRange(
-        close=df[close], high=df[high], low=df[low], window=10, fillna=fillna
-    ).average_true_range()
-
-    # Bollinger Bands
-    indicator_bb = BollingerBands(
-        close=df[close], window=20, window_dev=2, fillna=fillna
-    )
-    df[f"{colprefix}volatility_bbm"] = indicator_bb.bollinger_mavg()
-    df[f"{colprefix}volatility_bbh"] = indicator_bb.bollinger_hband()
-    df[f"{colprefix}volatility_bbl"] = indicator_bb.bollinger_lband()
-    df[f"{colprefix}volatility_bbw"] = indicator_bb.bollinger_wband()
-    df[f"{colprefix}volatility_bbp"] = indicator_bb.bollinger_pband()
-    df[f"{colprefix}volatility_bbhi"] = indicator_bb.bollinger_hband_indicator()
-    df[f"{colprefix}volatility_bbli"] = indicator_bb.bollinger_lband_indicator()
-
-    # Keltner Channel
-    indicator_kc = KeltnerChannel(
-        close=df[close], high=df[high], low=df[low], window=10, fillna=fillna
-    )
-    df[f"{colprefix}volatility_kcc"] = indicator_kc.keltner_channel_mband()
-    df[f"{colprefix}volatility_kch"] = indicator_kc.keltner_channel_hband()
-    df[f"{colprefix}volatility_kcl"] = indicator_kc.keltner_channel_lband()
-    df[f"{colprefix}volatility_kcw"] = indicator_kc.keltner_channel_wband()
-    df[f"{colprefix}volatility_kcp"] = indicator_kc.keltner_channel_pband()
-    df[f"{colprefix}volatility_kchi"] = indicator_kc.keltner_channel_hband_indicator()
-    df[f"{colprefix}volatility_kcli"] = indicator_kc.keltner_channel_lband_indicator()
-
-    # Donchian Channel
-    indicator_dc = DonchianChannel(
-        high=df[high], low=df[low], close=df[close], window=20, offset=0, fillna=fillna
-    )
-    df[f"{colprefix}volatility_dcl"] = indicator_dc.donchian_channel_lband()
-    df[f"{colprefix}volatility_dch"] = indicator_dc.donchian_channel_hband()
-    df[f"{colprefix}volatility_dcm"] = indicator_dc.donchian_channel_mband()
-    df[f"{colprefix}volatility_dcw"] = indicator_dc.donchian_channel_wband()
-    df[f"{colprefix}volatility_dcp"] = indicator_dc.donchian_channel_pband()
-
-    # Ulcer Index
-    df[f"{colprefix}volatility_ui"] = UlcerIndex(
-        close=df[close], window=14, fillna=fillna
-    ).ulcer_index()
-
-    return df
+    return add_ta_features(
+        df=df,
+        high=high,
+        low=low,
+        close=close,
+        fillna=fillna,
+        colprefix=colprefix,
+        features=["volatility"],
+    )
 
 
 def add_trend_ta(
@@ -235,149 +808,15 @@ def add_trend_ta(
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-
-    # MACD
-    indicator_macd = MACD(
-        close=df[close], window_slow=26, window_fast=12, window_sign=9, fillna=fillna
-    )
-    df[f"{colprefix}trend_macd"] = indicator_macd.macd()
-    df[f"{colprefix}trend_macd_signal"] = indicator_macd.macd_signal()
-    df[f"{colprefix}trend_macd_diff"] = indicator_macd.macd_diff()
-
-    # SMAs
-    df[f"{colprefix}trend_sma_fast"] = SMAIndicator(
-        close=df[close], window=12, fillna=fillna
-    ).sma_indicator()
-    df[f"{colprefix}trend_sma_slow"] = SMAIndicator(
-        close=df[close], window=26, fillna=fillna
-    ).sma_indicator()
-
-    # EMAs
-    df[f"{colprefix}trend_ema_fast"] = EMAIndicator(
-        close=df[close], window=12, fillna=fillna
-    ).ema_indicator()
-    df[f"{colprefix}trend_ema_slow"] = EMAIndicator(
-        close=df[close], window=26, fillna=fillna
-    ).ema_indicator()
-
-    # Average Directional Movement Index (ADX)
-    indicator_adx = ADXIndicator(
-        high=df[high], low=df[low], close=df[close], window=14, fillna=fillna
-    )
-    df[f"{colprefix}trend_adx"] = indicator_adx.adx()
-    df[f"{colprefix}trend_adx_pos"] = indicator_adx.adx_pos()
-    df[f"{colprefix}trend_adx_neg"] = indicator_adx.adx_neg()
-
-    # Vortex Indicator
-    indicator_vortex = VortexIndicator(
-        high=df[high], low=df[low], close=df[close], window=14, fillna=fillna
-    )
-    df[f"{colprefix}trend_vortex_ind_pos"] = indicator_vortex.vortex_indicator_pos()
-    df[f"{colprefix}trend_vortex_ind_neg"] = indicator_vortex.vortex_indicator_neg()
-    df[f"{colprefix}trend_vortex_ind_diff"] = indicator_vortex.vortex_indicator_diff()
-
-    # TRIX Indicator
-    df[f"{colprefix}trend_trix"] = TRIXIndicator(
-        close=df[close], window=15, fillna=fillna
-    ).trix()
-
-    # Mass Index
-    df[f"{colprefix}trend_mass_index"] = MassIndex(
-        high=df[high], low=df[low], window_fast=9, window_slow=25, fillna=fillna
-    ).mass_index()
-
-    # CCI Indicator
-    df[f"{colprefix}trend_cci"] = CCIIndicator(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        window=20,
-        constant=0.015,
-        fillna=fillna,
-    ).cci()
-
-    # DPO Indicator
-    df[f"{colprefix}trend_dpo"] = DPOIndicator(
-        close=df[close], window=20, fillna=fillna
-    ).dpo()
-
-    # KST Indicator
-    indicator_kst = KSTIndicator(
-        close=df[close],
-        roc1=10,
-        roc2=15,
-        roc3=20,
-        roc4=30,
-        window1=10,
-        window2=10,
-        window3=10,
-        window4=15,
-        nsig=9,
-        fillna=fillna,
-    )
-    df[f"{colprefix}trend_kst"] = indicator_kst.kst()
-    df[f"{colprefix}trend_kst_sig"] = indicator_kst.kst_sig()
-    df[f"{colprefix}trend_kst_diff"] = indicator_kst.kst_diff()
-
-    # Ichimoku Indicator
-    indicator_ichi = IchimokuIndicator(
-        high=df[high],
-        low=df[low],
-        window1=9,
-        window2=26,
-        window3=52,
-        visual=False,
-        fillna=fillna,
-    )
-    df[f"{colprefix}trend_ichimoku_conv"] = indicator_ichi.ichimoku_conversion_line()
-    df[f"{colprefix}trend_ichimoku_base"] = indicator_ichi.ichimoku_base_line()
-    df[f"{colprefix}trend_ichimoku_a"] = indicator_ichi.ichimoku_a()
-    df[f"{colprefix}trend_ichimoku_b"] = indicator_ichi.ichimoku_b()
-    indicator_ichi_visual = IchimokuIndicator(
-        high=df[high],
-        low=df[low],
-        window1=9,
-        window2=26,
-        window3=52,
-        visual=True,
-        fillna=fillna,
-    )
-    df[f"{colprefix}trend_visual_ichimoku_a"] = indicator_ichi_visual.ichimoku_a()
-    df[f"{colprefix}trend_visual_ichimoku_b"] = indicator_ichi_visual.ichimoku_b()
-
-    # Aroon Indicator
-    indicator_aroon = AroonIndicator(close=df[close], window=25, fillna=fillna)
-    df[f"{colprefix}trend_aroon_up"] = indicator_aroon.aroon_up()
-    df[f"{colprefix}trend_aroon_down"] = indicator_aroon.aroon_down()
-    df[f"{colprefix}trend_aroon_ind"] = indicator_aroon.aroon_indicator()
-
-    # PSAR Indicator
-    indicator_psar = PSARIndicator(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        step=0.02,
-        max_step=0.20,
+    return add_ta_features(
+        df=df,
+        high=high,
+        low=low,
+        close=close,
         fillna=fillna,
+        colprefix=colprefix,
+        features=["trend"],
     )
-    # df[f'{colprefix}trend_psar'] = indicator.psar()
-    df[f"{colprefix}trend_psar_up"] = indicator_psar.psar_up()
-    df[f"{colprefix}trend_psar_down"] = indicator_psar.psar_down()
-    df[f"{colprefix}trend_psar_up_indicator"] = indicator_psar.psar_up_indicator()
-    df[f"{colprefix}trend_psar_down_indicator"] = indicator_psar.psar_down_indicator()
-
-    # Schaff Trend Cycle (STC)
-    df[f"{colprefix}trend_stc"] = STCIndicator(
-        close=df[close],
-        window_slow=50,
-        window_fast=23,
-        cycle=10,
-        smooth1=3,
-        smooth2=3,
-        fillna=fillna,
-    ).stc()
-
-    return df
 
 
 def add_momentum_ta(
@@ -403,88 +842,16 @@ def add_momentum_ta(
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-
-    # Relative Strength Index (RSI)
-    df[f"{colprefix}momentum_rsi"] = RSIIndicator(
-        close=df[close], window=14, fillna=fillna
-    ).rsi()
-
-    # Stoch RSI (StochRSI)
-    indicator_srsi = StochRSIIndicator(
-        close=df[close], window=14, smooth1=3, smooth2=3, fillna=fillna
-    )
-    df[f"{colprefix}momentum_stoch_rsi"] = indicator_srsi.stochrsi()
-    df[f"{colprefix}momentum_stoch_rsi_k"] = indicator_srsi.stochrsi_k()
-    df[f"{colprefix}momentum_stoch_rsi_d"] = indicator_srsi.stochrsi_d()
-
-    # TSI Indicator
-    df[f"{colprefix}momentum_tsi"] = TSIIndicator(
-        close=df[close], window_slow=25, window_fast=13, fillna=fillna
-    ).tsi()
-
-    # Ultimate Oscillator
-    df[f"{colprefix}momentum_uo"] = UltimateOscillator(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        window1=7,
-        window2=14,
-        window3=28,
-        weight1=4.0,
-        weight2=2.0,
-        weight3=1.0,
-        fillna=fillna,
-    ).ultimate_oscillator()
-
-    # Stoch Indicator
-    indicator_so = StochasticOscillator(
-        high=df[high],
-        low=df[low],
-        close=df[close],
-        window=14,
-        smooth_window=3,
+    return add_ta_features(
+        df=df,
+        high=high,
+        low=low,
+        close=close,
+        volume=volume,
         fillna=fillna,
+        colprefix=colprefix,
+        features=["momentum"],
     )
-    df[f"{colprefix}momentum_stoch"] = indicator_so.stoch()
-    df[f"{colprefix}momentum_stoch_signal"] = indicator_so.stoch_signal()
-
-    # Williams R Indicator
-    df[f"{colprefix}momentum_wr"] = WilliamsRIndicator(
-        high=df[high], low=df[low], close=df[close], lbp=14, fillna=fillna
-    ).williams_r()
-
-    # Awesome Oscillator
-    df[f"{colprefix}momentum_ao"] = AwesomeOscillatorIndicator(
-        high=df[high], low=df[low], window1=5, window2=34, fillna=fillna
-    ).awesome_oscillator()
-
-    # KAMA
-    df[f"{colprefix}momentum_kama"] = KAMAIndicator(
-        close=df[close], window=10, pow1=2, pow2=30, fillna=fillna
-    ).kama()
-
-    # Rate Of Change
-    df[f"{colprefix}momentum_roc"] = ROCIndicator(
-        close=df[close], window=12, fillna=fillna
-    ).roc()
-
-    # Percentage Price Oscillator
-    indicator_ppo = PercentagePriceOscillator(
-        close=df[close], window_slow=26, window_fast=12, window_sign=9, fillna=fillna
-    )
-    df[f"{colprefix}momentum_ppo"] = indicator_ppo.ppo()
-    df[f"{colprefix}momentum_ppo_signal"] = indicator_ppo.ppo_signal()
-    df[f"{colprefix}momentum_ppo_hist"] = indicator_ppo.ppo_hist()
-
-    # Percentage Volume Oscillator
-    indicator_pvo = PercentageVolumeOscillator(
-        volume=df[volume], window_slow=26, window_fast=12, window_sign=9, fillna=fillna
-    )
-    df[f"{colprefix}momentum_ppo"] = indicator_pvo.pvo()
-    df[f"{colprefix}momentum_ppo_signal"] = indicator_pvo.pvo_signal()
-    df[f"{colprefix}momentum_ppo_hist"] = indicator_pvo.pvo_hist()
-
-    return df
 
 
 def add_others_ta(
@@ -501,22 +868,13 @@ def add_others_ta(
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-    # Daily Return
-    df[f"{colprefix}others_dr"] = DailyReturnIndicator(
-        close=df[close], fillna=fillna
-    ).daily_return()
-
-    # Daily Log Return
-    df[f"{colprefix}others_dlr"] = DailyLogReturnIndicator(
-        close=df[close], fillna=fillna
-    ).daily_log_return()
-
-    # Cumulative Return
-    df[f"{colprefix}others_cr"] = CumulativeReturnIndicator(
-        close=df[close], fillna=fillna
-    ).cumulative_return()
-
-    return df
+    return add_ta_features(
+        df=df,
+        close=close,
+        fillna=fillna,
+        colprefix=colprefix,
+        features=["others"],
+    )
 
 
 def add_all_ta_features(
@@ -528,6 +886,9 @@ def add_all_ta_features(
     volume: str,
     fillna: bool = False,
     colprefix: str = "",
+    features: list = None,
+    workers: int = None,
+    cache=None,
 ) -> pd.DataFrame:
     """Add all technical analysis features to dataframe.
 
@@ -540,33 +901,24 @@ def add_all_ta_features(
         volume (str): Name of 'volume' column.
         fillna(bool): if True, fill nan values.
         colprefix(str): Prefix column names inserted
+        features(list): Names or name prefixes of the features to add, all by
+            default (see add_ta_features).
+        workers(int): Size of the thread pool, 1 computes the groups one after the other.
+        cache: Store of the features computed before (see add_ta_features).
 
     Returns:
         pandas.core.frame.DataFrame: Dataframe with new features.
     """
-    df = add_volume_ta(
+    return add_ta_features(
         df=df,
+        open=open,
         high=high,
         low=low,
         close=close,
         volume=volume,
         fillna=fillna,
         colprefix=colprefix,
+        features=features,
+        workers=workers,
+        cache=cache,
     )
-    df = add_volatility_ta(
-        df=df, high=high, low=low, close=close, fillna=fillna, colprefix=colprefix
-    )
-    df = add_trend_ta(
-        df=df, high=high, low=low, close=close, fillna=fillna, colprefix=colprefix
-    )
-    df = add_momentum_ta(
-        df=df,
-        high=high,
-        low=low,
-        close=close,
-        volume=volume,
-        fillna=fillna,
-        colprefix=colprefix,
-    )
-    df = add_others_ta(df=df, close=close, fillna=fillna, colprefix=colprefix)
-    return df
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+CONFIG = Path(__file__).resolve().parents[1] / "config.yaml"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test in tmp_path, where the strategies write their logs/ and trades"""
+    (tmp_path / "logs").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def strategy_config():
+    """config.yaml of the repository running a strategy, with the given keys overridden"""
+
+    def strategy_config(name: str, **overrides) -> dict:
+        with open(CONFIG) as f:
+            config = yaml.safe_load(f)
+        return {**config, "strategy_name": name, **overrides}
+
+    return strategy_config
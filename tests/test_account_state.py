@@ -0,0 +1,82 @@
+"""AccountState replayed from recorded user data stream events, and its position layout."""
+import json
+
+import pytest
+
+from src.utils.account_state import AccountState, position_from_rest
+from src.utils.mock_exchange import MockExchange
+
+SYMBOL = "BTCUSDT"
+
+
+def account_update(time, balance, available, amount, entry, side="LONG"):
+    return {"e": "ACCOUNT_UPDATE", "E": time, "T": time, "a": {"m": "ORDER", "B": [
+        {"a": "USDT", "wb": str(balance), "cw": str(available), "bc": "0"}], "P": [
+        {"s": SYMBOL, "pa": str(amount), "ep": str(entry), "cr": "0", "up": "0", "mt": "isolated",
+         "iw": "0", "ps": side}]}}
+
+
+def write_events(path, events):
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+def test_replay_of_a_recorded_file(tmp_path):
+    path = tmp_path / "events.jsonl"
+    write_events(path, [
+        account_update(1000, 1000, 900, 1.0, 100),
+        {"e": "ORDER_TRADE_UPDATE", "E": 1001},
+        {"e": "outboundAccountPosition", "E": 1002, "u": 1002, "B": [{"a": "BNB", "f": "2.5", "l": "0.5"}]},
+        account_update(1003, 1010, 1010, 0.0, 0),
+        # older than the update applied before it, ignored
+        account_update(1001, 990, 800, 2.0, 101),
+    ])
+    account = AccountState()
+    account.replay(str(path))
+
+    assert account.events == 4
+    assert account.available() == 1010
+    assert account.available("BUSD") is None
+    assert account.free("BNB") == 2.5
+    assert account.free("BNB", "locked") == 0.5
+    assert account.position(SYMBOL, "LONG") == {"amount": 0.0, "entry": 0.0, "unrealized": 0.0, "time": 1003}
+    assert account.position(SYMBOL, "SHORT") is None
+
+
+def test_replay_matches_the_recording_account(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    exchange = MockExchange(balance=1000, leverage=2)
+    recording = AccountState(record=path)
+    recording.sync(exchange)
+    exchange.subscribe(recording.on_message)
+
+    exchange.on_trade(SYMBOL, 100, time=1)
+    exchange.futures_create_order(symbol=SYMBOL, side="BUY", type="MARKET", quantity=4, positionSide="LONG")
+    exchange.futures_create_order(symbol=SYMBOL, side="SELL", type="STOP_MARKET", quantity=4,
+                                  positionSide="LONG", stopPrice=95)
+    exchange.futures_create_order(symbol=SYMBOL, side="SELL", type="MARKET", quantity=2, positionSide="SHORT")
+    exchange.on_trade(SYMBOL, 94, time=2)
+
+    replayed = AccountState()
+    replayed.replay(path)
+    assert replayed.events == recording.events == 3
+    assert replayed.available() == pytest.approx(exchange._available())
+    assert replayed.position(SYMBOL, "LONG")["amount"] == 0.0
+    assert replayed.position(SYMBOL, "SHORT")["amount"] == -2.0
+    assert replayed.position(SYMBOL, "SHORT")["entry"] == 100.0
+    for side in ("LONG", "SHORT"):
+        assert replayed.position(SYMBOL, side) == recording.position(SYMBOL, side)
+
+
+def test_rest_positions_have_the_layout_of_the_state():
+    exchange = MockExchange(balance=1000)
+    exchange.on_trade(SYMBOL, 100, time=5)
+    exchange.futures_create_order(symbol=SYMBOL, side="BUY", type="MARKET", quantity=1, positionSide="LONG")
+    account = AccountState()
+    account.sync(exchange)
+
+    rest = [position_from_rest(position) for position in exchange.futures_position_information(symbol=SYMBOL)]
+    assert rest == account.symbol_positions(SYMBOL)
+    assert rest == [{"symbol": SYMBOL, "positionSide": "LONG", "amount": 1.0, "entry": 100.0,
+                     "unrealized": 0.0, "time": 5}]
@@ -0,0 +1,142 @@
+"""Trade list of the array backtest core against the candle loop it replaced.
+
+legacy_backtest is Strategy.backtest as it was before backtest.simulate and settle,
+with make_trade replaced by a lookup of the signal of the candle. The trades of
+simulate + settle (and of Strategy.backtest) must be exactly the ones of the loop, on
+futures and on spot.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.synthetic import synthetic_ohlcv
+from src.strategies.backtest import LONG, SHORT, empty_signals, settle, simulate
+
+COLUMNS = ["date", "side", "entry", "stop_loss", "take_profit", "result", "pnl_percent", "pnl", "balance"]
+
+
+def legacy_backtest(df: pd.DataFrame, make_trade, type: str, leverage: int, balance: float = 1000) -> pd.DataFrame:
+    trades = []
+    is_position_open = False
+    trade_parameters = None
+    for i in range(len(df)):
+        if not is_position_open:
+            if df.iloc[i].isnull().sum() != 0:
+                continue
+
+            trade = make_trade(i)
+            if trade:
+                if type == "spot":
+                    if trade["side"] == "SHORT":
+                        continue
+
+                is_position_open = True
+                trade_parameters = trade
+
+        elif is_position_open:
+            close_price = df.iloc[i].Close
+            if (trade_parameters["side"] == "LONG" and close_price >= trade_parameters["take_profit"]) or (
+                trade_parameters["side"] == "SHORT" and close_price <= trade_parameters["take_profit"]
+            ):
+                result = "profit"
+            elif (trade_parameters["side"] == "LONG" and close_price <= trade_parameters["stop_loss"]) or (
+                trade_parameters["side"] == "SHORT" and close_price >= trade_parameters["stop_loss"]
+            ):
+                result = "loss"
+            else:
+                continue
+
+            if trade_parameters["side"] == "LONG":
+                pnl = (close_price - trade_parameters["entry"]) * balance / trade_parameters["entry"]
+            else:
+                pnl = (trade_parameters["entry"] - close_price) * balance / trade_parameters["entry"]
+            pnl_percent = (pnl / balance) * 100
+            if type == "futures":
+                pnl *= leverage
+                pnl_percent *= leverage
+            balance = balance + pnl
+            trades.append({
+                "date": df.iloc[i]["Date"],
+                "side": trade_parameters["side"],
+                "entry": trade_parameters["entry"],
+                "stop_loss": trade_parameters["stop_loss"],
+                "take_profit": trade_parameters["take_profit"],
+                "result": result,
+                "pnl_percent": pnl_percent,
+                "pnl": pnl,
+                "balance": balance,
+            })
+            is_position_open = False
+            trade_parameters = {}
+    return pd.DataFrame(trades, columns=COLUMNS)
+
+
+def random_signals(df: pd.DataFrame, seed: int) -> dict:
+    """Signals on about one candle in 30, exits 0.5% to 3% away from the Close"""
+    rng = np.random.default_rng(seed)
+    signals = empty_signals(len(df))
+    rows = np.flatnonzero(rng.random(len(df)) < 1 / 30)
+    close = df["Close"].to_numpy()[rows]
+    side = rng.choice([LONG, SHORT], len(rows)).astype(np.int8)
+    stop, target = rng.uniform(0.005, 0.03, (2, len(rows)))
+    signals["side"][rows] = side
+    signals["entry"][rows] = close
+    signals["stop_loss"][rows] = close * (1 - side * stop)
+    signals["take_profit"][rows] = close * (1 + side * target)
+    return signals
+
+
+def signal_lookup(signals: dict):
+    def make_trade(i):
+        if signals["side"][i] == 0:
+            return False
+        return {
+            "side": "LONG" if signals["side"][i] == LONG else "SHORT",
+            "entry": signals["entry"][i],
+            "stop_loss": signals["stop_loss"][i],
+            "take_profit": signals["take_profit"][i],
+        }
+
+    return make_trade
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("type, leverage", [("futures", 5), ("spot", None)])
+def test_simulate_gives_the_trades_of_the_loop(seed, type, leverage):
+    df = synthetic_ohlcv(6000, seed=seed)
+    signals = random_signals(df, seed)
+    expected = legacy_backtest(df, signal_lookup(signals), type, leverage)
+
+    trades = simulate(df, signals, allow_short=type != "spot")
+    balance = settle(trades, 1000, leverage)
+
+    assert len(expected) > 30
+    assert (expected["side"] == "SHORT").any() == (type != "spot")
+    np.testing.assert_array_equal(df["Date"].to_numpy()[trades["exit_index"]], expected["date"])
+    np.testing.assert_array_equal(np.where(trades["side"] == LONG, "LONG", "SHORT"), expected["side"])
+    np.testing.assert_array_equal(np.where(trades["profit"], "profit", "loss"), expected["result"])
+    for name in ["entry", "stop_loss", "take_profit", "pnl_percent", "pnl", "balance"]:
+        np.testing.assert_array_equal(trades[name], expected[name], err_msg=name)
+    assert balance == expected["balance"].iloc[-1]
+
+
+@pytest.mark.parametrize("type", ["futures", "spot"])
+def test_strategy_backtest_gives_the_trades_of_the_loop(workdir, strategy_config, type):
+    pytest.importorskip("src.keys", reason="the strategies read the Binance keys of src/keys.py")
+    from src.strategies.triple_supertrend import TripleSupertrendStrategy
+
+    strategy = TripleSupertrendStrategy(strategy_config("triplesupertrend", type=type))
+    strategy.df_indicators = strategy.indicators.get_indicators(synthetic_ohlcv(4000, seed=3), strategy.parameters)
+    df = strategy.df_indicators
+    leverage = strategy.config["leverage"] if type == "futures" else None
+    expected = legacy_backtest(
+        df, lambda i: strategy.make_trade(type="backtest", row=df.iloc[i]), type, leverage
+    )
+
+    trades = strategy.backtest()
+
+    assert len(expected) > 20
+    pd.testing.assert_frame_equal(
+        trades[COLUMNS].reset_index(drop=True), expected, check_dtype=False, check_exact=True
+    )
+    assert (trades["leverage"] == leverage).all() if leverage else trades["leverage"].isnull().all()
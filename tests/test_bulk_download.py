@@ -0,0 +1,141 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.data.bulk_download import BulkDownloader, TokenBucket, split_range
+from src.data.fixture_client import FixtureClient, serve_klines
+from src.data.kline_store import KlineStore, parse_klines
+from src.data.synthetic import synthetic_ohlcv
+
+MINUTE = 60000
+
+
+@pytest.fixture
+def klines():
+    client = FixtureClient()
+    client.add_frame('BTCUSDT', '1m', synthetic_ohlcv(3000, start=0, interval_ms=MINUTE))
+    server = serve_klines(client)
+    yield client, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def downloader(tmp_path, url, **kwargs):
+    return BulkDownloader(KlineStore(str(tmp_path / 'store')), base_url=url, staging=str(tmp_path / 'staging'),
+                          workers=4, **kwargs)
+
+
+def staged(tmp_path):
+    path = tmp_path / 'staging' / 'BTCUSDT' / '1m'
+    return sorted(os.listdir(path)) if path.exists() else []
+
+
+def test_split_range_follows_the_grid():
+    chunks = split_range(150 * MINUTE, 2500 * MINUTE, '1m', limit=1000)
+    assert chunks == [(150 * MINUTE, 1000 * MINUTE - 1), (1000 * MINUTE, 2000 * MINUTE - 1), (2000 * MINUTE, 2500 * MINUTE)]
+    # another start only changes the first chunk
+    assert split_range(170 * MINUTE, 2500 * MINUTE, '1m', limit=1000)[1:] == chunks[1:]
+
+
+def test_download_matches_the_fixture(tmp_path, klines):
+    client, url = klines
+    bulk = downloader(tmp_path, url)
+    assert bulk.download([('BTCUSDT', '1m', 0, 2999 * MINUTE)], progress=False) == {('BTCUSDT', '1m'): 3000}
+    df = bulk.store.read('BTCUSDT', '1m')
+    np.testing.assert_array_equal(df['Date'], parse_klines(client.klines[('BTCUSDT', '1m')])['open_time'])
+    assert client.calls == 3
+    assert staged(tmp_path) == []
+    # nothing is missing anymore
+    assert bulk.download([('BTCUSDT', '1m', 0, 2999 * MINUTE)], progress=False) == {('BTCUSDT', '1m'): 0}
+    assert client.calls == 3
+
+
+def test_later_start_leaves_no_hole(tmp_path, klines):
+    client, url = klines
+    bulk = downloader(tmp_path, url)
+    bulk.store.append('BTCUSDT', '1m', parse_klines(client.klines[('BTCUSDT', '1m')][:100]))
+    assert bulk.missing_ranges('BTCUSDT', '1m', 500 * MINUTE, 2999 * MINUTE) == [(99 * MINUTE + 1, 2999 * MINUTE)]
+    bulk.download([('BTCUSDT', '1m', 500 * MINUTE, 2999 * MINUTE)], progress=False)
+    assert len(bulk.store.read('BTCUSDT', '1m')) == 3000
+
+
+def test_gaps_of_the_store_are_downloaded(tmp_path, klines):
+    client, url = klines
+    bulk = downloader(tmp_path, url)
+    rows = client.klines[('BTCUSDT', '1m')]
+    bulk.store.append('BTCUSDT', '1m', parse_klines(rows[:100]))
+    bulk.store.append('BTCUSDT', '1m', parse_klines(rows[500:]))
+    assert bulk.missing_ranges('BTCUSDT', '1m', 0, 2999 * MINUTE) == [(100 * MINUTE, 499 * MINUTE)]
+    assert bulk.download([('BTCUSDT', '1m', 0, 2999 * MINUTE)], progress=False) == {('BTCUSDT', '1m'): 400}
+    assert bulk.store.gaps('BTCUSDT', '1m') == []
+
+
+def test_resume_reuses_the_finished_chunks(tmp_path, klines):
+    client, url = klines
+    fail = BulkDownloader.fetch
+
+    def fetch(self, symbol, interval, start, end):
+        if start >= 2000 * MINUTE:
+            raise ConnectionError('connection reset')
+        return fail(self, symbol, interval, start, end)
+
+    broken = downloader(tmp_path, url)
+    broken.fetch = fetch.__get__(broken)
+    with pytest.raises(ConnectionError):
+        broken.download([('BTCUSDT', '1m', 10 * MINUTE, 2999 * MINUTE)], progress=False)
+    assert set(staged(tmp_path)) == {f'{10 * MINUTE}-{1000 * MINUTE - 1}.npy', f'{1000 * MINUTE}-{2000 * MINUTE - 1}.npy'}
+    assert broken.store.meta('BTCUSDT', '1m')['rows'] == 0
+
+    # resumed later with another start: the first chunk is fetched again, the second one is reused
+    calls = client.calls
+    bulk = downloader(tmp_path, url)
+    bulk.download([('BTCUSDT', '1m', 20 * MINUTE, 2999 * MINUTE)], progress=False)
+    assert client.calls - calls == 2
+    assert len(bulk.store.read('BTCUSDT', '1m')) == 2980
+    assert staged(tmp_path) == []
+
+
+def test_chunk_fetched_with_another_end_is_not_reused(tmp_path, klines):
+    client, url = klines
+    bulk = downloader(tmp_path, url)
+    path = tmp_path / 'staging' / 'BTCUSDT' / '1m'
+    path.mkdir(parents=True)
+    # a last chunk staged by an earlier run, when the candles went up to 2100
+    (path / f'{2000 * MINUTE}-{2100 * MINUTE}.npy').write_bytes(b'')
+    (path / f'{2000 * MINUTE}-{2100 * MINUTE}.npy.tmp').write_bytes(b'')
+    bulk.download([('BTCUSDT', '1m', 2000 * MINUTE, 2999 * MINUTE)], progress=False)
+    assert len(bulk.store.read('BTCUSDT', '1m')) == 1000
+    assert staged(tmp_path) == []
+
+
+def test_token_bucket_waits_for_the_refill():
+    bucket = TokenBucket(10, period=0.5)
+    start = time.monotonic()
+    bucket.acquire(10)
+    assert time.monotonic() - start < 0.05
+    bucket.acquire(5)
+    assert time.monotonic() - start == pytest.approx(0.25, abs=0.1)
+
+
+def test_token_bucket_follows_the_server_weight_and_pauses():
+    bucket = TokenBucket(100, period=60)
+    bucket.observe(90)
+    assert bucket.tokens <= 10.1
+    bucket.pause(0.2)
+    start = time.monotonic()
+    bucket.acquire(0)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_download_observes_the_used_weight(tmp_path):
+    client = FixtureClient()
+    client.add_frame('BTCUSDT', '1m', synthetic_ohlcv(100, start=0, interval_ms=MINUTE))
+    server = serve_klines(client, weight=1000)
+    try:
+        bulk = downloader(tmp_path, f'http://127.0.0.1:{server.server_address[1]}', weight_limit=1200)
+        bulk.download([('BTCUSDT', '1m', 0, 99 * MINUTE)], progress=False)
+    finally:
+        server.shutdown()
+    # the budget is what the server reports as left, not the weight spent by this process
+    assert bulk.bucket.tokens < 1200 - 5 - 900
@@ -0,0 +1,90 @@
+"""AsyncExecutor trades against a MockExchange served over HTTP."""
+import pytest
+from binance.enums import FUTURE_ORDER_TYPE_STOP_MARKET, ORDER_STATUS_NEW
+
+from src.utils.execution import AsyncExecutor
+from src.utils.mock_exchange import STOP_TYPES, MockExchange, _error, serve_exchange
+
+SYMBOL = "BTCUSDT"
+
+
+class RejectingExchange(MockExchange):
+    """Rejects the first rejections stop loss orders placed one by one"""
+
+    def __init__(self, rejections: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.rejections = rejections
+
+    def futures_create_order(self, **params):
+        if params["type"] == FUTURE_ORDER_TYPE_STOP_MARKET and self.rejections:
+            self.rejections -= 1
+            self._call("futures_create_order")
+            raise _error(-1001, "Internal error; unable to process your request. Please try again.")
+        return super().futures_create_order(**params)
+
+
+@pytest.fixture
+def trade():
+    executors, servers = [], []
+
+    def trade(exchange, batch=False, stop_loss=95, take_profit=110):
+        server = serve_exchange(exchange)
+        servers.append(server)
+        executor = AsyncExecutor("key", "secret", batch=batch,
+                                 futures_url=f"http://127.0.0.1:{server.server_address[1]}/fapi")
+        executors.append(executor)
+        exchange.on_trade(SYMBOL, 100)
+        return executor.run(executor.futures_trade("BUY", 1.0, SYMBOL, "LONG", stop_loss, take_profit))
+
+    yield trade
+    for executor in executors:
+        executor.close()
+    for server in servers:
+        server.shutdown()
+
+
+def resting(exchange):
+    return sorted(order["type"] for order in exchange.orders.values() if order["status"] == ORDER_STATUS_NEW)
+
+
+def amount(exchange):
+    return exchange.positions[(SYMBOL, "LONG")]["amount"]
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_trade_is_protected(trade, batch):
+    exchange = MockExchange()
+    order, stop_loss, take_profit = trade(exchange, batch=batch)
+    assert order["status"] == "FILLED"
+    assert (float(stop_loss["stopPrice"]), float(take_profit["stopPrice"])) == (95, 110)
+    assert amount(exchange) == 1.0
+    assert resting(exchange) == sorted(STOP_TYPES)
+
+
+def test_rejected_exit_is_sent_again(trade):
+    exchange = RejectingExchange(rejections=2)
+    trade(exchange)
+    assert exchange.rejections == 0
+    assert amount(exchange) == 1.0
+    assert resting(exchange) == sorted(STOP_TYPES)
+
+
+def test_position_is_closed_when_the_exit_keeps_failing(trade):
+    exchange = RejectingExchange(rejections=10)
+    with pytest.raises(RuntimeError, match="position closed"):
+        trade(exchange)
+    # the first attempt and the two retries
+    assert exchange.rejections == 7
+    assert amount(exchange) == 0.0
+    assert resting(exchange) == []
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_position_is_closed_when_the_exit_would_trigger(trade, batch):
+    # a stop loss above the price of a long is rejected by the exchange
+    exchange = MockExchange()
+    with pytest.raises(RuntimeError, match="position closed"):
+        trade(exchange, batch=batch, stop_loss=101)
+    assert amount(exchange) == 0.0
+    assert resting(exchange) == []
+    assert exchange.balance == 1000
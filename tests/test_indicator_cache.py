@@ -0,0 +1,120 @@
+"""IndicatorCache on disk: values found again by a new cache, LRU eviction, no directory scans."""
+import os
+
+import numpy as np
+import pytest
+
+from src.data.indicator_cache import IndicatorCache
+
+ROWS = 1000
+
+
+def values(seed: int, rows: int = ROWS) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=rows)
+
+
+def npz_files(root) -> list:
+    return sorted(name for name in os.listdir(root) if name.endswith(".npz"))
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Directories listed with os.scandir during the test"""
+    calls = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    return calls
+
+
+def test_values_are_found_again_on_disk(tmp_path):
+    close = values(0)
+    fingerprint = IndicatorCache.fingerprint(close)
+    cache = IndicatorCache(str(tmp_path))
+    cache.put("sma(5)", fingerprint, close * 2)
+    cache.put("bands(5)", fingerprint, (close - 1, close + 1))
+
+    # memory_mb=0 keeps nothing in memory, every hit is read from the disk
+    cache = IndicatorCache(str(tmp_path), memory_mb=0)
+    np.testing.assert_array_equal(cache.get("sma(5)", fingerprint), close * 2)
+    lower, upper = cache.get("bands(5)", fingerprint)
+    np.testing.assert_array_equal(lower, close - 1)
+    np.testing.assert_array_equal(upper, close + 1)
+    assert not lower.flags.writeable
+    assert cache.get("sma(6)", fingerprint) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_prefix_is_found_on_disk(tmp_path):
+    close = values(1)
+    IndicatorCache(str(tmp_path)).put("tr", IndicatorCache.fingerprint(close[:600]), close[:600] * 3)
+
+    cache = IndicatorCache(str(tmp_path), memory_mb=0)
+    rows, value = cache.prefix("tr", [close], ROWS)
+    assert rows == 600
+    np.testing.assert_array_equal(value, close[:600] * 3)
+    assert cache.prefix("tr", [values(2)], ROWS) is None
+    assert cache.extended == 1
+
+
+def test_the_directory_is_listed_once(tmp_path, scans):
+    cache = IndicatorCache(str(tmp_path), memory_mb=0)
+    for seed in range(20):
+        close = values(seed)
+        fingerprint = IndicatorCache.fingerprint(close)
+        assert cache.get("ema(9)", fingerprint) is None
+        assert cache.prefix("ema(9)", [close], ROWS) is None
+        cache.put("ema(9)", fingerprint, close)
+        assert cache.get("ema(9)", fingerprint) is not None
+
+    assert scans == [str(tmp_path)]
+    assert cache.hits == 20
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    IndicatorCache(str(tmp_path / "size")).put("wma(3)", "0" * 32, values(0))
+    size = os.path.getsize(tmp_path / "size" / npz_files(tmp_path / "size")[0])
+    # room for three values on disk, none in memory
+    cache = IndicatorCache(str(tmp_path / "cache"), memory_mb=0, disk_mb=3.5 * size / 2**20)
+    fingerprints = [IndicatorCache.fingerprint(values(seed)) for seed in range(5)]
+    for seed in range(3):
+        cache.put("wma(3)", fingerprints[seed], values(seed))
+    # a hit makes the first value the most recently used
+    assert cache.get("wma(3)", fingerprints[0]) is not None
+    cache.put("wma(3)", fingerprints[3], values(3))
+    cache.put("wma(3)", fingerprints[4], values(4))
+
+    assert len(npz_files(tmp_path / "cache")) == 3
+    kept = [seed for seed in range(5) if cache.get("wma(3)", fingerprints[seed]) is not None]
+    assert kept == [0, 3, 4]
+    # a new cache lists what is left on disk
+    cache = IndicatorCache(str(tmp_path / "cache"), memory_mb=0)
+    assert [seed for seed in range(5) if cache.get("wma(3)", fingerprints[seed]) is not None] == kept
+
+
+def test_files_removed_by_another_process_are_misses(tmp_path):
+    close = values(3)
+    fingerprint = IndicatorCache.fingerprint(close)
+    cache = IndicatorCache(str(tmp_path), memory_mb=0)
+    cache.put("rsi(14)", fingerprint, close)
+    for name in npz_files(tmp_path):
+        os.remove(tmp_path / name)
+
+    assert cache.get("rsi(14)", fingerprint) is None
+    assert cache.prefix("rsi(14)", [np.append(close, 1.0)], ROWS + 1) is None
+
+
+def test_clear_drops_the_disk_level(tmp_path):
+    cache = IndicatorCache(str(tmp_path))
+    fingerprint = IndicatorCache.fingerprint(values(4))
+    cache.put("atr(14)", fingerprint, values(4))
+    cache.clear()
+
+    assert npz_files(tmp_path) == []
+    assert cache.get("atr(14)", fingerprint) is None
+    cache.put("atr(14)", fingerprint, values(4))
+    assert IndicatorCache(str(tmp_path), memory_mb=0).get("atr(14)", fingerprint) is not None
@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.data.fixture_client import FixtureClient
+from src.data.kline_store import KlineStore, parse_klines
+from src.data.synthetic import synthetic_ohlcv
+
+MINUTE = 60000
+
+
+@pytest.fixture
+def client():
+    client = FixtureClient()
+    client.add_frame('BTCUSDT', '1m', synthetic_ohlcv(600, start=0, interval_ms=MINUTE))
+    return client
+
+
+@pytest.fixture
+def store(tmp_path, client):
+    return KlineStore(str(tmp_path), client)
+
+
+def rows(client, start, stop):
+    return parse_klines(client.klines[('BTCUSDT', '1m')][start:stop])
+
+
+def assert_fixture(store, client, start=0, stop=600):
+    df = store.read('BTCUSDT', '1m')
+    expected = rows(client, start, stop)
+    np.testing.assert_array_equal(df['Date'], expected['open_time'])
+    np.testing.assert_array_equal(df['Close'], expected['Close'])
+
+
+def test_sync_appends_only_the_new_candles(store, client):
+    assert store.sync('BTCUSDT', '1m', 0, 299 * MINUTE) == 300
+    assert store.sync('BTCUSDT', '1m', 0, 599 * MINUTE) == 300
+    assert client.served == 600
+    assert_fixture(store, client)
+
+
+def test_sync_of_a_later_range_leaves_no_hole(store, client):
+    store.sync('BTCUSDT', '1m', 0, 99 * MINUTE)
+    assert store.sync('BTCUSDT', '1m', 500 * MINUTE, 599 * MINUTE) == 500
+    assert len(store.read('BTCUSDT', '1m', 0, 599 * MINUTE)) == 600
+
+
+def test_sync_of_an_earlier_range_is_merged(store, client):
+    store.sync('BTCUSDT', '1m', 300 * MINUTE, 599 * MINUTE)
+    assert store.sync('BTCUSDT', '1m', 0, 599 * MINUTE) == 300
+    assert_fixture(store, client)
+
+
+def test_read_rejects_gaps_and_sync_fills_them(store, client):
+    store.append('BTCUSDT', '1m', rows(client, 0, 100))
+    store.append('BTCUSDT', '1m', rows(client, 500, 600))
+    assert store.gaps('BTCUSDT', '1m') == [(100 * MINUTE, 499 * MINUTE)]
+    with pytest.raises(ValueError):
+        store.read('BTCUSDT', '1m', 0, 599 * MINUTE)
+    assert len(store.read('BTCUSDT', '1m', allow_gaps=True)) == 200
+    # a range on one side of the gap is contiguous
+    assert len(store.read('BTCUSDT', '1m', 500 * MINUTE)) == 100
+
+    assert store.sync('BTCUSDT', '1m', 0, 599 * MINUTE) == 400
+    assert store.gaps('BTCUSDT', '1m') == []
+    assert_fixture(store, client)
+
+
+def test_candles_missing_on_the_exchange_are_not_gaps(tmp_path, client):
+    outage = FixtureClient({('BTCUSDT', '1m'): client.klines[('BTCUSDT', '1m')][:200]
+                            + client.klines[('BTCUSDT', '1m')][260:]})
+    store = KlineStore(str(tmp_path), outage)
+    store.sync('BTCUSDT', '1m', 0, 599 * MINUTE)
+    assert store.gaps('BTCUSDT', '1m') == []
+    assert len(store.read('BTCUSDT', '1m')) == 540
+    calls = outage.calls
+    store.sync('BTCUSDT', '1m', 0, 599 * MINUTE)
+    assert outage.calls == calls
+
+
+def test_interrupted_merge_keeps_the_store(store, client, monkeypatch):
+    store.append('BTCUSDT', '1m', rows(client, 300, 600))
+
+    def crash(*args, **kwargs):
+        raise OSError('disk full')
+
+    # the new columns are written, the meta switching to them is not
+    monkeypatch.setattr(json, 'dump', crash)
+    with pytest.raises(OSError):
+        store.merge('BTCUSDT', '1m', rows(client, 0, 300))
+    monkeypatch.undo()
+    assert_fixture(store, client, 300, 600)
+
+    assert store.merge('BTCUSDT', '1m', rows(client, 0, 300)) == 300
+    assert_fixture(store, client)
+    # only the files of the current generation are left
+    assert len([file for file in os.listdir(store.path('BTCUSDT', '1m')) if file.endswith('.bin')]) == 6
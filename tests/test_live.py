@@ -0,0 +1,86 @@
+"""LiveEngine on recorded klines and on a mock exchange.
+
+A kline file replayed through on_message, one event at a time, must give the signals
+of generate_signals on the whole frame, and trading on the mock exchange must hold one
+protected position at a time.
+"""
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("src.keys", reason="the strategies read the Binance keys of src/keys.py")
+
+from src.data.synthetic import synthetic_ohlcv  # noqa: E402
+from src.strategies.backtest import LONG, SHORT  # noqa: E402
+from src.strategies.live import LiveEngine  # noqa: E402
+from src.strategies.registry import STRATEGIES  # noqa: E402
+from src.utils.mock_exchange import STOP_TYPES, MockExchange  # noqa: E402
+
+pytestmark = pytest.mark.usefixtures("workdir")
+
+
+@pytest.fixture
+def config(strategy_config):
+    return lambda name: strategy_config(name, time_interval="1m", execution={"async": False})
+
+
+@pytest.mark.parametrize("name", ["tripleema", "triplesupertrend"])
+def test_recorded_klines_give_the_batch_signals(tmp_path, config, name):
+    df = synthetic_ohlcv(1500, seed=4)
+    path = tmp_path / "klines.jsonl"
+    with open(path, "w") as f:
+        for candle in df.to_dict("records"):
+            f.write(json.dumps(LiveEngine.message_from_candle(candle)) + "\n")
+
+    engine = LiveEngine(STRATEGIES[name](config(name)))
+    side = np.zeros(len(df), dtype=np.int8)
+    levels = np.full((len(df), 3), np.nan)
+    with open(path) as f:
+        for i, line in enumerate(f):
+            trade = engine.on_message(json.loads(line))
+            if trade:
+                side[i] = LONG if trade["side"] == "LONG" else SHORT
+                levels[i] = trade["entry"], trade["stop_loss"], trade["take_profit"]
+
+    strategy = STRATEGIES[name](config(name))
+    signals = strategy.generate_signals(strategy.indicators.get_indicators(df, strategy.parameters))
+    assert np.count_nonzero(signals["side"]) > 10
+    np.testing.assert_array_equal(side, signals["side"])
+    entries = side != 0
+    np.testing.assert_array_equal(
+        levels[entries],
+        np.column_stack([signals[name][entries] for name in ("entry", "stop_loss", "take_profit")]),
+    )
+
+
+def test_one_protected_position_at_a_time(config):
+    name = "triplesupertrend"
+    df = synthetic_ohlcv(3000, seed=4)
+    strategy = STRATEGIES[name](config(name))
+    signals = strategy.generate_signals(strategy.indicators.get_indicators(df, strategy.parameters))
+    repeated = np.count_nonzero((signals["side"][1:] != 0) & (signals["side"][:-1] != 0))
+    assert repeated > 0
+
+    exchange = MockExchange(balance=1000, leverage=5)
+    symbol = strategy.config["trade_symbol"]
+    engine = LiveEngine(STRATEGIES[name](config(name), client=exchange), trade=True)
+    engine.warm_up(df.iloc[:500])
+    exchange.replay(symbol, df.iloc[:500])
+    trades = 0
+    for candle in df.iloc[500:].to_dict("records"):
+        exchange.on_kline(symbol, candle)
+        trades += bool(engine.on_candle(candle))
+        open_positions = [(key, position) for key, position in exchange.positions.items() if position["amount"]]
+        assert len(open_positions) <= 1
+        for (_, side), position in open_positions:
+            resting = [order for order in exchange.orders.values()
+                       if order["status"] == "NEW" and order["positionSide"] == side]
+            # both exits rest for the whole position
+            assert sorted(order["type"] for order in resting) == sorted(STOP_TYPES)
+            assert all(order["quantity"] == abs(position["amount"]) for order in resting)
+
+    entries = [fill for fill in exchange.fills if fill["type"] not in STOP_TYPES]
+    assert trades > 1
+    assert len(entries) == trades
+    assert trades < np.count_nonzero(signals["side"][500:])
@@ -0,0 +1,72 @@
+"""supertrend and SuperTrend against a golden dataset.
+
+tests/data/supertrend_golden.npz holds the High/Low/Close of 1500 candles and the band
+and direction SuperTrend gave on them before the array kernel, for each period and
+multiplier below. The direction is stored as 1 for 'up', -1 for 'down' and 0 for None.
+Both the Numba kernel and the pure Python loop must reproduce them bit for bit.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import indicators
+from src.utils.indicators import SuperTrend, supertrend, trend_labels
+
+GOLDEN = Path(__file__).resolve().parent / "data" / "supertrend_golden.npz"
+PARAMETERS = [(7, 1), (8, 2), (9, 3), (14, 2.5)]
+
+
+@pytest.fixture(scope="module")
+def golden():
+    with np.load(GOLDEN) as data:
+        return dict(data)
+
+
+@pytest.fixture(params=["kernel", "python"])
+def backend(request, monkeypatch):
+    if request.param == "kernel" and indicators._supertrend_kernel is None:
+        pytest.skip("numba is not installed")
+    if request.param == "python":
+        monkeypatch.setattr(indicators, "_supertrend_kernel", None)
+    return request.param
+
+
+@pytest.mark.usefixtures("backend")
+@pytest.mark.parametrize("period, multiplier", PARAMETERS)
+def test_supertrend_matches_the_golden_arrays(golden, period, multiplier):
+    st, direction = supertrend(golden["high"], golden["low"], golden["close"], period, multiplier)
+
+    np.testing.assert_array_equal(st, golden[f"st_{period}_{multiplier}"])
+    np.testing.assert_array_equal(direction, golden[f"direction_{period}_{multiplier}"])
+    assert direction.dtype == np.int8
+
+
+@pytest.mark.usefixtures("backend")
+@pytest.mark.parametrize("period, multiplier", PARAMETERS)
+def test_SuperTrend_matches_the_golden_arrays(golden, period, multiplier):
+    df = pd.DataFrame({"High": golden["high"], "Low": golden["low"], "Close": golden["close"]})
+    df.insert(0, "Open", df["Close"])
+    columns = list(df.columns)
+
+    st, stx = SuperTrend(df, period, multiplier)
+
+    assert (st.name, stx.name) == (f"ST_{period}_{multiplier}", f"STX_{period}_{multiplier}")
+    np.testing.assert_array_equal(st.to_numpy(), golden[f"st_{period}_{multiplier}"])
+    np.testing.assert_array_equal(stx.to_numpy(), trend_labels(golden[f"direction_{period}_{multiplier}"]))
+    assert list(df.columns) == columns
+
+
+def test_panel_columns_match_the_golden_arrays(golden):
+    period, multiplier = PARAMETERS[1]
+    panel = {name: np.column_stack([golden[name], golden[name][::-1]]) for name in ("high", "low", "close")}
+
+    st, direction = supertrend(panel["high"], panel["low"], panel["close"], period, multiplier)
+
+    np.testing.assert_array_equal(st[:, 0], golden[f"st_{period}_{multiplier}"])
+    np.testing.assert_array_equal(direction[:, 0], golden[f"direction_{period}_{multiplier}"])
+    reversed_st, reversed_direction = supertrend(panel["high"][:, 1], panel["low"][:, 1], panel["close"][:, 1],
+                                                 period, multiplier)
+    np.testing.assert_array_equal(st[:, 1], reversed_st)
+    np.testing.assert_array_equal(direction[:, 1], reversed_direction)
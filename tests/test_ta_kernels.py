@@ -0,0 +1,337 @@
+"""Parity of the ta.kernels recursions with the per element loops they replaced.
+
+The Legacy classes run the original loops (as they were before ta.kernels) and the
+outputs of the current classes must be exactly equal to theirs, on the Numba path
+and on the list fallback.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ta import kernels
+from ta.momentum import KAMAIndicator
+from ta.trend import ADXIndicator, PSARIndicator, _get_min_max
+from ta.volatility import AverageTrueRange
+from ta.volume import NegativeVolumeIndexIndicator
+
+LENGTHS = [40, 257, 1000]
+WINDOWS = [3, 14, 30]
+
+
+class LegacyAverageTrueRange(AverageTrueRange):
+    def _run(self):
+        close_shift = self._close.shift(1)
+        true_range = self._true_range(self._high, self._low, close_shift)
+        atr = np.zeros(len(self._close))
+        atr[self._window - 1] = true_range[0 : self._window].mean()
+        for i in range(self._window, len(atr)):
+            atr[i] = (atr[i - 1] * (self._window - 1) + true_range.iloc[i]) / float(
+                self._window
+            )
+        self._atr = pd.Series(data=atr, index=true_range.index)
+
+
+class LegacyADXIndicator(ADXIndicator):
+    def _run(self):
+        close_shift = self._close.shift(1)
+        pdm = _get_min_max(self._high, close_shift, "max")
+        pdn = _get_min_max(self._low, close_shift, "min")
+        diff_directional_movement = pdm - pdn
+
+        self._trs_initial = np.zeros(self._window - 1)
+        self._trs = np.zeros(len(self._close) - (self._window - 1))
+        self._trs[0] = diff_directional_movement.dropna()[0 : self._window].sum()
+        diff_directional_movement = diff_directional_movement.reset_index(drop=True)
+
+        for i in range(1, len(self._trs) - 1):
+            self._trs[i] = (
+                self._trs[i - 1]
+                - (self._trs[i - 1] / float(self._window))
+                + diff_directional_movement[self._window + i]
+            )
+
+        diff_up = self._high - self._high.shift(1)
+        diff_down = self._low.shift(1) - self._low
+        pos = abs(((diff_up > diff_down) & (diff_up > 0)) * diff_up)
+        neg = abs(((diff_down > diff_up) & (diff_down > 0)) * diff_down)
+
+        self._dip = np.zeros(len(self._close) - (self._window - 1))
+        self._dip[0] = pos.dropna()[0 : self._window].sum()
+        pos = pos.reset_index(drop=True)
+        for i in range(1, len(self._dip) - 1):
+            self._dip[i] = (
+                self._dip[i - 1]
+                - (self._dip[i - 1] / float(self._window))
+                + pos[self._window + i]
+            )
+
+        self._din = np.zeros(len(self._close) - (self._window - 1))
+        self._din[0] = neg.dropna()[0 : self._window].sum()
+        neg = neg.reset_index(drop=True)
+        for i in range(1, len(self._din) - 1):
+            self._din[i] = (
+                self._din[i - 1]
+                - (self._din[i - 1] / float(self._window))
+                + neg[self._window + i]
+            )
+
+    def adx(self) -> pd.Series:
+        dip = np.zeros(len(self._trs))
+        for i in range(len(self._trs)):
+            dip[i] = 100 * (self._dip[i] / self._trs[i])
+
+        din = np.zeros(len(self._trs))
+        for i in range(len(self._trs)):
+            din[i] = 100 * (self._din[i] / self._trs[i])
+
+        directional_index = 100 * np.abs((dip - din) / (dip + din))
+
+        adx_series = np.zeros(len(self._trs))
+        adx_series[self._window] = directional_index[0 : self._window].mean()
+
+        for i in range(self._window + 1, len(adx_series)):
+            adx_series[i] = (
+                (adx_series[i - 1] * (self._window - 1)) + directional_index[i - 1]
+            ) / float(self._window)
+
+        adx_series = np.concatenate((self._trs_initial, adx_series), axis=0)
+        adx_series = pd.Series(data=adx_series, index=self._close.index)
+
+        adx_series = self._check_fillna(adx_series, value=20)
+        return pd.Series(adx_series, name="adx")
+
+    def adx_pos(self) -> pd.Series:
+        dip = np.zeros(len(self._close))
+        for i in range(1, len(self._trs) - 1):
+            dip[i + self._window] = 100 * (self._dip[i] / self._trs[i])
+
+        adx_pos_series = self._check_fillna(
+            pd.Series(dip, index=self._close.index), value=20
+        )
+        return pd.Series(adx_pos_series, name="adx_pos")
+
+    def adx_neg(self) -> pd.Series:
+        din = np.zeros(len(self._close))
+        for i in range(1, len(self._trs) - 1):
+            din[i + self._window] = 100 * (self._din[i] / self._trs[i])
+
+        adx_neg_series = self._check_fillna(
+            pd.Series(din, index=self._close.index), value=20
+        )
+        return pd.Series(adx_neg_series, name="adx_neg")
+
+
+class LegacyKAMAIndicator(KAMAIndicator):
+    def _run(self):
+        close_values = self._close.values
+        vol = pd.Series(abs(self._close - np.roll(self._close, 1)))
+
+        min_periods = 0 if self._fillna else self._window
+        er_num = abs(close_values - np.roll(close_values, self._window))
+        er_den = vol.rolling(self._window, min_periods=min_periods).sum()
+        efficiency_ratio = er_num / er_den
+
+        smoothing_constant = (
+            (
+                efficiency_ratio * (2.0 / (self._pow1 + 1) - 2.0 / (self._pow2 + 1.0))
+                + 2 / (self._pow2 + 1.0)
+            )
+            ** 2.0
+        ).values
+
+        self._kama = np.zeros(smoothing_constant.size)
+        len_kama = len(self._kama)
+        first_value = True
+
+        for i in range(len_kama):
+            if np.isnan(smoothing_constant[i]):
+                self._kama[i] = np.nan
+            elif first_value:
+                self._kama[i] = close_values[i]
+                first_value = False
+            else:
+                self._kama[i] = self._kama[i - 1] + smoothing_constant[i] * (
+                    close_values[i] - self._kama[i - 1]
+                )
+
+
+class LegacyPSARIndicator(PSARIndicator):
+    def _run(self):  # noqa
+        up_trend = True
+        acceleration_factor = self._step
+        up_trend_high = self._high.iloc[0]
+        down_trend_low = self._low.iloc[0]
+
+        self._psar = self._close.copy()
+        self._psar_up = pd.Series(index=self._psar.index, dtype="float64")
+        self._psar_down = pd.Series(index=self._psar.index, dtype="float64")
+
+        for i in range(2, len(self._close)):
+            reversal = False
+
+            max_high = self._high.iloc[i]
+            min_low = self._low.iloc[i]
+
+            if up_trend:
+                self._psar.iloc[i] = self._psar.iloc[i - 1] + (
+                    acceleration_factor * (up_trend_high - self._psar.iloc[i - 1])
+                )
+
+                if min_low < self._psar.iloc[i]:
+                    reversal = True
+                    self._psar.iloc[i] = up_trend_high
+                    down_trend_low = min_low
+                    acceleration_factor = self._step
+                else:
+                    if max_high > up_trend_high:
+                        up_trend_high = max_high
+                        acceleration_factor = min(
+                            acceleration_factor + self._step, self._max_step
+                        )
+
+                    low1 = self._low.iloc[i - 1]
+                    low2 = self._low.iloc[i - 2]
+                    if low2 < self._psar.iloc[i]:
+                        self._psar.iloc[i] = low2
+                    elif low1 < self._psar.iloc[i]:
+                        self._psar.iloc[i] = low1
+            else:
+                self._psar.iloc[i] = self._psar.iloc[i - 1] - (
+                    acceleration_factor * (self._psar.iloc[i - 1] - down_trend_low)
+                )
+
+                if max_high > self._psar.iloc[i]:
+                    reversal = True
+                    self._psar.iloc[i] = down_trend_low
+                    up_trend_high = max_high
+                    acceleration_factor = self._step
+                else:
+                    if min_low < down_trend_low:
+                        down_trend_low = min_low
+                        acceleration_factor = min(
+                            acceleration_factor + self._step, self._max_step
+                        )
+
+                    high1 = self._high.iloc[i - 1]
+                    high2 = self._high.iloc[i - 2]
+                    if high2 > self._psar.iloc[i]:
+                        self._psar.iloc[i] = high2
+                    elif high1 > self._psar.iloc[i]:
+                        self._psar.iloc[i] = high1
+
+            up_trend = up_trend != reversal  # XOR
+
+            if up_trend:
+                self._psar_up.iloc[i] = self._psar.iloc[i]
+            else:
+                self._psar_down.iloc[i] = self._psar.iloc[i]
+
+
+class LegacyNegativeVolumeIndexIndicator(NegativeVolumeIndexIndicator):
+    def _run(self):
+        price_change = self._close.pct_change()
+        vol_decrease = self._volume.shift(1) > self._volume
+        self._nvi = pd.Series(
+            data=np.nan, index=self._close.index, dtype="float64", name="nvi"
+        )
+        self._nvi.iloc[0] = 1000
+        for i in range(1, len(self._nvi)):
+            if vol_decrease.iloc[i]:
+                self._nvi.iloc[i] = self._nvi.iloc[i - 1] * (1.0 + price_change.iloc[i])
+            else:
+                self._nvi.iloc[i] = self._nvi.iloc[i - 1]
+
+
+def ohlcv(length: int, seed: int) -> pd.DataFrame:
+    """Random walk candles with flat stretches: equal closes, highs, lows and volumes"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    volume = rng.uniform(10, 1000, length)
+    for start in rng.integers(0, length, 3):
+        close[start : start + 8] = close[start]
+        volume[start : start + 8] = volume[start]
+    spread = np.abs(rng.normal(0, 0.005, length)) * close
+    high = close + spread
+    low = close - spread * rng.uniform(0.5, 1.5, length)
+    flat = close == np.roll(close, 1)
+    high[flat] = close[flat]
+    low[flat] = close[flat]
+    return pd.DataFrame({"high": high, "low": low, "close": close, "volume": volume})
+
+
+@pytest.fixture(params=["numba", "lists"])
+def path(request, monkeypatch):
+    if request.param == "numba":
+        if kernels.njit is None:
+            pytest.skip("numba is not installed")
+    else:
+        for name in dir(kernels):
+            if name.endswith("_kernel"):
+                monkeypatch.setattr(kernels, name, None)
+    return request.param
+
+
+def assert_same(new: pd.Series, legacy: pd.Series):
+    pd.testing.assert_series_equal(new, legacy, check_exact=True, check_names=False)
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("fillna", [False, True])
+def test_average_true_range(path, length, window, fillna):
+    df = ohlcv(length, seed=length + window)
+    args = dict(high=df.high, low=df.low, close=df.close, window=window, fillna=fillna)
+    assert_same(
+        AverageTrueRange(**args).average_true_range(),
+        LegacyAverageTrueRange(**args).average_true_range(),
+    )
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("fillna", [False, True])
+def test_adx(path, length, window, fillna):
+    df = ohlcv(length, seed=length * window)
+    args = dict(high=df.high, low=df.low, close=df.close, window=window, fillna=fillna)
+    new, legacy = ADXIndicator(**args), LegacyADXIndicator(**args)
+    if length <= 2 * window:
+        # too short for the first ADX value, both fail the same way
+        for indicator in (new, legacy):
+            with pytest.raises(IndexError), np.errstate(divide="ignore", invalid="ignore"):
+                indicator.adx()
+        return
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for output in ("adx", "adx_pos", "adx_neg"):
+            assert_same(getattr(new, output)(), getattr(legacy, output)())
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("window", [2, 10, 30])
+@pytest.mark.parametrize("fillna", [False, True])
+def test_kama(path, length, window, fillna):
+    df = ohlcv(length, seed=length - window)
+    args = dict(close=df.close, window=window, pow1=2, pow2=30, fillna=fillna)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        assert_same(KAMAIndicator(**args).kama(), LegacyKAMAIndicator(**args).kama())
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("step, max_step", [(0.02, 0.2), (0.05, 0.5)])
+@pytest.mark.parametrize("fillna", [False, True])
+def test_psar(path, length, step, max_step, fillna):
+    df = ohlcv(length, seed=length)
+    args = dict(high=df.high, low=df.low, close=df.close, step=step, max_step=max_step, fillna=fillna)
+    new, legacy = PSARIndicator(**args), LegacyPSARIndicator(**args)
+    for output in ("psar", "psar_up", "psar_down", "psar_up_indicator", "psar_down_indicator"):
+        assert_same(getattr(new, output)(), getattr(legacy, output)())
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("fillna", [False, True])
+def test_negative_volume_index(path, length, fillna):
+    df = ohlcv(length, seed=2 * length)
+    args = dict(close=df.close, volume=df.volume, fillna=fillna)
+    assert_same(
+        NegativeVolumeIndexIndicator(**args).negative_volume_index(),
+        LegacyNegativeVolumeIndexIndicator(**args).negative_volume_index(),
+    )
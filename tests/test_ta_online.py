@@ -0,0 +1,208 @@
+"""Parity of the incremental update/extend of the ta indicators with their batch accessors.
+
+Each indicator is built on the first bars, extended with the rest one bar at a time,
+and the values of the new bars must be exactly equal to the accessors of the same
+indicator built on every bar.
+"""
+import inspect
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ta import momentum, others, trend, volatility, volume
+from ta.momentum import (
+    AwesomeOscillatorIndicator,
+    KAMAIndicator,
+    PercentagePriceOscillator,
+    PercentageVolumeOscillator,
+    ROCIndicator,
+    RSIIndicator,
+    StochasticOscillator,
+    StochRSIIndicator,
+    TSIIndicator,
+    UltimateOscillator,
+    WilliamsRIndicator,
+)
+from ta.others import (
+    CumulativeReturnIndicator,
+    DailyLogReturnIndicator,
+    DailyReturnIndicator,
+)
+from ta.trend import (
+    MACD,
+    ADXIndicator,
+    AroonIndicator,
+    CCIIndicator,
+    DPOIndicator,
+    EMAIndicator,
+    IchimokuIndicator,
+    KSTIndicator,
+    MassIndex,
+    PSARIndicator,
+    SMAIndicator,
+    STCIndicator,
+    TRIXIndicator,
+    VortexIndicator,
+    WMAIndicator,
+)
+from ta.utils import IndicatorMixin, RollingSum
+from ta.volatility import (
+    AverageTrueRange,
+    BollingerBands,
+    DonchianChannel,
+    KeltnerChannel,
+    UlcerIndex,
+)
+from ta.volume import (
+    AccDistIndexIndicator,
+    ChaikinMoneyFlowIndicator,
+    EaseOfMovementIndicator,
+    ForceIndexIndicator,
+    MFIIndicator,
+    NegativeVolumeIndexIndicator,
+    OnBalanceVolumeIndicator,
+    VolumePriceTrendIndicator,
+    VolumeWeightedAveragePrice,
+)
+
+# indicator, parameters, and whether its first bars read the mean of the constructor
+# series (the shift fill values), which only matches the batch once they are past
+INDICATORS = [
+    (RSIIndicator, {"window": 14}, False),
+    (TSIIndicator, {"window_slow": 25, "window_fast": 13}, False),
+    (UltimateOscillator, {}, False),
+    (StochasticOscillator, {"window": 14, "smooth_window": 3}, False),
+    (KAMAIndicator, {"window": 10}, False),
+    (ROCIndicator, {"window": 12}, False),
+    (AwesomeOscillatorIndicator, {}, False),
+    (WilliamsRIndicator, {"lbp": 14}, False),
+    (StochRSIIndicator, {}, False),
+    (PercentagePriceOscillator, {}, False),
+    (PercentageVolumeOscillator, {}, False),
+    (AroonIndicator, {"window": 25}, False),
+    (MACD, {}, False),
+    (EMAIndicator, {"window": 14}, False),
+    (SMAIndicator, {"window": 14}, False),
+    (WMAIndicator, {"window": 9}, False),
+    (TRIXIndicator, {"window": 15}, True),
+    (MassIndex, {}, False),
+    (IchimokuIndicator, {}, False),
+    (IchimokuIndicator, {"visual": True}, True),
+    (KSTIndicator, {}, True),
+    (DPOIndicator, {"window": 20}, True),
+    (CCIIndicator, {"window": 20}, False),
+    (ADXIndicator, {"window": 14}, False),
+    (VortexIndicator, {"window": 14}, True),
+    (PSARIndicator, {}, False),
+    (STCIndicator, {}, False),
+    (AverageTrueRange, {"window": 14}, False),
+    (BollingerBands, {}, False),
+    (KeltnerChannel, {}, False),
+    (DonchianChannel, {}, False),
+    (UlcerIndex, {"window": 14}, False),
+    (AccDistIndexIndicator, {}, False),
+    (OnBalanceVolumeIndicator, {}, False),
+    (ChaikinMoneyFlowIndicator, {}, False),
+    (ForceIndexIndicator, {}, False),
+    (EaseOfMovementIndicator, {}, False),
+    (VolumePriceTrendIndicator, {}, True),
+    (NegativeVolumeIndexIndicator, {}, False),
+    (MFIIndicator, {}, False),
+    (VolumeWeightedAveragePrice, {}, False),
+    (DailyReturnIndicator, {}, True),
+    (DailyLogReturnIndicator, {}, False),
+    (CumulativeReturnIndicator, {}, False),
+]
+
+
+def ohlcv(length: int, seed: int) -> pd.DataFrame:
+    """Random walk candles with flat stretches: equal closes, highs, lows and volumes"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    volume = rng.uniform(10, 1000, length)
+    for start in rng.integers(0, length, 3):
+        close[start : start + 8] = close[start]
+        volume[start : start + 8] = volume[start]
+    spread = np.abs(rng.normal(0, 0.005, length)) * close
+    high = close + spread
+    low = close - spread * rng.uniform(0.5, 1.5, length)
+    flat = close == np.roll(close, 1)
+    high[flat] = close[flat]
+    low[flat] = close[flat]
+    return pd.DataFrame({"high": high, "low": low, "close": close, "volume": volume})
+
+
+def build(indicator, df: pd.DataFrame, parameters: dict, fillna: bool) -> IndicatorMixin:
+    arguments = inspect.signature(indicator).parameters
+    return indicator(
+        **{name: df[name] for name in df.columns if name in arguments},
+        **parameters,
+        fillna=fillna,
+    )
+
+
+def test_every_indicator_is_tested():
+    indicators = {
+        indicator
+        for module in (momentum, others, trend, volatility, volume)
+        for _, indicator in inspect.getmembers(module, inspect.isclass)
+        if issubclass(indicator, IndicatorMixin) and indicator is not IndicatorMixin
+    }
+    assert indicators == {indicator for indicator, _, _ in INDICATORS}
+    for indicator in indicators:
+        assert indicator._online_step is not IndicatorMixin._online_step, indicator.__name__
+
+
+@pytest.mark.parametrize(
+    "indicator, parameters, mean_filled",
+    INDICATORS,
+    ids=[f"{indicator.__name__}-{i}" for i, (indicator, _, _) in enumerate(INDICATORS)],
+)
+@pytest.mark.parametrize("split", [20, 200])
+@pytest.mark.parametrize("fillna", [False, True])
+@pytest.mark.parametrize("gaps", [False, True])
+def test_extend_matches_batch(indicator, parameters, mean_filled, split, fillna, gaps):
+    if mean_filled and split < 100:
+        pytest.skip("the first bars read the mean of the constructor series")
+    if indicator is KAMAIndicator and fillna:
+        pytest.skip("np.roll of the batch wraps around the end of the series on the first bars")
+    df = ohlcv(300, seed=7)
+    if gaps:
+        df.loc[[230, 231, 260], "close"] = np.nan
+        df.loc[240, "high"] = np.nan
+        df.loc[250, "volume"] = np.nan
+    online = build(indicator, df.iloc[:split], parameters, fillna)
+    values = online.extend({name: df[name].to_numpy()[split:] for name in df.columns})
+    batch = build(indicator, df, parameters, fillna)
+
+    assert values
+    for name, array in values.items():
+        expected = getattr(batch, name)().to_numpy(dtype=np.float64)[split:]
+        if mean_filled:
+            # the rolling sums went through other first values, their rounding differs
+            np.testing.assert_allclose(array, expected, rtol=1e-12, atol=1e-12, err_msg=name)
+        else:
+            np.testing.assert_array_equal(array, expected, err_msg=name)
+
+
+@pytest.mark.parametrize("indicator", [ADXIndicator, PSARIndicator, KAMAIndicator, UlcerIndex])
+def test_update_matches_extend(indicator):
+    df = ohlcv(120, seed=3)
+    bars = {name: df[name].to_numpy()[60:] for name in df.columns}
+    extended = build(indicator, df.iloc[:60], {}, False).extend(bars)
+    online = build(indicator, df.iloc[:60], {}, False)
+    for i in range(60):
+        values = online.update({name.capitalize(): bars[name][i] for name in bars})
+        for name, value in values.items():
+            np.testing.assert_array_equal(value, extended[name][i], err_msg=name)
+
+
+@pytest.mark.parametrize("window, min_periods", [(1, None), (5, None), (5, 0), (20, 3)])
+def test_rolling_sum(window, min_periods):
+    values = ohlcv(200, seed=11)["close"].to_numpy()
+    values[[10, 11, 50]] = np.nan
+    values[80] = np.inf
+    rolling = RollingSum(window, min_periods)
+    expected = pd.Series(values).rolling(window, min_periods=min_periods).sum().to_numpy()
+    np.testing.assert_array_equal([rolling.update(value) for value in values], expected)
@@ -0,0 +1,195 @@
+"""Parity of the sliding window indicators with the rolling().apply calls they replaced.
+
+The Legacy classes run the original rolling().apply(python function) code (as it was
+before ta.utils._rolling_apply and kernels.rolling_argmax) and the outputs of the
+current classes must be exactly equal to theirs, with and without nan in the inputs,
+fillna on and off.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ta import kernels
+from ta.trend import AroonIndicator, CCIIndicator, WMAIndicator
+from ta.volatility import UlcerIndex
+from ta.volume import MFIIndicator
+
+LENGTHS = [40, 1000]
+WINDOWS = [3, 14, 25]
+
+
+class LegacyAroonIndicator(AroonIndicator):
+    def _run(self):
+        min_periods = 0 if self._fillna else self._window
+        rolling_close = self._close.rolling(self._window, min_periods=min_periods)
+        self._aroon_up = rolling_close.apply(
+            lambda x: float(np.argmax(x) + 1) / self._window * 100, raw=True
+        )
+        self._aroon_down = rolling_close.apply(
+            lambda x: float(np.argmin(x) + 1) / self._window * 100, raw=True
+        )
+
+
+class LegacyWMAIndicator(WMAIndicator):
+    def _run(self):
+        _weight = pd.Series(
+            [
+                i * 2 / (self._window * (self._window + 1))
+                for i in range(1, self._window + 1)
+            ]
+        )
+
+        def weighted_average(weight):
+            def _weighted_average(x):
+                return (weight * x).sum()
+
+            return _weighted_average
+
+        self._wma = self._close.rolling(self._window).apply(
+            weighted_average(_weight), raw=True
+        )
+
+
+class LegacyCCIIndicator(CCIIndicator):
+    def _run(self):
+        def _mad(x):
+            return np.mean(np.abs(x - np.mean(x)))
+
+        min_periods = 0 if self._fillna else self._window
+        typical_price = (self._high + self._low + self._close) / 3.0
+        self._cci = (
+            typical_price
+            - typical_price.rolling(self._window, min_periods=min_periods).mean()
+        ) / (
+            self._constant
+            * typical_price.rolling(self._window, min_periods=min_periods).apply(
+                _mad, True
+            )
+        )
+
+
+class LegacyMFIIndicator(MFIIndicator):
+    def _run(self):
+        typical_price = (self._high + self._low + self._close) / 3.0
+        up_down = np.where(
+            typical_price > typical_price.shift(1),
+            1,
+            np.where(typical_price < typical_price.shift(1), -1, 0),
+        )
+        mfr = typical_price * self._volume * up_down
+
+        min_periods = 0 if self._fillna else self._window
+        n_positive_mf = mfr.rolling(self._window, min_periods=min_periods).apply(
+            lambda x: np.sum(np.where(x >= 0.0, x, 0.0)), raw=True
+        )
+        n_negative_mf = abs(
+            mfr.rolling(self._window, min_periods=min_periods).apply(
+                lambda x: np.sum(np.where(x < 0.0, x, 0.0)), raw=True
+            )
+        )
+
+        mfi = n_positive_mf / n_negative_mf
+        self._mfi = 100 - (100 / (1 + mfi))
+
+
+class LegacyUlcerIndex(UlcerIndex):
+    def _run(self):
+        _ui_max = self._close.rolling(self._window, min_periods=1).max()
+        _r_i = 100 * (self._close - _ui_max) / _ui_max
+
+        def ui_function():
+            def _ui_function(x):
+                return np.sqrt((x ** 2 / self._window).sum())
+
+            return _ui_function
+
+        self._ulcer_idx = _r_i.rolling(self._window).apply(ui_function(), raw=True)
+
+
+def ohlcv(length: int, seed: int, gaps: bool) -> pd.DataFrame:
+    """Random walk candles with flat stretches (ties), and nan in every column if gaps"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+    volume = rng.uniform(10, 1000, length)
+    for start in rng.integers(0, length, 3):
+        close[start : start + 8] = close[start]
+        volume[start : start + 8] = volume[start]
+    spread = np.abs(rng.normal(0, 0.005, length)) * close
+    df = pd.DataFrame({"high": close + spread, "low": close - spread, "close": close, "volume": volume})
+    if gaps:
+        for column in df:
+            df.loc[rng.integers(0, length, max(2, length // 50)), column] = np.nan
+        # a run of missing candles, longer than the small windows
+        start = length // 3
+        df.iloc[start : start + 5] = np.nan
+    return df
+
+
+@pytest.fixture(params=["numba", "lists"])
+def path(request, monkeypatch):
+    if request.param == "numba":
+        if kernels.njit is None:
+            pytest.skip("numba is not installed")
+    else:
+        monkeypatch.setattr(kernels, "_rolling_argmax_kernel", None)
+    return request.param
+
+
+def assert_same(new: pd.Series, legacy: pd.Series):
+    pd.testing.assert_series_equal(new, legacy, check_exact=True, check_names=False)
+
+
+parametrize_windows = pytest.mark.parametrize("window", WINDOWS)
+parametrize_inputs = pytest.mark.parametrize(
+    "length, gaps", [(length, gaps) for length in LENGTHS for gaps in (False, True)]
+)
+parametrize_fillna = pytest.mark.parametrize("fillna", [False, True])
+
+
+@parametrize_inputs
+@parametrize_windows
+@parametrize_fillna
+def test_aroon(path, length, gaps, window, fillna):
+    df = ohlcv(length, seed=length + window, gaps=gaps)
+    new, legacy = AroonIndicator(df.close, window, fillna), LegacyAroonIndicator(df.close, window, fillna)
+    for output in ("aroon_up", "aroon_down", "aroon_indicator"):
+        assert_same(getattr(new, output)(), getattr(legacy, output)())
+
+
+@parametrize_inputs
+@parametrize_windows
+@parametrize_fillna
+def test_wma(length, gaps, window, fillna):
+    df = ohlcv(length, seed=length * window, gaps=gaps)
+    assert_same(WMAIndicator(df.close, window, fillna).wma(), LegacyWMAIndicator(df.close, window, fillna).wma())
+
+
+@parametrize_inputs
+@parametrize_windows
+@parametrize_fillna
+def test_cci(length, gaps, window, fillna):
+    df = ohlcv(length, seed=length - window, gaps=gaps)
+    args = dict(high=df.high, low=df.low, close=df.close, window=window, fillna=fillna)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        assert_same(CCIIndicator(**args).cci(), LegacyCCIIndicator(**args).cci())
+
+
+@parametrize_inputs
+@parametrize_windows
+@parametrize_fillna
+def test_mfi(length, gaps, window, fillna):
+    df = ohlcv(length, seed=2 * length + window, gaps=gaps)
+    args = dict(high=df.high, low=df.low, close=df.close, volume=df.volume, window=window, fillna=fillna)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        assert_same(MFIIndicator(**args).money_flow_index(), LegacyMFIIndicator(**args).money_flow_index())
+
+
+@parametrize_inputs
+@parametrize_windows
+@parametrize_fillna
+def test_ulcer_index(length, gaps, window, fillna):
+    df = ohlcv(length, seed=3 * length + window, gaps=gaps)
+    assert_same(
+        UlcerIndex(df.close, window, fillna).ulcer_index(),
+        LegacyUlcerIndex(df.close, window, fillna).ulcer_index(),
+    )
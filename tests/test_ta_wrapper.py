@@ -0,0 +1,78 @@
+"""The add_*_ta functions assign their features to the frame given and return it."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import ta
+from ta.utils import _rolling_max, _typical_price, shared_intermediates
+from ta.wrapper import FEATURES
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+    spread = np.abs(rng.normal(0, 0.005, 300)) * close
+    return pd.DataFrame(
+        {
+            "Open": close + spread * rng.uniform(-1, 1, 300),
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.uniform(10, 1000, 300),
+        },
+        index=pd.date_range("2021-01-01", periods=300, freq="h"),
+    )
+
+
+@pytest.mark.parametrize(
+    "function, columns, prefix",
+    [
+        (ta.add_volume_ta, dict(high="High", low="Low", close="Close", volume="Volume"), "volume_"),
+        (ta.add_volatility_ta, dict(high="High", low="Low", close="Close"), "volatility_"),
+        (ta.add_trend_ta, dict(high="High", low="Low", close="Close"), "trend_"),
+        (ta.add_momentum_ta, dict(high="High", low="Low", close="Close", volume="Volume"), "momentum_"),
+        (ta.add_others_ta, dict(close="Close"), "others_"),
+    ],
+)
+def test_features_are_added_in_place(df, function, columns, prefix):
+    result = function(df, **columns)
+    assert result is df
+    added = [name for name in FEATURES if name.startswith(prefix)]
+    assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume", *added]
+
+
+def test_features_added_again_are_replaced(df):
+    ta.add_all_ta_features(df, "Open", "High", "Low", "Close", "Volume", features=["trend_macd"])
+    expected = df["trend_macd"].copy()
+    df["trend_macd"] = 0.0
+    result = ta.add_all_ta_features(df, "Open", "High", "Low", "Close", "Volume")
+    assert result is df
+    assert list(df.columns[:6]) == ["Open", "High", "Low", "Close", "Volume", "trend_macd"]
+    assert len(df.columns) == 5 + len(FEATURES)
+    # the features are in the block of the OHLCV columns, not one block each
+    assert df._mgr.nblocks == 1
+    pd.testing.assert_series_equal(df["trend_macd"], expected)
+
+
+def test_intermediates_are_shared_in_the_block(df):
+    high, low, close = df["High"], df["Low"], df["Close"]
+    indicators = [
+        lambda: ta.volatility.AverageTrueRange(high, low, close, window=10).average_true_range(),
+        lambda: ta.volatility.KeltnerChannel(high, low, close, window=10).keltner_channel_hband(),
+        lambda: ta.momentum.UltimateOscillator(high, low, close).ultimate_oscillator(),
+        lambda: ta.momentum.StochasticOscillator(high, low, close, window=14).stoch(),
+        lambda: ta.momentum.WilliamsRIndicator(high, low, close, lbp=14).williams_r(),
+        lambda: ta.trend.CCIIndicator(high, low, close, window=20).cci(),
+        lambda: ta.volume.MFIIndicator(high, low, close, df["Volume"]).money_flow_index(),
+    ]
+    with shared_intermediates():
+        typical_price = _typical_price(high, low, close)
+        assert _typical_price(high, low, close) is typical_price
+        assert _typical_price(high, low, close.copy()) is not typical_price
+        assert _rolling_max(high, 14, 14) is _rolling_max(high, 14, 14)
+        assert _rolling_max(high, 14, 0) is not _rolling_max(high, 14, 14)
+        shared = [indicator() for indicator in indicators]
+    assert _typical_price(high, low, close) is not typical_price
+    for values, indicator in zip(shared, indicators):
+        pd.testing.assert_series_equal(values, indicator())
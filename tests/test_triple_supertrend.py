@@ -0,0 +1,37 @@
+"""TripleSupertrendStrategy.generate_signals against make_trade, candle by candle."""
+import numpy as np
+import pytest
+
+pytest.importorskip("src.keys", reason="the strategies read the Binance keys of src/keys.py")
+
+from src.data.synthetic import synthetic_ohlcv  # noqa: E402
+from src.strategies.backtest import LONG, SHORT  # noqa: E402
+from src.strategies.triple_supertrend import TripleSupertrendStrategy  # noqa: E402
+
+pytestmark = pytest.mark.usefixtures("workdir")
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("thresholds", [(70, 25), (60, 40)])
+def test_generate_signals_agrees_with_make_trade(strategy_config, seed, compact, thresholds):
+    config = strategy_config("triplesupertrend")
+    config["triplesupertrend"]["strategy"].update(rsi_overbought=thresholds[0], rsi_oversold=thresholds[1])
+    strategy = TripleSupertrendStrategy(config)
+    df = strategy.indicators.get_indicators(synthetic_ohlcv(1200, seed=seed), strategy.parameters, compact=compact)
+
+    signals = strategy.generate_signals(df)
+    expected = {name: np.full(len(df), np.nan) for name in ("entry", "stop_loss", "take_profit")}
+    side = np.zeros(len(df), dtype=np.int8)
+    for i in range(len(df)):
+        row = df.iloc[i]
+        trade = strategy.make_trade(type="backtest", row=row) if row.notnull().all() else False
+        if trade:
+            side[i] = LONG if trade["side"] == "LONG" else SHORT
+            for name in expected:
+                expected[name][i] = trade[name]
+
+    assert np.count_nonzero(side == LONG) > 0 and np.count_nonzero(side == SHORT) > 0
+    np.testing.assert_array_equal(signals["side"], side)
+    for name, values in expected.items():
+        np.testing.assert_array_equal(signals[name], values, err_msg=name)